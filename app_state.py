@@ -0,0 +1,59 @@
+class Observable:
+    """簡單的事件發布 / 訂閱
+
+    subscribe 可指定 owner (任何有 cancelled 屬性的物件，例如頁面的 CancelToken)，
+    owner 被取消後該訂閱會自動移除，頁面銷毀時不需要一一取消訂閱。
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, event, callback, owner=None):
+        entry = (callback, owner)
+        self._subscribers.setdefault(event, []).append(entry)
+        def unsubscribe():
+            subs = self._subscribers.get(event, [])
+            if entry in subs: subs.remove(entry)
+        return unsubscribe
+
+    def emit(self, event, *args):
+        subs = self._subscribers.get(event, [])
+        # 先清掉 owner 已取消的訂閱
+        subs[:] = [(cb, owner) for cb, owner in subs if owner is None or not owner.cancelled]
+        for callback, _ in list(subs):
+            try: callback(*args)
+            except Exception as e: print(f"事件處理失敗 ({event}): {e}")
+
+class AppState(Observable):
+    """包裝打卡紀錄與篩選條件的狀態層，變動時通知訂閱的頁面做局部更新
+
+    事件：
+    - 'checked_in' (scene_id)：完成一次新的打卡
+    - 'filter_changed' (value)：Feed 的區域篩選改變
+    """
+
+    def __init__(self, passport_manager, initial_filter='all'):
+        super().__init__()
+        self.pm = passport_manager
+        self.filter = initial_filter
+
+    def set_filter(self, value):
+        if value == self.filter: return
+        self.filter = value
+        self.emit('filter_changed', value)
+
+    def check_in(self, scene_id, card_path=None, cluster_id=None):
+        """打卡並通知訂閱者；已打過卡則回傳 False 且不發事件"""
+        if not self.pm.check_in(scene_id, card_path, cluster_id): return False
+        self.emit('checked_in', scene_id)
+        return True
+
+    def check_in_many(self, scene_ids):
+        """批次打卡 (單一交易)，每個新打卡的景點各發一次事件"""
+        added = self.pm.check_in_many(scene_ids)
+        for scene_id in added:
+            self.emit('checked_in', scene_id)
+        return added
+
+    def is_visited(self, scene_id):
+        return self.pm.is_visited(scene_id)
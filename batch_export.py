@@ -0,0 +1,252 @@
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import shutil
+import time
+
+from PIL import Image
+
+import config
+from data_manager import format_seconds, display_name
+from image_cache import image_cache
+from image_generator import card_renderer, TEMPLATES
+from image_ingest import decode
+from card_encoder import ENCODERS, encoder_for, save_card
+
+JOURNAL_FILE = '.export-journal.jsonl'
+
+# ==========================================
+# 📷 使用者照片
+# ==========================================
+def photo_path(scene_id, photo_dir=config.PHOTO_DIR):
+    return os.path.join(photo_dir, f"{scene_id}.jpg")
+
+def save_user_photo(scene_id, source, photo_dir=config.PHOTO_DIR):
+    """製作卡片時保存使用者照片，之後換版型 / 解析度可以直接重新輸出
+
+    source 為檔案路徑 (JPEG 直接複製原檔，不重新壓縮) 或 PIL 圖片。
+    """
+    os.makedirs(photo_dir, exist_ok=True)
+    path = photo_path(scene_id, photo_dir)
+    tmp_path = path + '.tmp'
+    if isinstance(source, str):
+        with Image.open(source) as img:
+            is_jpeg = img.format == "JPEG"
+        if is_jpeg: shutil.copyfile(source, tmp_path)
+        else: decode(source).save(tmp_path, "JPEG", quality=95)
+    else:
+        source.convert("RGB").save(tmp_path, "JPEG", quality=95)
+    os.replace(tmp_path, path)
+    return path
+
+def card_texts(scene, visited_at=None):
+    """卡片上的 (標題, 副標, 頁尾)，與 GUI 製作時相同"""
+    day = datetime.date.fromtimestamp(visited_at) if visited_at else datetime.date.today()
+    return (display_name(scene), f"{scene['name']} | {format_seconds(scene.get('s'))}",
+            f"{day:%Y/%m/%d} • Takayama/Tokyo")
+
+# ==========================================
+# 🏭 工作行程
+# ==========================================
+def render_one(task):
+    """在工作行程中製作一張卡片並直接寫入磁碟，只回傳統計資料"""
+    start = time.perf_counter()
+    # 只解碼到各區塊需要的大小 (JPEG draft)，手機原圖不必完整解碼
+    sizes = {source: (w, h) for source, (_, _, w, h) in card_renderer.layout(task['template'], task['scale'])['images']}
+    scene_img = decode(task['scene_path'], sizes.get('scene'))
+    user_img = decode(task['photo'], sizes.get('user'))
+    card = card_renderer.render(task['template'], {"scene": scene_img, "user": user_img},
+                                dict(zip(("title", "subtitle", "footer"), task['texts'])), scale=task['scale'])
+    save_card(card, task['id'], os.path.dirname(task['out']), task['format'], task['quality'])
+    return {"id": task['id'], "ms": (time.perf_counter() - start) * 1000, "bytes": os.path.getsize(task['out']),
+            "pixels": card.width * card.height}
+
+# ==========================================
+# 📦 批次輸出
+# ==========================================
+class BatchExporter:
+    """把護照裡所有已打卡景點的卡片重新輸出 (多行程)
+
+    每完成一張就寫一行到輸出資料夾的 .export-journal.jsonl；中斷或部分失敗後
+    以相同參數重跑，會略過已完成的卡片 (--force 則全部重做)。
+    """
+
+    def __init__(self, out_dir=config.EXPORT_DIR, template="Classic", scale=3, fmt=config.CARD_FORMAT, quality=None,
+                 workers=config.EXPORT_WORKERS, photo_dir=config.PHOTO_DIR):
+        self.out_dir = out_dir
+        self.template = template
+        self.scale = scale
+        self.format = fmt
+        self.quality = quality
+        self.workers = workers or os.cpu_count() or 1
+        self.photo_dir = photo_dir
+        self.signature = f"{template}@{scale}x.{fmt}" + (f"q{quality}" if quality else "")
+
+    @property
+    def replaces_collection(self):
+        """是否直接輸出到收藏資料夾 (覆寫 App 裡的卡片)"""
+        return os.path.abspath(self.out_dir) == os.path.abspath(config.SAVE_DIR)
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.out_dir, JOURNAL_FILE)
+
+    def out_path(self, scene_id):
+        return os.path.join(self.out_dir, f"{scene_id}{encoder_for(self.format)[1]}")
+
+    def completed(self):
+        """journal 中以相同參數完成、且檔案仍存在的景點 id"""
+        done = set()
+        if not os.path.exists(self.journal_path): return done
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue    # 中斷時寫到一半的最後一行
+                if entry.get('sig') == self.signature and os.path.exists(self.out_path(entry['id'])):
+                    done.add(entry['id'])
+        return done
+
+    def find_scenes(self, scene_ids):
+        """從所有作品分片找出景點資料"""
+        from series_registry import SeriesRegistry
+        registry = SeriesRegistry()
+        found = {}
+        for entry in registry.series():
+            dm = registry.get(entry['id'])
+            for sid in [s for s in scene_ids if s not in found]:
+                scene = dm.get_scene(sid)
+                if scene is not None: found[sid] = scene
+            registry.unload(entry['id'])
+            if len(found) == len(scene_ids): break
+        return found
+
+    def plan(self, pm, scene_ids=None, force=False):
+        """回傳 (要製作的工作, 略過的統計)"""
+        scene_ids = [sid for sid in (scene_ids or pm.visited_ids) if pm.is_visited(sid)]
+        done = set() if force else self.completed()
+        skipped = {"resumed": 0, "no_photo": [], "no_scene": []}
+        todo = []
+        for sid in scene_ids:
+            if sid in done: skipped['resumed'] += 1
+            elif not os.path.exists(photo_path(sid, self.photo_dir)): skipped['no_photo'].append(sid)
+            else: todo.append(sid)
+        scenes = self.find_scenes(todo)
+        skipped['no_scene'] = [sid for sid in todo if sid not in scenes]
+        tasks = []
+        for sid in todo:
+            if sid not in scenes: continue
+            checkin = pm.get_checkin(sid) or {}
+            tasks.append({"id": sid, "image": scenes[sid].get('image'), "photo": photo_path(sid, self.photo_dir),
+                          "texts": card_texts(scenes[sid], checkin.get('visited_at')), "out": self.out_path(sid),
+                          "template": self.template, "scale": self.scale, "format": self.format, "quality": self.quality})
+        return tasks, skipped
+
+    def prefetch_scenes(self, tasks):
+        """場景圖先在主行程下載到磁碟快取 (快取索引只由一個行程寫入)，工作行程直接讀檔"""
+        def fetch(task):
+            image_cache.fetch(task['image'])
+            task['scene_path'] = image_cache.path(task['image'])
+        ready, failed = [], []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=config.HTTP_PER_HOST_LIMIT) as pool:
+            futures = {pool.submit(fetch, task): task for task in tasks if task['image']}
+            for future in concurrent.futures.as_completed(futures):
+                task = futures[future]
+                try:
+                    future.result()
+                    ready.append(task)
+                except Exception as e:
+                    failed.append((task['id'], f"場景圖下載失敗: {e}"))
+        failed += [(task['id'], "沒有場景圖") for task in tasks if not task['image']]
+        return ready, failed
+
+    def run(self, tasks, on_result=None):
+        """以行程池製作卡片，完成一張就寫入 journal；回傳 (成功結果, 失敗清單)"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        results, failed = [], []
+        if not tasks: return results, failed
+        with open(self.journal_path, 'a', encoding='utf-8') as journal, \
+                concurrent.futures.ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+            futures = {pool.submit(render_one, task): task for task in tasks}
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    task = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failed.append((task['id'], str(e)))
+                        continue
+                    journal.write(json.dumps({"id": result['id'], "sig": self.signature, "ms": round(result['ms'], 1)}) + "\n")
+                    journal.flush()
+                    results.append(result)
+                    if on_result: on_result(len(results) + len(failed), len(tasks), result)
+            except KeyboardInterrupt:
+                for future in futures: future.cancel()
+                raise
+        return results, failed
+
+    def update_passport(self, pm, scene_ids):
+        """輸出到收藏資料夾時，護照的卡片路徑改指向新檔 (格式改變時副檔名不同)"""
+        entries = [(sid, self.out_path(sid), None) for sid in scene_ids if pm.is_visited(sid)]
+        if self.replaces_collection and entries: pm.check_in_many(entries)
+
+def report(results, failed, skipped, elapsed, workers):
+    """印出吞吐量報告"""
+    count = len(results)
+    print("\n" + "=" * 40)
+    print(f"完成 {count} 張，失敗 {len(failed)} 張，{workers} 個行程，耗時 {elapsed:.2f}s")
+    if count:
+        total_ms = sum(r['ms'] for r in results)
+        megapixels = sum(r['pixels'] for r in results) / 1e6
+        megabytes = sum(r['bytes'] for r in results) / 1e6
+        print(f"吞吐量 {count / elapsed:.2f} 張/s ({megapixels / elapsed:.1f} MP/s，寫入 {megabytes:.1f} MB)")
+        print(f"每張平均 {total_ms / count:.0f} ms (單一行程)，平行效率 {total_ms / 1000 / elapsed / workers:.0%}")
+    if skipped['resumed']: print(f"略過先前已完成的 {skipped['resumed']} 張 (--force 重做)")
+    if skipped['no_photo']: print(f"沒有保存照片的 {len(skipped['no_photo'])} 個景點 (需在 App 重新製作一次)")
+    if skipped['no_scene']: print(f"找不到景點資料: {', '.join(skipped['no_scene'])}")
+    for sid, error in failed:
+        print(f"  ✗ {sid}: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="批次重新輸出已收藏的 Scene Card (可中斷後續跑)")
+    parser.add_argument('--template', default="Classic", choices=list(TEMPLATES))
+    parser.add_argument('--scale', type=int, default=3, help="輸出為版型基準尺寸的幾倍 (Classic 3x = 1080x1620)")
+    parser.add_argument('--format', default=config.CARD_FORMAT, choices=list(ENCODERS))
+    parser.add_argument('--quality', type=int, help="JPEG / WebP 品質 (預設 CARD_QUALITY)")
+    parser.add_argument('--out', default=config.EXPORT_DIR,
+                        help=f"輸出資料夾 (預設 {config.EXPORT_DIR}；指定 {config.SAVE_DIR} 會取代收藏的卡片)")
+    parser.add_argument('--workers', type=int, default=config.EXPORT_WORKERS, help="行程數 (預設為 CPU 核心數)")
+    parser.add_argument('--profile', default=config.PASSPORT_PROFILE, help="護照使用者檔案")
+    parser.add_argument('--ids', nargs='*', help="只輸出指定的景點")
+    parser.add_argument('--force', action='store_true', help="忽略先前的進度，全部重做")
+    args = parser.parse_args()
+
+    from passport_manager import PassportManager
+    pm = PassportManager(profile=args.profile)
+    exporter = BatchExporter(args.out, args.template, args.scale, args.format, args.quality, args.workers)
+    tasks, skipped = exporter.plan(pm, args.ids, args.force)
+    pm.close()
+    tasks, failed = exporter.prefetch_scenes(tasks)
+    print(f"{exporter.signature}：製作 {len(tasks)} 張 -> {exporter.out_dir}")
+
+    def on_result(done, total, result):
+        print(f"[{done}/{total}] {result['id']} {result['ms']:.0f} ms")
+
+    start = time.perf_counter()
+    try:
+        results, render_failed = exporter.run(tasks, on_result)
+    except KeyboardInterrupt:
+        results = None
+    if exporter.replaces_collection:
+        # journal 裡已完成的卡片 (包含中斷前做好的) 都改指向新檔，與 card_encoder transcode 相同
+        pm = PassportManager(profile=args.profile)
+        exporter.update_passport(pm, exporter.completed())
+        pm.close()
+    if results is None:
+        print("\n已中斷，以相同參數重新執行即可從中斷處繼續")
+        return
+    report(results, failed + render_failed, skipped, time.perf_counter() - start, min(exporter.workers, len(tasks) or 1))
+
+if __name__ == "__main__":
+    main()
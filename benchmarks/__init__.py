@@ -0,0 +1,7 @@
+"""效能基準測試 (不需要顯示器)
+
+    python -m benchmarks.run                      # 跑全部，結果存到 benchmarks/results/
+    python -m benchmarks.run compare A.json B.json
+    python -m benchmarks.synthetic 100000 -o data.json
+    python -m benchmarks.load --concurrency 32      # 本機服務負載測試
+"""
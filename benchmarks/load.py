@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import quote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_WORDS = ["新宿", "須賀", "しんじゅく", "駅", "神社", "飛騨", "四谷"]
+# (端點, 權重)；卡片固定幾種組合，快取命中與行程池都會被測到
+MIX = [("search", 30), ("nearby", 25), ("scene", 20), ("clusters", 10), ("card", 15)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def get_json(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+def start_service(port, render_workers=None):
+    """在子行程啟動 service.py，等 /health 回應才回傳"""
+    cmd = [sys.executable, os.path.join(ROOT, 'service.py'), '--port', str(port)]
+    if render_workers: cmd += ['--render-workers', str(render_workers)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            get_json(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except OSError:
+            if proc.poll() is not None: raise RuntimeError("服務啟動失敗")
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("服務啟動逾時")
+
+def make_paths(base_url, rng, n=500):
+    """依 MIX 權重產生請求路徑 (景點 id 從服務取得)"""
+    scenes = get_json(f"{base_url}/nearby?lat=35.6852&lon=139.7101&radius=2000000&limit=1000")
+    ids = [s['id'] for s in scenes] or ["missing"]
+    geos = [s['geo'] for s in scenes if s['geo']] or [[35.6852, 139.7101]]
+    kinds, weights = zip(*MIX)
+    paths = []
+    for kind in rng.choices(kinds, weights=weights, k=n):
+        if kind == "search":
+            path = f"/search?q={quote(rng.choice(SEARCH_WORDS))}&limit=20"
+        elif kind == "nearby":
+            lat, lon = rng.choice(geos)
+            path = f"/nearby?lat={lat + rng.uniform(-0.01, 0.01):.5f}&lon={lon + rng.uniform(-0.01, 0.01):.5f}&radius=1500"
+        elif kind == "scene":
+            path = f"/scenes/{rng.choice(ids)}"
+        elif kind == "clusters":
+            path = "/clusters"
+        else:
+            path = f"/cards/{rng.choice(ids[:8])}?scale={rng.choice((1, 2))}&format=jpeg"
+        paths.append((kind, path))
+    return paths
+
+async def client(host, port, paths, deadline, results):
+    """一個保持連線的客戶端，依序送出請求直到時間到"""
+    reader, writer = await asyncio.open_connection(host, port)
+    i = random.randrange(len(paths))
+    try:
+        while time.perf_counter() < deadline:
+            kind, path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('utf-8'))
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""): break
+                name, _, value = line.decode('latin-1').partition(":")
+                if name.lower() == 'content-length': length = int(value)
+            if length: await reader.readexactly(length)
+            results.append((kind, status, (time.perf_counter() - start) * 1000))
+    finally:
+        writer.close()
+
+async def run_load(base_url, concurrency, duration, seed):
+    url = urlsplit(base_url)
+    paths = make_paths(base_url, random.Random(seed))
+    results = []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(url.hostname, url.port, paths, deadline, results) for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def report(results, elapsed, concurrency):
+    errors = sum(1 for _, status, _ in results if status >= 400)
+    print(f"{len(results)} 個請求 / {elapsed:.1f}s = {len(results) / elapsed:.0f} req/s  "
+          f"(併發 {concurrency}，錯誤 {errors})")
+    print(f"  {'端點':<10}{'次數':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  ms")
+    for kind in [k for k, _ in MIX] + ["全部"]:
+        lat = [ms for k, _, ms in results if kind in (k, "全部")]
+        if not lat: continue
+        print(f"  {kind:<10}{len(lat):>8}{statistics.median(lat):>10.1f}{percentile(lat, 0.95):>10.1f}"
+              f"{percentile(lat, 0.99):>10.1f}{max(lat):>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="以多個併發客戶端對本機服務做負載測試")
+    parser.add_argument('--url', help="已啟動的服務 (預設在子行程啟動一個)")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10, help="秒")
+    parser.add_argument('--render-workers', type=int, help="子行程服務的卡片製作行程數")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    proc = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        proc = start_service(port, args.render_workers)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        results, elapsed = asyncio.run(run_load(base_url, args.concurrency, args.duration, args.seed))
+        report(results, elapsed, args.concurrency)
+        stats = get_json(f"{base_url}/stats")
+        print(f"卡片快取 {stats['card_cache']}，製作 {stats['requests']['renders']} 張，"
+              f"合併 {stats['requests']['render_coalesced']} 次")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
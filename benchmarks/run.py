@@ -0,0 +1,223 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+import PIL
+import numpy as np
+from PIL import Image
+
+from benchmarks import synthetic
+from benchmarks.stub_server import ImageStub
+
+DEFAULT_SIZES = (100, 10_000)
+# --full 才跑 10 萬筆 (分群 / 資料載入要數十秒)
+FULL_SIZES = DEFAULT_SIZES + (100_000,)
+SEARCH_KEYWORDS = ["新宿", "しんじゅく", "駅", "须贺", "飛騨古川", "zzz"]
+
+class Runner:
+    """計時並收集結果；每個項目以 (name, params) 辨識，跨次執行可以比較"""
+
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.results = []
+
+    def repeat_for(self, n=None, default=5):
+        if self.quick: return 1 if n and n >= 100_000 else 2
+        if n is None or n <= 10_000: return default
+        return 3 if n <= 100_000 else 1
+
+    def measure(self, name, func, params=None, repeat=5, setup=None, warmup=1, **extra):
+        """warmup 次不計時 (模組匯入、版面 / 字型快取等一次性成本不算進去)"""
+        for _ in range(warmup):
+            if setup: setup()
+            func()
+        runs = []
+        for _ in range(repeat):
+            if setup: setup()
+            start = time.perf_counter()
+            func()
+            runs.append((time.perf_counter() - start) * 1000)
+        result = {"name": name, "params": params or {}, "unit": "ms", "runs": [round(r, 3) for r in runs],
+                  "min": round(min(runs), 3), "median": round(statistics.median(runs), 3),
+                  "mean": round(statistics.fmean(runs), 3)}
+        result.update(extra)
+        self.results.append(result)
+        label = name + (" " + " ".join(f"{k}={v}" for k, v in result['params'].items()) if result['params'] else "")
+        print(f"  {label:<44}{result['median']:>11.2f} ms  (min {result['min']:.2f}, x{repeat})")
+        return result
+
+# ==========================================
+# ⏱️ 各項目
+# ==========================================
+def bench_cluster(run, sizes, workdir):
+    from clustering import ClusterEngine
+    for n in sizes:
+        points = synthetic.generate(n)
+        engine = ClusterEngine(cache_dir=os.path.join(workdir, 'clusters'))
+        result = run.measure("cluster.build", lambda: engine.build(points), {"n": n}, run.repeat_for(n))
+        result['clusters'] = len(engine.clusters)
+
+def bench_data(run, sizes, workdir):
+    import config
+    from data_manager import DataManager
+    for n in sizes:
+        path = synthetic.write(os.path.join(workdir, f"synthetic_{n}.json"), n)
+        clear = lambda: shutil.rmtree(config.DATASET_CACHE_DIR, ignore_errors=True)
+        run.measure("data.load_cold", lambda: DataManager(path), {"n": n}, run.repeat_for(n), setup=clear)
+        run.measure("data.load_warm", lambda: DataManager(path), {"n": n}, run.repeat_for(n))
+        dm = DataManager(path)
+        run.measure("data.search_scenes", lambda: [dm.search_scenes(k) for k in SEARCH_KEYWORDS], {"n": n},
+                    run.repeat_for(n), queries=len(SEARCH_KEYWORDS))
+        run.measure("data.search_ids", lambda: [dm.search_ids(k, 20) for k in SEARCH_KEYWORDS], {"n": n, "limit": 20},
+                    run.repeat_for(n), queries=len(SEARCH_KEYWORDS))
+
+def bench_card(run, sizes, workdir):
+    from image_generator import ImageGenerator, TEMPLATES
+    ig = ImageGenerator()
+    scene = Image.effect_noise((1600, 900), 40).convert("RGB")
+    user = Image.effect_noise((4032, 3024), 40).convert("RGB")
+    repeat = run.repeat_for(default=5)
+    run.measure("card.create_card", lambda: ig.create_card(scene, user, "新宿駅東口", "Tokyo", "2026/10/18"),
+                {"layout": "Classic"}, repeat)
+    for name in TEMPLATES:
+        run.measure("card.create_scene_card", lambda: ig.create_scene_card(scene, user, "新宿駅東口", "新宿駅東口 | 01:23",
+                                                                           "2026/10/18 • Takayama/Tokyo", template=name),
+                    {"template": name}, repeat)
+
+def bench_effects(run, sizes, workdir):
+    import effects
+    hero = Image.effect_noise((1200, 500), 60).convert("RGB")
+    region = Image.effect_noise((280, 200), 60).convert("RGB")
+    run.measure("effects.hero_background", lambda: effects.hero_background(hero), {"size": "1200x500"},
+                run.repeat_for(default=20))
+    run.measure("effects.bottom_fade", lambda: [effects.bottom_fade(region) for _ in range(50)],
+                {"size": "280x200", "batch": 50}, run.repeat_for(default=10))
+
+def bench_loader(run, sizes, workdir, latencies=(0.0, 0.05)):
+    from image_loader import AsyncImageLoader
+    count = 50 if run.quick else 200
+    for latency in latencies:
+        with ImageStub(latency=latency) as stub:
+            tag = iter(range(1_000_000))
+            urls = []
+
+            def fresh_urls():
+                # 每一輪換一組網址，磁碟快取一定沒命中
+                k = next(tag)
+                urls[:] = [f"{stub.base_url}/points/bench/{i}.jpg?r={k}" for i in range(count)]
+
+            def load_all():
+                # 每次量測用新的載入器 (記憶體快取是空的)，量完關掉它的執行緒
+                loader = AsyncImageLoader(max_workers=4)
+                try:
+                    futures = [loader.load(u, lambda img: None, size=(240, 160)) for u in urls]
+                    for f in futures: f.result(timeout=60)
+                finally:
+                    loader.close()
+
+            params = {"images": count, "latency_ms": int(latency * 1000)}
+            result = run.measure("loader.cold", load_all, params, run.repeat_for(default=3), setup=fresh_urls)
+            result['images_per_s'] = round(count / (result['median'] / 1000), 1)
+            # 同一組網址再載一次：記憶體快取是空的，但磁碟快取都有
+            result = run.measure("loader.warm_disk", load_all, params, run.repeat_for(default=3))
+            result['images_per_s'] = round(count / (result['median'] / 1000), 1)
+
+BENCHMARKS = {"cluster": bench_cluster, "data": bench_data, "card": bench_card,
+              "effects": bench_effects, "loader": bench_loader}
+
+# ==========================================
+# 📄 結果
+# ==========================================
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {"timestamp": datetime.datetime.now().isoformat(timespec='seconds'), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpu_count": os.cpu_count(), "pillow": PIL.__version__, "numpy": np.__version__}
+
+def run_all(names, sizes, quick, latencies, output):
+    runner = Runner(quick)
+    workdir = tempfile.mkdtemp(prefix="anitrip-bench-")
+    cwd = os.getcwd()
+    # 在暫存資料夾執行，各種相對路徑的快取 (.cache/...) 都不會碰到專案裡的資料
+    os.chdir(workdir)
+    try:
+        for name in names:
+            print(f"[{name}]")
+            kwargs = {"latencies": latencies} if name == "loader" else {}
+            BENCHMARKS[name](runner, sizes, workdir, **kwargs)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = {"meta": environment(), "config": {"sizes": list(sizes), "quick": quick}, "results": runner.results}
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果已存到 {output}")
+    return report
+
+def compare(base_file, new_file, threshold=0.10, min_delta_ms=0.1):
+    """比較兩次結果的中位數，變慢超過 threshold 的項目視為退步，回傳退步數"""
+    with open(base_file, 'r', encoding='utf-8') as f: base = json.load(f)
+    with open(new_file, 'r', encoding='utf-8') as f: new = json.load(f)
+    key = lambda r: (r['name'], json.dumps(r['params'], sort_keys=True))
+    base_results = {key(r): r for r in base['results']}
+    print(f"基準 {base['meta'].get('commit')} ({base['meta']['timestamp']})  ->  "
+          f"新 {new['meta'].get('commit')} ({new['meta']['timestamp']})\n")
+    regressions = 0
+    for r in new['results']:
+        old = base_results.get(key(r))
+        label = r['name'] + (" " + " ".join(f"{k}={v}" for k, v in r['params'].items()) if r['params'] else "")
+        if old is None:
+            print(f"  {label:<44}{'':>11}  {r['median']:>11.2f} ms  (新項目)")
+            continue
+        change = r['median'] / old['median'] - 1 if old['median'] else 0.0
+        mark = ""
+        if abs(r['median'] - old['median']) >= min_delta_ms:
+            if change > threshold:
+                mark = "▲ 退步"
+                regressions += 1
+            elif change < -threshold:
+                mark = "▼ 進步"
+        print(f"  {label:<44}{old['median']:>11.2f}  {r['median']:>11.2f} ms  {change:+7.1%} {mark}")
+    print(f"\n{regressions} 個項目變慢超過 {threshold:.0%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="AniTrip 效能基準測試")
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), help="只跑指定項目")
+    parser.add_argument('--sizes', type=int, nargs='*', help="合成資料筆數 (最多 1000000，預設 100 / 1 萬)")
+    parser.add_argument('--full', action='store_true', help="加上 10 萬筆")
+    parser.add_argument('--latency', type=float, nargs='*', default=(0.0, 0.05), help="假伺服器每個請求的延遲 (秒)")
+    parser.add_argument('--quick', action='store_true', help="每項只跑一兩次 (冒煙測試用)")
+    parser.add_argument('-o', '--output', help="結果 JSON (預設 benchmarks/results/<時間>.json)")
+    sub = parser.add_subparsers(dest='cmd')
+    cmp = sub.add_parser('compare', help="比較兩次結果")
+    cmp.add_argument('base')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=0.10, help="變慢多少算退步 (預設 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.cmd == 'compare':
+        sys.exit(1 if compare(args.base, args.new, args.threshold) else 0)
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    sizes = args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)
+    run_all(args.only or list(BENCHMARKS), sizes, args.quick, args.latency, output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import http.server
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image
+
+class ImageStub:
+    """本機假圖片伺服器：任何路徑都回傳一張 JPEG，可設定每個請求的延遲
+
+    支援 ETag / If-None-Match (回 304)，可以測磁碟快取的重新驗證；
+    fail_first=N 時前 N 個請求回 503 (測重試)。connections 為建立過的 TCP 連線數。
+        with ImageStub(latency=0.05) as stub:
+            url = f"{stub.base_url}/points/160209/abc.jpg"
+    """
+
+    def __init__(self, latency=0.0, size=(640, 360), port=0, fail_first=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = 0
+        self.connections = 0
+        self.failed = 0
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        buf = BytesIO()
+        Image.linear_gradient("L").resize(size).convert("RGB").save(buf, "JPEG", quality=85)
+        self.payload = buf.getvalue()
+        self.etag = f'"{hashlib.sha256(self.payload).hexdigest()[:16]}"'
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub.lock: stub.connections += 1
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                    fail = stub.failed < stub.fail_first
+                    if fail: stub.failed += 1
+                if stub.latency: time.sleep(stub.latency)
+                if fail:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.headers.get('If-None-Match') == stub.etag:
+                    with stub.lock: stub.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', stub.etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(stub.payload)))
+                self.send_header('ETag', stub.etag)
+                self.end_headers()
+                self.wfile.write(stub.payload)
+
+            def log_message(self, *args): pass
+
+        return Handler
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="image-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
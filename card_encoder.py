@@ -0,0 +1,135 @@
+import argparse
+import concurrent.futures
+import os
+import threading
+import time
+
+from PIL import Image
+
+import config
+from metrics import metrics
+
+# 各格式的存檔參數 (quality 可在呼叫時覆寫)
+ENCODERS = {
+    "jpeg": {"ext": ".jpg", "format": "JPEG",
+             "options": {"quality": config.CARD_QUALITY, "subsampling": config.CARD_JPEG_SUBSAMPLING}},
+    "webp": {"ext": ".webp", "format": "WEBP", "options": {"quality": config.CARD_QUALITY, "method": 4}},
+    "png": {"ext": ".png", "format": "PNG", "options": {"optimize": True}},
+}
+CARD_EXTS = tuple(e['ext'] for e in ENCODERS.values())
+
+def encoder_for(fmt=None, quality=None):
+    """(PIL 格式, 副檔名, 存檔參數)"""
+    encoder = ENCODERS[fmt or config.CARD_FORMAT]
+    options = dict(encoder['options'])
+    if quality is not None and 'quality' in options: options['quality'] = quality
+    return encoder['format'], encoder['ext'], options
+
+def card_file(scene_id, save_dir=config.SAVE_DIR):
+    """景點目前的卡片檔 (任一格式)，沒有回傳 None"""
+    for ext in CARD_EXTS:
+        path = os.path.join(save_dir, f"{scene_id}{ext}")
+        if os.path.exists(path): return path
+    return None
+
+def card_ids(save_dir=config.SAVE_DIR):
+    """收藏資料夾中有卡片的景點 id"""
+    if not os.path.isdir(save_dir): return []
+    return sorted({name.rsplit('.', 1)[0] for name in os.listdir(save_dir)
+                   if name.endswith(CARD_EXTS) and not name.startswith('.')})
+
+@metrics.timed("card.encode")
+def save_card(card, scene_id, save_dir=config.SAVE_DIR, fmt=None, quality=None):
+    """編碼並存檔：先寫暫存檔再 rename，寫完才刪掉其他格式的舊卡片，回傳路徑"""
+    pil_format, ext, options = encoder_for(fmt, quality)
+    os.makedirs(save_dir, exist_ok=True)
+    path = os.path.join(save_dir, f"{scene_id}{ext}")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        card.save(tmp_path, pil_format, **options)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+    for other in CARD_EXTS:
+        if other != ext:
+            try: os.remove(os.path.join(save_dir, f"{scene_id}{other}"))
+            except OSError: pass
+    return path
+
+class CardEncoder:
+    """卡片編碼的背景工作池，製作完的卡片交給它存檔，製作工作池可以先去做下一張"""
+
+    def __init__(self, max_workers=config.CARD_ENCODE_WORKERS):
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, card, scene_id, save_dir=config.SAVE_DIR, fmt=None, quality=None, on_done=None, on_error=None):
+        """on_done(path) / on_error(exception) 在背景執行緒呼叫"""
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                      thread_name_prefix="encode")
+        def run():
+            try:
+                path = save_card(card, scene_id, save_dir, fmt, quality)
+            except Exception as e:
+                if on_error: on_error(e)
+                else: print(f"卡片存檔失敗 ({scene_id}): {e}")
+                return None
+            if on_done: on_done(path)
+            return path
+        return self.executor.submit(run)
+
+card_encoder = CardEncoder()
+
+def _load_ms(path, runs=3):
+    start = time.perf_counter()
+    for _ in range(runs):
+        with Image.open(path) as img: img.load()
+    return (time.perf_counter() - start) / runs * 1000
+
+def transcode(fmt, quality=None, save_dir=config.SAVE_DIR, profile=config.PASSPORT_PROFILE):
+    """把收藏的卡片轉成指定格式，印出節省的容量與讀取時間變化"""
+    from passport_manager import PassportManager
+    _, ext, _ = encoder_for(fmt, quality)
+    pm = PassportManager(profile=profile)
+    before_bytes = after_bytes = before_ms = after_ms = 0
+    count = 0
+    for sid in card_ids(save_dir):
+        src = card_file(sid, save_dir)
+        if src.endswith(ext) and quality is None: continue
+        try:
+            size, ms = os.path.getsize(src), _load_ms(src)
+            with Image.open(src) as img:
+                card = img.convert("RGB")
+            path = save_card(card, sid, save_dir, fmt, quality)
+        except Exception as e:
+            print(f"{sid} 轉檔失敗: {e}")
+            continue
+        new_size, new_ms = os.path.getsize(path), _load_ms(path)
+        if pm.is_visited(sid): pm.check_in(sid, card_path=path)
+        before_bytes += size; after_bytes += new_size; before_ms += ms; after_ms += new_ms
+        count += 1
+        print(f"{sid}: {size / 1e3:.0f} KB -> {new_size / 1e3:.0f} KB, 讀取 {ms:.0f} -> {new_ms:.0f} ms")
+    pm.close()
+    if not count:
+        print("沒有需要轉檔的卡片")
+        return
+    print(f"\n轉檔 {count} 張 -> {fmt}")
+    print(f"容量 {before_bytes / 1e6:.1f} MB -> {after_bytes / 1e6:.1f} MB (節省 {(before_bytes - after_bytes) / 1e6:.1f} MB，"
+          f"{1 - after_bytes / before_bytes:.0%})")
+    print(f"平均讀取 {before_ms / count:.1f} ms -> {after_ms / count:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="收藏卡片的編碼格式")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    tc = sub.add_parser('transcode', help="把已收藏的卡片轉成其他格式")
+    tc.add_argument('--format', default=config.CARD_FORMAT, choices=list(ENCODERS))
+    tc.add_argument('--quality', type=int, help="JPEG / WebP 品質 (預設 CARD_QUALITY)")
+    tc.add_argument('--profile', default=config.PASSPORT_PROFILE)
+    args = parser.parse_args()
+    transcode(args.format, args.quality, profile=args.profile)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+import config
+from metrics import metrics
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = 111320.0
+# 演算法或快取格式變動時調整，讓舊的分群快取失效
+CACHE_VERSION = 2
+
+def haversine_m(lat, lon, lats, lons):
+    """一個點到一組點的大圓距離 (公尺)，lats / lons 為 NumPy 陣列"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+def get_geo(point):
+    """回傳 (lat, lon)，沒有合法座標時回傳 None"""
+    geo = point.get('geo')
+    if isinstance(geo, (list, tuple)) and len(geo) >= 2 and geo[0] is not None and geo[1] is not None:
+        return float(geo[0]), float(geo[1])
+    return None
+
+def cluster_base_name(point):
+    """以群中心景點名稱命名，例如「新宿駅東口」->「新宿 周邊」"""
+    return str(point.get('name', '')).split(' ')[0].split('駅')[0] + " 周邊"
+
+class GridIndex:
+    """經緯度網格雜湊：格子邊長約等於分群半徑，查詢時只看鄰近格子"""
+
+    def __init__(self, radius_m):
+        self.cell_deg = radius_m / METERS_PER_DEG_LAT
+        self.cells = {}
+
+    def cell_of(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def add(self, key, lat, lon):
+        self.cells.setdefault(self.cell_of(lat, lon), set()).add(key)
+
+    def remove(self, key, lat, lon):
+        cell = self.cells.get(self.cell_of(lat, lon))
+        if cell is not None:
+            cell.discard(key)
+            if not cell: del self.cells[self.cell_of(lat, lon)]
+
+    def nearby(self, lat, lon):
+        """半徑內所有可能的候選鍵 (經度方向依緯度放寬格數)"""
+        row, col = self.cell_of(lat, lon)
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + self.cell_deg, 89.9))), 0.01)
+        col_span = math.ceil(1 / cos_lat)
+        found = []
+        for r in range(row - 1, row + 2):
+            for c in range(col - col_span, col + col_span + 1):
+                cell = self.cells.get((r, c))
+                if cell: found.extend(cell)
+        return found
+
+class ClusterEngine:
+    """以網格索引 + 向量化 haversine 進行景點分群
+
+    依輸入順序取第一個尚未分配的景點為群中心，半徑內其他未分配景點併入同一群。
+    分群結果可依資料雜湊快取到磁碟，也支援逐筆加入新景點。
+    每個群除了 points 另有 ids (景點 id 列表)，只需要 id 時不必展開景點資料。
+    """
+
+    def __init__(self, radius_m=config.CLUSTER_RADIUS_M, cache_dir=config.CLUSTER_CACHE_DIR):
+        self.radius_m = radius_m
+        self.cache_dir = cache_dir
+        self.clusters = []
+        self.center_index = GridIndex(radius_m)
+        self.used_names = set()
+
+    # --- 命名 ---
+    def _unique_name(self, point):
+        base = cluster_base_name(point)
+        name, n = base, 2
+        while name in self.used_names:
+            name = f"{base} {n}"
+            n += 1
+        self.used_names.add(name)
+        return name
+
+    def _new_cluster(self, center, lat, lon):
+        cluster = {"id": f"c_{center['id']}", "name": self._unique_name(center),
+                   "center": [lat, lon], "points": [center], "ids": [center['id']]}
+        self.center_index.add(len(self.clusters), lat, lon)
+        self.clusters.append(cluster)
+        return cluster
+
+    # --- 完整分群 ---
+    @metrics.timed("cluster.build")
+    def build(self, points):
+        self.clusters = []
+        self.center_index = GridIndex(self.radius_m)
+        self.used_names = set()
+
+        valid = [(p, get_geo(p)) for p in points]
+        valid = [(p, g) for p, g in valid if g is not None]
+        if not valid: return []
+        lats = np.array([g[0] for _, g in valid])
+        lons = np.array([g[1] for _, g in valid])
+
+        grid = GridIndex(self.radius_m)
+        for i, (_, (lat, lon)) in enumerate(valid):
+            grid.add(i, lat, lon)
+
+        assigned = np.zeros(len(valid), dtype=bool)
+        for i, (center, (lat, lon)) in enumerate(valid):
+            if assigned[i]: continue
+            assigned[i] = True
+            grid.remove(i, lat, lon)
+            cluster = self._new_cluster(center, lat, lon)
+
+            candidates = np.array(sorted(grid.nearby(lat, lon)), dtype=np.int64)
+            if len(candidates) == 0: continue
+            dist = haversine_m(lat, lon, lats[candidates], lons[candidates])
+            for j in candidates[dist < self.radius_m]:
+                assigned[j] = True
+                grid.remove(j, lats[j], lons[j])
+                cluster['points'].append(valid[j][0])
+                cluster['ids'].append(valid[j][0]['id'])
+
+        return self.sorted_clusters()
+
+    def sorted_clusters(self):
+        # sort 是穩定排序，同樣大小的群維持建立順序
+        return sorted(self.clusters, key=lambda c: len(c['points']), reverse=True)
+
+    # --- 逐筆加入 ---
+    def add_point(self, point):
+        """把新景點併入最近的群 (距群中心在半徑內)，否則自成一群；回傳所屬的群"""
+        geo = get_geo(point)
+        if geo is None: return None
+        lat, lon = geo
+        candidates = sorted(self.center_index.nearby(lat, lon))
+        if candidates:
+            centers = np.array([self.clusters[k]['center'] for k in candidates])
+            dist = haversine_m(lat, lon, centers[:, 0], centers[:, 1])
+            best = int(np.argmin(dist))
+            if dist[best] < self.radius_m:
+                cluster = self.clusters[candidates[best]]
+                cluster['points'].append(point)
+                cluster['ids'].append(point['id'])
+                return cluster
+        return self._new_cluster(point, lat, lon)
+
+    # --- 磁碟快取 ---
+    def dataset_hash(self, points):
+        """快取鍵：由欄式快取載入的資料直接用來源檔的 sha256，其他 (一般 list) 才逐筆雜湊"""
+        h = hashlib.sha256(f"v{CACHE_VERSION}|r{self.radius_m}".encode('utf-8'))
+        digest = getattr(points, 'source_sha256', None)
+        if digest is not None:
+            h.update(f"|src{digest}".encode('ascii'))
+            return h.hexdigest()[:32]
+        for p in points:
+            h.update(json.dumps([p.get('id'), p.get('name'), get_geo(p)], ensure_ascii=False).encode('utf-8'))
+        return h.hexdigest()[:32]
+
+    @metrics.timed("cluster.load")
+    def load_or_build(self, points):
+        """資料沒變就直接讀取上次的分群結果，否則重新分群並寫入快取"""
+        cache_file = os.path.join(self.cache_dir, f"{self.dataset_hash(points)}.json")
+        if os.path.exists(cache_file):
+            try:
+                clusters = self._load_cache(cache_file, points)
+                if clusters is not None: return clusters
+            except Exception as e:
+                print(f"讀取分群快取失敗: {e}")
+        clusters = self.build(points)
+        self._save_cache(cache_file)
+        return clusters
+
+    def _save_cache(self, cache_file):
+        data = [{"id": c['id'], "name": c['name'], "center": c['center'], "ids": c['ids']} for c in self.clusters]
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = cache_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_file)
+        except Exception as e:
+            print(f"分群快取存檔失敗: {e}")
+
+    def _load_cache(self, cache_file, points):
+        """讀取快取的分群；points 為 SceneRecords 時只讀 id 欄，群內景點是延遲展開的 RowView"""
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if hasattr(points, 'view'):
+            row_of = {pid: i for i, pid in enumerate(points.ids())}
+            members = lambda ids: points.view(row_of[pid] for pid in ids)
+        else:
+            row_of = {p['id']: p for p in points}
+            members = lambda ids: [row_of[pid] for pid in ids]
+        self.clusters = []
+        self.center_index = GridIndex(self.radius_m)
+        self.used_names = set()
+        for c in data:
+            if any(pid not in row_of for pid in c['ids']): return None
+            self.center_index.add(len(self.clusters), c['center'][0], c['center'][1])
+            self.used_names.add(c['name'])
+            self.clusters.append({"id": c['id'], "name": c['name'], "center": c['center'],
+                                  "points": members(c['ids']), "ids": c['ids']})
+        return self.sorted_clusters()
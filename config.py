@@ -0,0 +1,169 @@
+import json
+import os
+
+# 使用者可在專案資料夾放一個 config.json 覆寫以下預設值
+CONFIG_FILE = 'config.json'
+
+def load_user_config(config_file=CONFIG_FILE):
+    """讀取使用者設定檔，不存在或格式錯誤時回傳空設定"""
+    if not os.path.exists(config_file):
+        return {}
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"讀取設定檔失敗: {e}")
+        return {}
+
+_user_config = load_user_config()
+
+def get(key, default=None):
+    """取得設定值 (config.json 優先，否則使用預設值)"""
+    return _user_config.get(key, default)
+
+# ==========================================
+# 📦 快取
+# ==========================================
+CACHE_DIR = get('cache_dir', '.cache')
+
+# 圖片磁碟快取 (以 URL 為鍵，超過上限時依 LRU 淘汰)
+IMAGE_CACHE_DIR = get('image_cache_dir', os.path.join(CACHE_DIR, 'images'))
+IMAGE_CACHE_MAX_BYTES = get('image_cache_max_bytes', 256 * 1024 * 1024)
+# 快取超過此秒數才會以 ETag / Last-Modified 向伺服器重新驗證
+IMAGE_CACHE_REVALIDATE_AFTER = get('image_cache_revalidate_after', 7 * 24 * 3600)
+# 累積多少筆新下載才把索引寫回磁碟 (有淘汰或程式結束時一定會寫)
+IMAGE_CACHE_FLUSH_EVERY = get('image_cache_flush_every', 32)
+
+# 已解碼圖片的記憶體快取上限 (以像素位元組計算)
+MEMORY_IMAGE_CACHE_MAX_BYTES = get('memory_image_cache_max_bytes', 64 * 1024 * 1024)
+
+# 已解碼的原始圖片 (縮放前) 另外保留一份，製作卡片時直接重用，不必重新下載解碼
+MEMORY_SOURCE_CACHE_MAX_BYTES = get('memory_source_cache_max_bytes', 32 * 1024 * 1024)
+
+# 本機大圖 (封面、使用者照片) 的縮圖金字塔，各層為長邊像素
+DERIVATIVE_CACHE_DIR = get('derivative_cache_dir', os.path.join(CACHE_DIR, 'derivatives'))
+DERIVATIVE_LEVELS = tuple(get('derivative_levels', (256, 512, 1024, 2048)))
+
+# 景點資料的 Arrow 欄式快取 (來源 JSON 的雜湊改變才重建)
+DATASET_CACHE_DIR = get('dataset_cache_dir', os.path.join(CACHE_DIR, 'dataset'))
+
+# ==========================================
+# 🌐 網路
+# ==========================================
+# (連線逾時, 讀取逾時) 秒數，所有對外請求共用
+HTTP_TIMEOUT = tuple(get('http_timeout', (3.05, 10)))
+HTTP_RETRIES = get('http_retries', 3)
+HTTP_BACKOFF = get('http_backoff', 0.3)
+# 每個主機保留的 keep-alive 連線數，以及同時對同一主機發出的請求上限
+HTTP_POOL_SIZE = get('http_pool_size', 8)
+HTTP_PER_HOST_LIMIT = get('http_per_host_limit', 6)
+# 對外請求的 User-Agent；建議在 config.json 填上 http_contact (email 或網址)，圖磚 / 圖片伺服器才聯絡得到你
+HTTP_CONTACT = get('http_contact', '')
+HTTP_USER_AGENT = get('http_user_agent', "AniTrip/1.0 (anime pilgrimage desktop app"
+                      + (f"; contact: {HTTP_CONTACT})" if HTTP_CONTACT else ")"))
+
+# ==========================================
+# 📚 作品資料
+# ==========================================
+# 各作品一個分片 (<bangumi id>.json)，manifest.json 記錄總覽
+SERIES_DIR = get('series_dir', 'series')
+DEFAULT_SERIES_ID = str(get('default_series_id', '160209'))
+# 已載入的作品超過此秒數沒被使用就釋放 (目前顯示中的作品除外)
+SERIES_IDLE_SECONDS = get('series_idle_seconds', 300)
+# 搜尋最多回傳幾筆 (依相關度；常見的單字查詢只需取預先排好的前幾名)
+SEARCH_LIMIT = get('search_limit', 200)
+
+# ==========================================
+# 📘 打卡護照
+# ==========================================
+# 打卡紀錄資料庫 (使用者資料，不放在 .cache)
+PASSPORT_DB_PATH = get('passport_db_path', 'passport.db')
+PASSPORT_PROFILE = get('passport_profile', 'default')
+
+# ==========================================
+# 🖼️ 卡片製作
+# ==========================================
+# 背景同時製作的卡片數
+RENDER_WORKERS = get('render_workers', 2)
+# 收藏的卡片，以及製作時上傳的使用者照片 (批次重新輸出卡片時使用)
+SAVE_DIR = get('save_dir', 'my_trip_memories')
+PHOTO_DIR = get('photo_dir', os.path.join(SAVE_DIR, 'photos'))
+# 卡片存檔格式：jpeg (編碼 / 讀取最快) / webp (檔案最小) / png (無損)
+CARD_FORMAT = get('card_format', 'jpeg')
+CARD_QUALITY = get('card_quality', 92)
+# 卡片上有細字與紅色印章，JPEG 預設不做色度抽樣
+CARD_JPEG_SUBSAMPLING = get('card_jpeg_subsampling', '4:4:4')
+CARD_ENCODE_WORKERS = get('card_encode_workers', 1)
+# 回憶牆用的卡片縮圖 (寬度像素)
+THUMB_DIR = get('thumb_dir', os.path.join(SAVE_DIR, 'thumbs'))
+THUMB_WIDTH = get('thumb_width', 280)
+# 批次輸出的預設資料夾 (與收藏的卡片分開，不會覆寫)；行程數 (None = CPU 核心數)
+EXPORT_DIR = get('export_dir', 'my_trip_exports')
+EXPORT_WORKERS = get('export_workers', None)
+
+# ==========================================
+# 📍 景點分群
+# ==========================================
+# 距離群中心多少公尺內的景點歸為同一區域
+CLUSTER_RADIUS_M = get('cluster_radius_m', 2000)
+CLUSTER_CACHE_DIR = get('cluster_cache_dir', os.path.join(CACHE_DIR, 'clusters'))
+
+# ==========================================
+# 🗺️ 地圖
+# ==========================================
+# 圖釘聚合的格子大小 (螢幕像素)，縮放層級超過 MAP_PIN_ZOOM 後一律顯示單一圖釘
+MAP_CLUSTER_CELL_PX = get('map_cluster_cell_px', 64)
+MAP_PIN_ZOOM = get('map_pin_zoom', 16)
+
+# 離線圖磚 (SQLite，與 tkintermapview 的 database_path 格式相同)
+TILE_DB_PATH = get('tile_db_path', os.path.join(CACHE_DIR, 'offline_tiles.db'))
+TILE_SERVER = get('tile_server', "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png")
+# 地圖上實際看過的圖磚寫進離線庫 (一般瀏覽的快取，OSM 允許)，去過的地方之後離線也能看
+TILE_CACHE_VIEWED = get('tile_cache_viewed', True)
+# 開啟地圖時在背景預先下載各區域的圖磚。OpenStreetMap 公用圖磚伺服器禁止大量下載，
+# 只有在 tile_server 設為自己的 (或允許大量下載的) 伺服器時才會執行
+TILE_PREFETCH_ON_MAP_OPEN = get('tile_prefetch_on_map_open', False)
+TILE_PREFETCH_ZOOM = tuple(get('tile_prefetch_zoom', (10, 16)))
+TILE_PREFETCH_WORKERS = get('tile_prefetch_workers', 4)
+# 區域範圍向外多抓的距離 (公尺)
+TILE_PREFETCH_PADDING_M = get('tile_prefetch_padding_m', 500)
+
+# ==========================================
+# 🧵 介面排程
+# ==========================================
+# 主執行緒每一格最多花多少毫秒交付背景結果 / 建立元件，做不完的隔 FRAME_INTERVAL_MS 再繼續
+FRAME_BUDGET_MS = get('frame_budget_ms', 8)
+FRAME_INTERVAL_MS = get('frame_interval_ms', 8)
+
+# ==========================================
+# 📈 效能量測
+# ==========================================
+# 記錄圖片載入、卡片製作、分群、頁面建立等熱點的耗時與計數 (關閉時幾乎沒有成本)；
+# 也可以用 main.py --metrics 開啟
+METRICS_ENABLED = get('metrics_enabled', False)
+# 每 METRICS_INTERVAL 秒寫一行快照，檔案超過上限時輪替，保留 METRICS_BACKUPS 個舊檔
+METRICS_FILE = get('metrics_file', os.path.join(CACHE_DIR, 'metrics', 'metrics.jsonl'))
+METRICS_INTERVAL = get('metrics_interval', 10)
+METRICS_MAX_BYTES = get('metrics_max_bytes', 5 * 1024 * 1024)
+METRICS_BACKUPS = get('metrics_backups', 3)
+# Tk 事件迴圈心跳間隔 (毫秒)；延遲超過 METRICS_STALL_MS 算一次卡頓
+METRICS_HEARTBEAT_MS = get('metrics_heartbeat_ms', 100)
+METRICS_STALL_MS = get('metrics_stall_ms', 100)
+# 主視窗右下角的量測浮層 (F12 顯示 / 隱藏)
+METRICS_OVERLAY = get('metrics_overlay', False)
+
+# ==========================================
+# 🛰️ 本機服務 (service.py)
+# ==========================================
+SERVICE_HOST = get('service_host', '127.0.0.1')
+SERVICE_PORT = get('service_port', 8765)
+# 卡片製作的行程數 (None = CPU 核心數)；查詢與打卡在執行緒池執行
+SERVICE_RENDER_WORKERS = get('service_render_workers', None)
+SERVICE_IO_WORKERS = get('service_io_workers', 8)
+# 已編碼卡片的記憶體快取上限，以及單次請求 (上傳照片) 的大小上限
+SERVICE_CARD_CACHE_MAX_BYTES = get('service_card_cache_max_bytes', 64 * 1024 * 1024)
+SERVICE_MAX_BODY_BYTES = get('service_max_body_bytes', 20 * 1024 * 1024)
+SERVICE_CARD_MAX_SCALE = get('service_card_max_scale', 4)
+# 搜尋 / 附近景點每次最多回傳幾筆；多久檢查一次閒置的作品分片 (秒，閒置門檻見 SERIES_IDLE_SECONDS)
+SERVICE_MAX_LIMIT = get('service_max_limit', 1000)
+SERVICE_EVICT_INTERVAL_S = get('service_evict_interval_s', 60)
@@ -1,51 +1,84 @@
-import pandas as pd
 import os
 
+from dataset_cache import DatasetCache, SceneRecords, is_missing
+from search_index import SearchIndex
+
+COLUMNS = ['id', 'name', 'cn', 'series', 'geo', 's', 'image']
+SEARCH_COLUMNS = ['id', 'name', 'cn', 'origin']
+
+def format_seconds(seconds):
+    """畫面秒數 -> mm:ss (超過一小時為 hh:mm:ss)"""
+    if is_missing(seconds) or seconds == "": return "--:--"
+    try:
+        sec = int(seconds)
+        return f"{sec//3600:02d}:{(sec%3600)//60:02d}:{sec%60:02d}" if sec >= 3600 else f"{(sec%3600)//60:02d}:{sec%60:02d}"
+    except: return str(seconds)
+
+def display_name(scene):
+    """景點的中文名稱，沒有就用原名"""
+    cn = scene.get('cn')
+    return cn if cn and str(cn).lower() != 'nan' else scene['name']
+
 class DataManager:
-    def __init__(self, json_file='你的名字.json'):
+    def __init__(self, json_file='你的名字.json', series_title='你的名字。'):
         self.json_file = json_file
-        self.df = self.load_data()
+        self.series_title = series_title
+        self.scenes = self.load_data()
+        self._df = None
+        # id 對照只讀 id 欄；搜尋索引與欄式快取放在一起，來源雜湊相同就直接記憶體映射
+        self.row_of_id = {sid: i for i, sid in enumerate(self.scenes.columns(['id'])['id'])}
+        self.search_index = self.load_search_index()
 
     def load_data(self):
-        """讀取 JSON 資料並轉為 DataFrame"""
+        """讀取景點資料 (Arrow 欄式快取，來源 JSON 沒變就直接記憶體映射)"""
         if not os.path.exists(self.json_file):
             print(f"錯誤：找不到 {self.json_file}")
-            # 回傳一個空的 DataFrame 結構以防出錯
-            return pd.DataFrame(columns=['id', 'name', 'cn', 'series', 'geo', 's', 'image'])
-        
+            # 回傳空的資料結構以防出錯
+            return SceneRecords(DatasetCache.empty_table(COLUMNS))
+
         try:
-            df = pd.read_json(self.json_file)
-            # 確保有 series 欄位，若沒有則預設為 "你的名字"
-            if 'series' not in df.columns:
-                df['series'] = '你的名字。'
-            return df
+            # 確保有 series 欄位，若沒有則預設為作品名稱
+            return DatasetCache(defaults={'series': self.series_title}).load(self.json_file)
         except Exception as e:
             print(f"讀取資料失敗: {e}")
-            return pd.DataFrame()
+            return SceneRecords(DatasetCache.empty_table(COLUMNS))
+
+    def load_search_index(self):
+        """n-gram 搜尋索引 (.search.arrow)；來源 JSON 改變時才重建"""
+        def records():
+            cols = self.scenes.columns(list(SEARCH_COLUMNS))
+            return (dict(zip(cols, row)) for row in zip(*cols.values()))
+        path = DatasetCache().sidecar_path(self.json_file, ".search.arrow")
+        return SearchIndex.load_or_build(path, self.scenes.source_sha256, records)
+
+    @property
+    def df(self):
+        """需要 DataFrame 時才載入 pandas 並轉換"""
+        if self._df is None:
+            self._df = self.scenes.table.to_pandas()
+        return self._df
 
     def get_all_scenes(self):
-        """回傳所有景點資料 (List of Dicts)"""
-        if self.df.empty:
-            return []
-        return self.df.to_dict('records')
+        """回傳所有景點資料 (列在第一次存取時才轉成 dict)"""
+        return self.scenes
+
+    def get_scene(self, scene_id):
+        row = self.row_of_id.get(scene_id)
+        return None if row is None else self.scenes[row]
+
+    def search_ids(self, keyword, limit=None):
+        """依相關度排序的景點 id (名稱、中文名稱、出處、區域；繁簡與假名互通)"""
+        return self.search_index.search(keyword, limit)
 
     def search_scenes(self, keyword):
         """根據關鍵字搜尋 (支援名稱、中文名稱、地區)"""
-        if self.df.empty or not keyword:
-            return self.get_all_scenes()
-        
-        # 使用 Pandas 的字串包含搜尋 (Case Insensitive)
-        # 對應課程 Week 13: 資料篩選
-        mask = (
-            self.df['name'].str.contains(keyword, case=False, na=False) |
-            self.df['cn'].str.contains(keyword, case=False, na=False)
-        )
-        result = self.df[mask]
-        return result.to_dict('records')
+        if not len(self.scenes) or not keyword:
+            return list(self.get_all_scenes())
+        return [self.get_scene(i) for i in self.search_ids(keyword)]
 
     def format_time(self, seconds):
         """將秒數轉換為 mm:ss 格式"""
-        if pd.isna(seconds) or seconds is None:
+        if is_missing(seconds):
             return "N/A"
         try:
             sec = int(seconds)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections.abc import Sequence
+
+import pyarrow as pa
+
+import config
+
+# 欄式快取格式變動時調整，讓舊的 .arrow 失效
+FORMAT_VERSION = 1
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def is_missing(value):
+    """None 或 NaN (取代 pd.isna，不必為了判斷空值載入 pandas)"""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def _to_column(values):
+    """盡量保留原型別：數字欄裡的空字串視為空值，仍混雜時才退回字串"""
+    for candidate in (values, [None if v == "" else v for v in values]):
+        try:
+            return pa.array(candidate)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            pass
+    return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+def records_to_table(records, defaults=None):
+    """list of dict -> Arrow Table，缺少的欄位為 null；defaults 為來源沒有時補上的常數欄位"""
+    names = []
+    for rec in records:
+        for key in rec:
+            if key not in names: names.append(key)
+    columns = {}
+    for name in names:
+        columns[name] = _to_column([None if is_missing(rec.get(name)) else rec.get(name) for rec in records])
+    for name, value in (defaults or {}).items():
+        if name not in columns: columns[name] = pa.array([value] * len(records))
+    return pa.Table.from_arrays(list(columns.values()), names=list(columns))
+
+def write_ipc(path, table):
+    """Arrow IPC 檔 (單一 record batch，讀取時每欄只有一個 chunk)，先寫暫存檔再原子替換"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # 暫存檔名帶行程 / 執行緒 id：GUI、service、batch_export 同時重建同一個快取也不會寫到同一個暫存檔
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+
+def read_ipc(path, metadata):
+    """schema metadata 與 metadata 相同時回傳記憶體映射的 Table，否則 (或檔案不存在) 回傳 None"""
+    if not os.path.exists(path): return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        if reader.schema.metadata != metadata: return None
+        return reader.read_all()
+    except Exception as e:
+        print(f"讀取欄式快取失敗 ({os.path.basename(path)}): {e}")
+        return None
+
+class SceneRecords(Sequence):
+    """Arrow Table 的唯讀列視圖
+
+    每一列第一次被存取時才轉成 dict 並保留下來，沒用到的列不會產生 Python 物件。
+    整欄運算請用 column()，直接拿到 (記憶體映射的) Arrow 陣列。
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.names = table.column_names
+        self._columns = [table.column(name) for name in self.names]
+        self._rows = [None] * table.num_rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0: index += len(self)
+        row = self._rows[index]
+        if row is None:
+            row = {name: col[index].as_py() for name, col in zip(self.names, self._columns)}
+            self._rows[index] = row
+        return row
+
+    def view(self, rows):
+        """部分列的視圖 (例如一個區域的景點)，同樣在存取時才轉成 dict"""
+        return RowView(self, rows)
+
+    def ids(self):
+        """id 欄 (不展開整列)"""
+        return self.table.column('id').to_pylist() if 'id' in self.names else []
+
+    def column(self, name):
+        return self.table.column(name)
+
+    @property
+    def source_sha256(self):
+        """來源 JSON 的雜湊 (由欄式快取載入時才有)"""
+        value = (self.table.schema.metadata or {}).get(b'source_sha256')
+        return value.decode('ascii') if value else None
+
+    def columns(self, names):
+        """{欄名: Python list}，欄位不存在時為全 None"""
+        n = len(self)
+        return {name: self.table.column(name).to_pylist() if name in self.names else [None] * n for name in names}
+
+class RowView(Sequence):
+    """SceneRecords 中幾列的視圖：存的是列號，存取時才向 SceneRecords 取 dict
+
+    append() 可加入一般 dict (例如逐筆分群新加入的景點)。
+    """
+
+    def __init__(self, records, rows):
+        self.records = records
+        self.items = list(rows)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = self.items[index]
+        return self.records[item] if isinstance(item, int) else item
+
+    def append(self, point):
+        self.items.append(point)
+
+class DatasetCache:
+    """來源 JSON 的 Arrow IPC 欄式快取
+
+    .arrow 的 schema metadata 記錄來源檔的 sha256，雜湊相同就直接以
+    memory map 開啟 (零複製)，否則重新解析 JSON 並以原子替換寫入新檔。
+    建立 Python 陣列會讓 pyarrow 順便載入 pandas，所以只在重建時發生，
+    一般啟動路徑完全不碰 pandas。
+    """
+
+    def __init__(self, cache_dir=config.DATASET_CACHE_DIR, defaults=None):
+        self.cache_dir = cache_dir
+        self.defaults = defaults or {}
+
+    @staticmethod
+    def empty_table(names):
+        return pa.Table.from_arrays([pa.nulls(0) for _ in names], names=list(names))
+
+    def sidecar_path(self, json_file, suffix=".arrow"):
+        """欄式快取 (以及同一來源衍生的索引檔，例如 .search.arrow) 的路徑
+
+        檔名加上來源絕對路徑的雜湊，不同資料夾裡的同名檔案 (例如各作品的 data.json) 不會互相覆蓋。
+        """
+        key = hashlib.sha256(os.path.abspath(json_file).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{os.path.basename(json_file)}.{key}{suffix}")
+
+    def _metadata(self, digest):
+        return {b'source_sha256': digest.encode('ascii'), b'format': str(FORMAT_VERSION).encode('ascii'),
+                b'defaults': json.dumps(self.defaults, ensure_ascii=False, sort_keys=True).encode('utf-8')}
+
+    def open_sidecar(self, path, digest):
+        """雜湊相符時回傳記憶體映射的 Table，否則回傳 None"""
+        return read_ipc(path, self._metadata(digest))
+
+    def build(self, json_file, path, digest):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        table = records_to_table(records, self.defaults)
+        table = table.replace_schema_metadata(self._metadata(digest))
+        try:
+            write_ipc(path, table)
+        except Exception as e:
+            print(f"寫入欄式快取失敗: {e}")
+            return table
+        return self.open_sidecar(path, digest) or table
+
+    def load(self, json_file):
+        """回傳 SceneRecords"""
+        digest = file_sha256(json_file)
+        path = self.sidecar_path(json_file)
+        table = self.open_sidecar(path, digest)
+        if table is None:
+            table = self.build(json_file, path, digest)
+        return SceneRecords(table)
+
+def main():
+    import sys
+    import time
+    from data_manager import DataManager
+    start = time.perf_counter()
+    dm = DataManager()
+    print(f"{len(dm.scenes)} 筆，{(time.perf_counter() - start) * 1000:.1f} ms，"
+          f"pandas {'已' if 'pandas' in sys.modules else '未'}載入 ({DatasetCache().sidecar_path(dm.json_file)})")
+    print(dm.scenes[0])
+
+if __name__ == "__main__":
+    main()
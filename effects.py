@@ -0,0 +1,110 @@
+import functools
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw, ImageEnhance, ImageFilter
+
+# ==========================================
+# 🌗 漸層遮罩
+# ==========================================
+# 漸層曲線：t (0~1) -> 強度 (0~1)
+CURVES = {
+    "linear": lambda t: t,
+    "ease": lambda t: t * t * (3 - 2 * t),
+    "ease_in": lambda t: t * t,
+}
+
+def fade_alpha(height, start, max_alpha, curve="linear"):
+    """每一列的漸層透明度 (uint8)：start 列以上為 0，往下漸增到 max_alpha"""
+    alpha = np.zeros(height, dtype=np.uint8)
+    grad_h = height - start
+    if grad_h > 0:
+        t = np.arange(grad_h, dtype=np.float64) / grad_h
+        alpha[start:] = (max_alpha * CURVES[curve](t)).astype(np.uint8)
+    return alpha
+
+@functools.lru_cache(maxsize=32)
+def shade_mask(size, brightness=1.0, fade_from=0.3, max_alpha=230, curve="linear"):
+    """亮度調整 + 底部漸黑合成成一張相乘遮罩 (RGB)，依參數快取
+
+    結果等同「亮度 x brightness 後疊一層黑色漸層」：
+    像素 x brightness x (1 - alpha / 255)。
+    只算一欄再拉寬，遮罩是共用的，呼叫端不可修改。
+    """
+    w, h = size
+    alpha = fade_alpha(h, int(h * fade_from), max_alpha, curve)
+    column = np.clip(np.rint(255 * brightness * (1 - alpha / 255)), 0, 255).astype(np.uint8)
+    return Image.fromarray(column.reshape(h, 1), "L").resize((w, h), Image.NEAREST).convert("RGB")
+
+# ==========================================
+# 🎨 效果
+# ==========================================
+def fast_blur(img, radius):
+    """大半徑高斯模糊：先縮小再模糊再放大，看起來一樣但像素少很多"""
+    factor = max(1, min(4, int(radius // 4)))
+    if factor == 1: return img.filter(ImageFilter.GaussianBlur(radius))
+    small = img.reduce(factor).filter(ImageFilter.GaussianBlur(radius / factor))
+    return small.resize(img.size, Image.BILINEAR)
+
+def shade(img, brightness=1.0, fade_from=0.3, max_alpha=230, curve="linear"):
+    """對圖片套用 shade_mask (一次相乘完成亮度與漸層)，回傳 RGB"""
+    if img.mode != "RGB": img = img.convert("RGB")
+    return ImageChops.multiply(img, shade_mask(img.size, brightness, fade_from, max_alpha, curve))
+
+def hero_background(img):
+    """首頁大圖背景：模糊、變暗，下方 70% 漸黑"""
+    if img.mode != "RGB": img = img.convert("RGB")
+    return shade(fast_blur(img, 15), brightness=0.5, fade_from=0.3, max_alpha=230)
+
+def bottom_fade(img):
+    """區域卡片：下方 70% 漸黑，讓白色文字看得清楚"""
+    return shade(img, fade_from=0.3, max_alpha=240)
+
+# ==========================================
+# 🐢 舊做法 (逐列畫線)，只留給 main() 比較與 tests/test_effects.py 對照用
+# ==========================================
+def _legacy_hero_background(img):
+    img = img.filter(ImageFilter.GaussianBlur(radius=15))
+    img = ImageEnhance.Brightness(img).enhance(0.5)
+    if img.mode != 'RGBA': img = img.convert('RGBA')
+    overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    w, h = img.size
+    grad_start = int(h * 0.3)
+    grad_h = h - grad_start
+    for y in range(grad_h):
+        draw.line([(0, grad_start + y), (w, grad_start + y)], fill=(0, 0, 0, int(230 * (y / grad_h))))
+    return Image.alpha_composite(img, overlay)
+
+def _legacy_bottom_fade(img):
+    if img.mode != 'RGBA': img = img.convert('RGBA')
+    overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    w, h = img.size
+    gradient_h = int(h * 0.7)
+    start_y = h - gradient_h
+    for y in range(gradient_h):
+        draw.line([(0, start_y + y), (w, start_y + y)], fill=(0, 0, 0, int(240 * (y / gradient_h))))
+    return Image.alpha_composite(img, overlay)
+
+def main():
+    """比較逐列畫線與遮罩快取的耗時 (首頁大圖 1200x500、區域卡片 280x200)"""
+    import time
+
+    def bench(label, func, img, runs):
+        func(img)  # 暖身 (建立遮罩快取)
+        start = time.perf_counter()
+        for _ in range(runs): out = func(img)
+        ms = (time.perf_counter() - start) / runs * 1000
+        print(f"{label:<22}{ms:8.2f} ms")
+        return ms, out
+
+    for name, size, legacy, fast, runs in [("首頁大圖", (1200, 500), _legacy_hero_background, hero_background, 20),
+                                           ("區域卡片", (280, 200), _legacy_bottom_fade, bottom_fade, 200)]:
+        img = Image.effect_noise(size, 60).convert("RGB")
+        before, old = bench(f"{name} 逐列畫線", legacy, img, runs)
+        after, new = bench(f"{name} 遮罩快取", fast, img, runs)
+        diff = np.abs(np.asarray(old.convert("RGB"), dtype=np.int16) - np.asarray(new, dtype=np.int16))
+        print(f"  加速 {before / after:.1f}x，像素差異平均 {diff.mean():.2f} / 最大 {diff.max()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import hashlib
+import os
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+
+import config
+from batch_export import card_texts, photo_path
+from card_encoder import ENCODERS, encoder_for
+from clustering import get_geo, haversine_m
+from data_manager import display_name, format_seconds
+from image_cache import image_cache
+from image_generator import card_renderer, TEMPLATES
+from image_ingest import decode
+from passport_manager import PassportManager
+from series_registry import SeriesRegistry
+
+FETCH_RETRY_SECONDS = 60
+
+class EngineError(Exception):
+    """請求內容有誤 (找不到景點、參數不合法)；status 為對應的 HTTP 狀態碼"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+# ==========================================
+# 🏭 卡片 (工作行程)
+# ==========================================
+def render_card(task):
+    """在工作行程中製作並編碼一張卡片，回傳檔案內容
+
+    task 只含路徑、照片位元組與參數 (可以 pickle)；場景圖由主行程先抓進磁碟快取。
+    """
+    sizes = {source: (w, h) for source, (_, _, w, h) in card_renderer.layout(task['template'], task['scale'])['images']}
+    images = {}
+    if task['scene_path']: images['scene'] = decode(task['scene_path'], sizes.get('scene'))
+    photo = task['photo']
+    if photo is not None:
+        images['user'] = decode(BytesIO(photo) if isinstance(photo, bytes) else photo, sizes.get('user'))
+    card = card_renderer.render(task['template'], images, dict(zip(("title", "subtitle", "footer"), task['texts'])),
+                                scale=task['scale'])
+    pil_format, _, options = encoder_for(task['format'], task['quality'])
+    buf = BytesIO()
+    card.save(buf, pil_format, **options)
+    return buf.getvalue()
+
+# ==========================================
+# 🧠 核心功能
+# ==========================================
+class Engine:
+    """不依賴 Tk 的核心功能：作品、景點、搜尋、附近景點、區域、打卡護照與卡片
+
+    所有方法都是同步的，可以在多個執行緒同時呼叫 (service.py 在執行緒池裡呼叫)。
+    回傳值只含 JSON 可序列化的型別。
+    """
+
+    def __init__(self, registry=None, passport=None):
+        self.registry = registry or SeriesRegistry()
+        self.pm = passport or PassportManager()
+        self.geo = {}          # series id -> (DataManager, 景點列表, lats, lons)
+        self.cluster_maps = {} # series id -> (分群結果, scene id -> 區域)
+        self.fetch_failed = {} # 場景圖 url -> 上次下載失敗的時間 (離線時不必每個請求都重試)
+        self.lock = threading.Lock()
+
+    # --- 作品 / 景點 ---
+    def series(self):
+        return [{k: v for k, v in entry.items() if k != 'file'} for entry in self.registry.series()]
+
+    def _series_ids(self, series_id=None):
+        """指定作品時只載入該作品，否則為已載入的作品 (都沒有就載入預設作品)"""
+        if series_id is not None:
+            if self.registry.entry(str(series_id)) is None: raise EngineError(f"找不到作品 {series_id}", 404)
+            ids = [str(series_id)]
+        else:
+            ids = self.registry.loaded_ids() or [config.DEFAULT_SERIES_ID]
+        for sid in ids:
+            # 區域分群會把區域名稱加入搜尋索引，先確保做過
+            self.registry.clusters_for(sid)
+        return ids
+
+    def _cluster_of(self, scene_id):
+        for sid in self.registry.loaded_ids():
+            clusters = self.registry.clusters_for(sid)
+            with self.lock:
+                cached = self.cluster_maps.get(sid)
+                if cached is None or cached[0] is not clusters:
+                    cached = (clusters, {pid: c for c in clusters for pid in c['ids']})
+                    self.cluster_maps[sid] = cached
+            cluster = cached[1].get(scene_id)
+            if cluster is not None: return cluster
+        return None
+
+    def evict_idle(self):
+        """釋放閒置的作品分片，連同這裡的經緯度陣列與區域對照 (否則分片仍被參照、記憶體不會釋放)"""
+        evicted = self.registry.evict_idle()
+        loaded = set(self.registry.loaded_ids())
+        with self.lock:
+            for cache in (self.geo, self.cluster_maps):
+                for sid in [sid for sid in cache if sid not in loaded]: del cache[sid]
+        return evicted
+
+    def summary(self, scene):
+        """對外的景點資料 (加上顯示名稱、時間與打卡狀態)"""
+        geo = get_geo(scene)
+        return {"id": scene['id'], "name": scene['name'], "display_name": display_name(scene),
+                "series": scene.get('series'), "geo": list(geo) if geo else None,
+                "time": format_seconds(scene.get('s')), "image": scene.get('image'),
+                "visited": self.pm.is_visited(scene['id'])}
+
+    def get_scene(self, scene_id):
+        self._series_ids()
+        scene = self.registry.get_scene(scene_id)
+        if scene is None: raise EngineError(f"找不到景點 {scene_id}", 404)
+        return scene
+
+    def scene(self, scene_id):
+        scene = self.get_scene(scene_id)
+        result = self.summary(scene)
+        cluster = self._cluster_of(scene_id)
+        result['cluster'] = {"id": cluster['id'], "name": cluster['name']} if cluster else None
+        result['checkin'] = self.pm.get_checkin(scene_id)
+        return result
+
+    # --- 查詢 ---
+    def search(self, query, limit=20, series_id=None):
+        ids = self._series_ids(series_id)
+        if not query: return []
+        if series_id is not None:
+            found = self.registry.get(ids[0]).search_ids(query, limit)
+        else:
+            found = self.registry.search_ids(query, limit)
+        return [self.summary(scene) for scene in map(self.registry.get_scene, found) if scene is not None]
+
+    def _geo_arrays(self, series_id):
+        """各作品有座標的景點與經緯度陣列 (第一次查詢附近景點時建立)"""
+        dm = self.registry.get(series_id)
+        with self.lock:
+            cached = self.geo.get(series_id)
+            if cached is not None and cached[0] is dm: return cached[1:]
+        scenes, lats, lons = [], [], []
+        for scene in dm.get_all_scenes():
+            geo = get_geo(scene)
+            if geo is None: continue
+            scenes.append(scene)
+            lats.append(geo[0])
+            lons.append(geo[1])
+        arrays = (scenes, np.array(lats), np.array(lons))
+        with self.lock:
+            self.geo[series_id] = (dm,) + arrays
+        return arrays
+
+    def nearby(self, lat, lon, radius_m=1000, limit=20, series_id=None):
+        """半徑內的景點，由近到遠 (附距離公尺)"""
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180): raise EngineError("座標超出範圍")
+        found = []
+        for sid in self._series_ids(series_id):
+            scenes, lats, lons = self._geo_arrays(sid)
+            if not scenes: continue
+            dist = haversine_m(lat, lon, lats, lons)
+            for i in np.flatnonzero(dist <= radius_m):
+                found.append((float(dist[i]), scenes[i]))
+        found.sort(key=lambda item: item[0])
+        return [dict(self.summary(scene), distance_m=round(d, 1)) for d, scene in found[:limit]]
+
+    def clusters(self, series_id=None):
+        result = []
+        for sid in self._series_ids(series_id):
+            for c in self.registry.clusters_for(sid):
+                result.append({"id": c['id'], "name": c['name'], "series": sid, "center": c['center'],
+                               "count": len(c['ids']),
+                               "visited": sum(1 for pid in c['ids'] if self.pm.is_visited(pid))})
+        return result
+
+    def cluster(self, cluster_id):
+        for sid in self._series_ids():
+            for c in self.registry.clusters_for(sid):
+                if c['id'] == cluster_id:
+                    return {"id": c['id'], "name": c['name'], "series": sid, "center": c['center'],
+                            "scenes": [self.summary(p) for p in c['points']]}
+        raise EngineError(f"找不到區域 {cluster_id}", 404)
+
+    # --- 打卡護照 ---
+    def passport(self):
+        visited = []
+        for scene_id in self.pm.visited_ids:
+            scene = self.registry.get_scene(scene_id)
+            entry = self.summary(scene) if scene is not None else {"id": scene_id}
+            entry['checkin'] = self.pm.get_checkin(scene_id)
+            visited.append(entry)
+        return {"profile": self.pm.profile, "count": self.pm.get_visited_count(), "title": self.pm.get_user_title(),
+                "visited": visited}
+
+    def check_in(self, scene_id, card_path=None):
+        self.get_scene(scene_id)
+        cluster = self._cluster_of(scene_id)
+        added = self.pm.check_in(scene_id, card_path=card_path, cluster_id=cluster['id'] if cluster else None)
+        return {"scene_id": scene_id, "new": added, "count": self.pm.get_visited_count()}
+
+    # --- 卡片 ---
+    def card_task(self, scene_id, template="Classic", scale=2, fmt=config.CARD_FORMAT, quality=None, photo=None):
+        """製作卡片需要的 (快取鍵, task)；task 交給 render_card (可在別的行程執行)
+
+        photo 為照片位元組；None 時使用製作卡片時保存的照片 (沒有則留白)。
+        場景圖在這裡先抓進磁碟快取，工作行程只讀本機檔案。
+        """
+        if template not in TEMPLATES: raise EngineError(f"未知的版型 {template}")
+        if fmt not in ENCODERS: raise EngineError(f"未知的格式 {fmt}")
+        if not 1 <= scale <= config.SERVICE_CARD_MAX_SCALE: raise EngineError(f"scale 需介於 1 ~ {config.SERVICE_CARD_MAX_SCALE}")
+        quality = quality or ENCODERS[fmt]['options'].get('quality')
+        scene = self.get_scene(scene_id)
+        checkin = self.pm.get_checkin(scene_id)
+        texts = card_texts(scene, checkin['visited_at'] if checkin else None)
+
+        scene_path = self._scene_image_path(scene)
+        if photo is not None:
+            photo_tag = hashlib.sha256(photo).hexdigest()
+        else:
+            saved = photo_path(scene_id)
+            if os.path.exists(saved):
+                photo, photo_tag = saved, f"saved:{os.stat(saved).st_mtime_ns}"
+            else:
+                photo_tag = "none"
+        key = hashlib.sha256("|".join(map(str, (scene_id, template, scale, fmt, quality, texts, scene_path is not None,
+                                                photo_tag))).encode('utf-8')).hexdigest()[:32]
+        task = {"scene_path": scene_path, "photo": photo, "template": template, "scale": scale, "texts": texts,
+                "format": fmt, "quality": quality}
+        return key, task
+
+    def _scene_image_path(self, scene):
+        """場景圖在磁碟快取中的路徑；不在快取時才下載，失敗後 FETCH_RETRY_SECONDS 內不再重試"""
+        url = scene.get('image')
+        if not url: return None
+        path = image_cache.path(url)
+        if path is not None: return path
+        if time.monotonic() - self.fetch_failed.get(url, -FETCH_RETRY_SECONDS) < FETCH_RETRY_SECONDS: return None
+        try:
+            image_cache.fetch(url)
+            return image_cache.path(url)
+        except Exception as e:
+            print(f"場景圖片下載失敗 ({scene['id']}): {e}")
+            self.fetch_failed[url] = time.monotonic()
+            return None
+
+def main():
+    import json
+    engine = Engine()
+    print(json.dumps(engine.series(), ensure_ascii=False, indent=2))
+    for item in engine.search("新宿", limit=5):
+        print(f"{item['id']}  {item['display_name']}  {item['time']}")
+    for item in engine.nearby(35.6852, 139.7101, radius_m=1500, limit=5):
+        print(f"{item['distance_m']:>8.0f} m  {item['display_name']}")
+
+if __name__ == "__main__":
+    main()
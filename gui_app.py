@@ -1,23 +1,34 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox, filedialog
-from PIL import Image, ImageTk, ImageDraw, ImageFont, ImageFilter, ImageEnhance, ImageOps
-import tkintermapview
+from PIL import Image, ImageTk, ImageDraw, ImageFont
 import os
 import platform
-import math
 import datetime
 import threading
-import requests
-from io import BytesIO
 import concurrent.futures
-import pandas as pd
 import random
 
 # 引用模組
-from data_manager import DataManager
+import config
+import effects
+from profiling import startup
+from metrics import metrics, DebugOverlay
+from data_manager import DataManager, format_seconds, display_name
 from passport_manager import PassportManager
 from image_generator import ImageGenerator
+from image_ingest import ingest
+from series_registry import SeriesRegistry, LEGACY_SERIES
+from map_index import MapPointIndex, tile_to_latlon
+from virtual_list import VirtualList
+from app_state import AppState
+from image_cache import image_cache
+from image_loader import AsyncImageLoader, CancelToken, PRIORITY_VISIBLE, register_processor
+from render_worker import render_worker, RenderCancelled
+from scheduler import FrameScheduler
+from batch_export import save_user_photo
+from memory_thumbs import memory_thumbs
+from card_encoder import card_encoder
 
 # ==========================================
 # 🛠️ 系統與外觀設定
@@ -27,8 +38,12 @@ ctk.set_appearance_mode("Light")
 ctk.set_default_color_theme("blue")
 
 SYSTEM_OS = platform.system()
-SAVE_DIR = "my_trip_memories"
-if not os.path.exists(SAVE_DIR): os.makedirs(SAVE_DIR)
+SAVE_DIR = config.SAVE_DIR
+
+def get_save_dir():
+    """第一次存檔時才建立資料夾"""
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    return SAVE_DIR
 
 # 字體系統
 if SYSTEM_OS == "Darwin":
@@ -43,62 +58,13 @@ FONT_HERO = (FONT_UI, 28, "bold")
 STAMP_FONT = "Arial"
 
 # ==========================================
-# 🚀 非同步圖片載入器
+# 🎨 影像處理器 (以固定名稱註冊，讓快取鍵保持穩定)
 # ==========================================
-class AsyncImageLoader:
-    def __init__(self):
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
-        self.cache = {}
-
-    def load(self, url, callback, size=None, processor=None):
-        if not url: return
-        proc_id = id(processor) if processor else "raw"
-        cache_key = (url, size, proc_id)
-
-        if cache_key in self.cache:
-            img = self.cache[cache_key]
-            callback(img)
-            return
-
-        self.executor.submit(self._download, url, callback, size, processor, cache_key)
-
-    def _download(self, url, callback, size, processor, cache_key):
-        try:
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                pil_img = Image.open(BytesIO(response.content)).convert("RGB")
-                
-                if size:
-                    pil_img = self._resize_cover(pil_img, size)
-                
-                if processor:
-                    pil_img = processor(pil_img)
-
-                ctk_img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=pil_img.size)
-                self.cache[cache_key] = ctk_img
-                callback(ctk_img)
-        except Exception as e:
-            print(f"Image load failed: {e}")
-
-    def _resize_cover(self, image, size):
-        w, h = size
-        img_ratio = image.width / image.height
-        ratio = w / h
-        if img_ratio > ratio:
-            new_height = h
-            new_width = int(new_height * img_ratio)
-            img = image.resize((new_width, new_height), Image.LANCZOS)
-            left = (new_width - w) / 2
-            img = img.crop((left, 0, left + w, h))
-        else:
-            new_width = w
-            new_height = int(new_width / img_ratio)
-            img = image.resize((new_width, new_height), Image.LANCZOS)
-            top = (new_height - h) / 2
-            img = img.crop((0, top, w, top + h))
-        return img
+# 遮罩依尺寸快取，亮度與漸層一次相乘完成 (見 effects.py)
+register_processor("hero_bg", effects.hero_background)
+register_processor("heavy_gradient", effects.bottom_fade)
 
-loader = AsyncImageLoader()
+loader = AsyncImageLoader(wrap=lambda pil: ctk.CTkImage(light_image=pil, dark_image=pil, size=pil.size))
 
 # ==========================================
 # 📱 主程式 App
@@ -108,23 +74,30 @@ class AnitabiApp(ctk.CTk):
     def __init__(self):
         super().__init__()
         
-        self.title("AniTrip － 君の名は。")
         self.geometry("1300x850")
+        # 背景結果與大量元件建立都經過排程，每一格只花固定的時間預算
+        self.scheduler = FrameScheduler(self)
         
-        # 資料初始化
-        self.dm = DataManager()
+        # 資料初始化：作品分片按需載入，一開始只載入預設作品
+        self.registry = SeriesRegistry()
         self.pm = PassportManager()
         self.ig = ImageGenerator()
-        
-        self.all_scenes = self.dm.get_all_scenes()
-        self.clusters = self._generate_clusters(self.all_scenes)
-        self.current_filter = 'all'
-        
+        # 狀態層：打卡與篩選變動時只通知相關元件更新，不重建整頁
+        self.app_state = AppState(self.pm)
         self.scene_to_cluster_map = {}
-        for c in self.clusters:
-            for p in c['points']: self.scene_to_cluster_map[p['id']] = c['name']
+        self.scene_to_cluster_id = {}
+        self._load_series(config.DEFAULT_SERIES_ID)
+        self.after(60 * 1000, self._evict_idle_series)
+        self.after(5 * 1000, self._backfill_thumbs)
+        # 搜尋在背景單一執行緒執行；search_seq 用來丟掉過期的結果
+        self.search_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.search_seq = 0
+        self.search_after = None
+        self.search_results = None
 
         self.custom_pins = {}
+        # 目前頁面的取消旗標：換頁時取消，尚未開始的圖片下載會被丟棄
+        self.page_token = CancelToken()
         
         # 佈局
         self.grid_columnconfigure(1, weight=1)
@@ -134,32 +107,72 @@ class AnitabiApp(ctk.CTk):
         self.setup_content()
         
         self.show_feed()
+        self._start_metrics()
+        startup.mark("建立介面")
+
+    def _load_series(self, series_id):
+        """切換目前作品；之前載入的作品留在 registry 裡，閒置一段時間後才釋放"""
+        if self.registry.entry(series_id) is None and self.registry.series():
+            series_id = self.registry.series()[0]['id']
+        self.series_id = str(series_id)
+        self.series = self.registry.entry(self.series_id) or {}
+        self.title(f"AniTrip － {self.series.get('title', '')}")
+        if not self.series:
+            # 沒有任何作品 (沒有 manifest 也沒有舊版 json)：顯示空白頁面，不要讓程式啟動失敗
+            message = f"找不到任何作品資料 ({self.registry.series_dir}/ 或 {LEGACY_SERIES['file']})"
+            print(f"警告：{message}，顯示空白頁面")
+            self.after(0, lambda: messagebox.showwarning("沒有景點資料", message))
+            self.dm = DataManager(LEGACY_SERIES['file'])
+            self.all_scenes = self.dm.get_all_scenes()
+            self.clusters = []
+        else:
+            self.dm = self.registry.get(self.series_id)
+            self.all_scenes = self.dm.get_all_scenes()
+            startup.mark("載入資料")
+            # 依地理位置分群 (網格索引 + haversine)，資料沒變時直接使用磁碟快取
+            self.clusters = self.registry.clusters_for(self.series_id)
+            startup.mark("景點分群")
+        for c in self.clusters:
+            # 只用 id，不展開景點資料
+            for pid in c['ids']:
+                self.scene_to_cluster_map[pid] = c['name']
+                self.scene_to_cluster_id[pid] = c['id']
+        self.app_state.filter = 'all'
+
+    def _switch_series(self, series_id):
+        if str(series_id) == self.series_id: return
+        self._load_series(series_id)
+        self.show_feed()
 
-    def _generate_clusters(self, points):
-        if not points: return []
-        def dist(p1, p2): return math.sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
-        clusters = []
-        unassigned = points[:]
-        while unassigned:
-            center = unassigned.pop(0)
-            c_geo = center.get('geo', [0,0])
-            if not c_geo: continue
-            group = [center]
-            neighbors = [p for p in unassigned if dist(c_geo, p.get('geo', [0,0])) < 0.02]
-            for n in neighbors:
-                group.append(n)
-                unassigned.remove(n)
-            name = center['name'].split(' ')[0].split('駅')[0] + " 周邊"
-            clusters.append({"name": name, "points": group})
-        clusters.sort(key=lambda c: len(c['points']), reverse=True)
-        return clusters
+    def _evict_idle_series(self):
+        evicted = self.registry.evict_idle(keep={self.series_id})
+        if evicted: print(f"釋放閒置作品: {', '.join(evicted)}")
+        self.after(60 * 1000, self._evict_idle_series)
+
+    def _backfill_thumbs(self):
+        """在背景替舊卡片補做回憶牆縮圖"""
+        def backfill(progress):
+            ids = memory_thumbs.stale_ids()
+            for i, sid in enumerate(ids):
+                progress(i / len(ids), sid)
+                memory_thumbs.ensure(sid)
+            return len(ids)
+        render_worker.submit('thumbs', backfill, on_error=lambda e: print(f"縮圖補做失敗: {e}"))
+
+    def _start_metrics(self):
+        """開啟量測時：註冊快取統計、事件迴圈心跳、定期匯出，以及 (選用) 除錯浮層"""
+        if not metrics.enabled: return
+        metrics.collect("loader", loader.get_stats)
+        metrics.collect("sources", loader.sources.get_stats)
+        metrics.collect("disk_cache", image_cache.get_stats)
+        metrics.collect("http", image_cache.client.get_stats)
+        metrics.collect("scheduler", self.scheduler.get_stats)
+        metrics.watch_tk(self)
+        metrics.start_export()
+        if config.METRICS_OVERLAY: self.debug_overlay = DebugOverlay(self, metrics)
 
     def format_seconds(self, seconds):
-        if pd.isna(seconds) or seconds == "": return "--:--"
-        try:
-            sec = int(seconds)
-            return f"{sec//3600:02d}:{(sec%3600)//60:02d}:{sec%60:02d}" if sec >= 3600 else f"{(sec%3600)//60:02d}:{sec%60:02d}"
-        except: return str(seconds)
+        return format_seconds(seconds)
 
     # --- UI 結構 ---
     def setup_sidebar(self):
@@ -174,6 +187,17 @@ class AnitabiApp(ctk.CTk):
         self.create_nav_btn("🗺️  地圖模式", self.show_map)
         self.create_nav_btn("📘  打卡護照", self.show_passport)
 
+        # 有多部作品時才顯示作品切換
+        series = self.registry.series()
+        if len(series) > 1:
+            labels = {f"{e.get('cn') or e['title']} ({e.get('count') or '?'})": e['id'] for e in series}
+            current = next((label for label, sid in labels.items() if sid == self.series_id), None)
+            ctk.CTkLabel(self.sidebar, text="作品", font=FONT_BOLD, text_color="#94A3B8").pack(anchor="w", padx=30, pady=(30, 5))
+            menu = ctk.CTkOptionMenu(self.sidebar, values=list(labels), font=FONT_MAIN,
+                                     command=lambda label: self._switch_series(labels[label]))
+            if current: menu.set(current)
+            menu.pack(fill="x", padx=20)
+
     def create_nav_btn(self, text, cmd):
         btn = ctk.CTkButton(self.sidebar, text=text, font=FONT_BOLD, fg_color="transparent", 
                             text_color="#64748B", hover_color="#EFF6FF", anchor="w", height=50, command=cmd)
@@ -186,19 +210,30 @@ class AnitabiApp(ctk.CTk):
         self.content.grid_columnconfigure(0, weight=1)
 
     def clear_content(self):
+        self.page_token.cancel()
+        self.page_token = CancelToken()
+        if self.search_after is not None:
+            self.after_cancel(self.search_after)
+            self.search_after = None
         for w in self.content.winfo_children(): w.destroy()
 
     # ==========================================
     # 🔍 Feed Page
     # ==========================================
+    @metrics.timed("page.feed")
     def show_feed(self):
         self.clear_content()
-        main_scroll = ctk.CTkScrollableFrame(self.content, fg_color="transparent")
-        main_scroll.pack(fill="both", expand=True)
+        # 景點列表虛擬化：只建立畫面內的列，捲動時重複使用
+        self.feed_list = VirtualList(self.content, row_heights={"title": 54, "scene": 200},
+                                     create_row=self._create_feed_row, bind_row=self._bind_feed_row,
+                                     show_row=self._show_feed_row, release_row=self._release_feed_row,
+                                     budget_ms=config.FRAME_BUDGET_MS)
+        self.feed_list.pack(fill="both", expand=True)
+        header = ctk.CTkFrame(self.feed_list.canvas, fg_color="#F8FAFC", corner_radius=0)
 
         # Hero Header
         hero_height = 340
-        hero = ctk.CTkFrame(main_scroll, height=hero_height, fg_color="#0F172A", corner_radius=0)
+        hero = ctk.CTkFrame(header, height=hero_height, fg_color="#0F172A", corner_radius=0)
         hero.pack(fill="x")
         hero.grid_rowconfigure(0, weight=1)
         hero.grid_columnconfigure(0, weight=1)
@@ -206,51 +241,12 @@ class AnitabiApp(ctk.CTk):
         bg_lbl = ctk.CTkLabel(hero, text="")
         bg_lbl.place(x=0, y=0, relwidth=1, relheight=1)
 
-        def hero_bg_processor(img):
-            img = img.filter(ImageFilter.GaussianBlur(radius=15))
-            enhancer = ImageEnhance.Brightness(img)
-            img = enhancer.enhance(0.5) 
-            if img.mode != 'RGBA': img = img.convert('RGBA')
-            overlay = Image.new('RGBA', img.size, (0,0,0,0))
-            draw = ImageDraw.Draw(overlay)
-            w, h = img.size
-            grad_start = int(h * 0.3)
-            grad_h = h - grad_start
-            for y in range(grad_h):
-                alpha = int(230 * (y / grad_h))
-                draw.line([(0, grad_start+y), (w, grad_start+y)], fill=(0, 0, 0, alpha))
-            return Image.alpha_composite(img, overlay)
-
-        bg_url = "https://upload.wikimedia.org/wikipedia/zh/4/4e/Your_name_poster.jpg"
-        local_poster_file = "封面.jpeg"
-        
-        if os.path.exists(local_poster_file):
-            def load_local_bg():
-                try:
-                    pil = Image.open(local_poster_file).convert("RGB")
-                    pil = hero_bg_processor(pil)
-                    w, h = 1200, hero_height
-                    img_ratio = pil.width / pil.height
-                    target_ratio = w / h
-                    if img_ratio > target_ratio:
-                        new_h = h
-                        new_w = int(new_h * img_ratio)
-                        pil = pil.resize((new_w, new_h), Image.LANCZOS)
-                        left = (new_w - w) // 2
-                        pil = pil.crop((left, 0, left+w, h))
-                    else:
-                        new_w = w
-                        new_h = int(new_w / img_ratio)
-                        pil = pil.resize((new_w, new_h), Image.LANCZOS)
-                        top = (new_h - h) // 2
-                        pil = pil.crop((0, top, w, top+h))
-                    ctk_img = ctk.CTkImage(light_image=pil, dark_image=pil, size=(1200, hero_height))
-                    self.after(0, lambda: bg_lbl.configure(image=ctk_img))
-                except: pass
-            threading.Thread(target=load_local_bg, daemon=True).start()
-        else:
-            loader.load(bg_url, lambda i: self.after(0, lambda: bg_lbl.configure(image=i)), 
-                        size=(1200, hero_height), processor=hero_bg_processor)
+        # 本機封面優先 (載入器從縮圖金字塔取顯示大小)，沒有才用線上封面；頁面切換後結果直接丟棄
+        page_token = self.page_token
+        local_poster_file = "封面.jpeg" if self.series_id == config.DEFAULT_SERIES_ID else None
+        cover = local_poster_file if local_poster_file and os.path.exists(local_poster_file) else self.series.get('cover')
+        loader.load(cover, lambda i: self.scheduler.post(lambda: bg_lbl.configure(image=i), page_token),
+                    size=(1200, hero_height), processor="hero_bg", priority=PRIORITY_VISIBLE, token=page_token)
 
         content_frame = ctk.CTkFrame(hero, fg_color="transparent")
         content_frame.place(relx=0.08, rely=0.5, anchor="w", relwidth=0.85, relheight=0.8)
@@ -261,23 +257,14 @@ class AnitabiApp(ctk.CTk):
         poster_img = ctk.CTkLabel(poster_frame, text="", width=172, height=252, corner_radius=0, fg_color="#334155")
         poster_img.place(relx=0.5, rely=0.5, anchor="center")
         
-        def load_clean_poster():
-            if os.path.exists(local_poster_file):
-                try:
-                    pil = Image.open(local_poster_file).convert("RGB")
-                    pil = ImageOps.fit(pil, (172, 252), method=Image.LANCZOS)
-                    ctk_img = ctk.CTkImage(light_image=pil, dark_image=pil, size=(172, 252))
-                    self.after(0, lambda: poster_img.configure(image=ctk_img))
-                except: pass
-            else:
-                loader.load(bg_url, lambda i: self.after(0, lambda: poster_img.configure(image=i)), size=(172, 252))
-        threading.Thread(target=load_clean_poster, daemon=True).start()
+        loader.load(cover, lambda i: self.scheduler.post(lambda: poster_img.configure(image=i), page_token),
+                    size=(172, 252), priority=PRIORITY_VISIBLE, token=page_token)
 
         info_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
         info_frame.pack(side="left", fill="y", pady=10)
 
-        ctk.CTkLabel(info_frame, text="君の名は。", font=(FONT_UI, 20), text_color="#CBD5E1", anchor="w").pack(anchor="w")
-        ctk.CTkLabel(info_frame, text="你的名字。", font=(FONT_UI, 48, "bold"), text_color="white", anchor="w").pack(anchor="w", pady=(0, 15))
+        ctk.CTkLabel(info_frame, text=self.series.get('title', ''), font=(FONT_UI, 20), text_color="#CBD5E1", anchor="w").pack(anchor="w")
+        ctk.CTkLabel(info_frame, text=self.series.get('cn') or self.series.get('title', ''), font=(FONT_UI, 48, "bold"), text_color="white", anchor="w").pack(anchor="w", pady=(0, 15))
 
         tags_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
         tags_frame.pack(anchor="w", pady=(0, 25))
@@ -288,9 +275,8 @@ class AnitabiApp(ctk.CTk):
                                 text_color="white", hover=False, height=28, corner_radius=14, width=60)
             btn.pack(side="left", padx=(0, 10))
 
-        create_pill_tag(tags_frame, "2016")
-        create_pill_tag(tags_frame, "Romance")
-        create_pill_tag(tags_frame, "Fantasy")
+        for tag in self.series.get('tags', []):
+            create_pill_tag(tags_frame, tag)
         create_pill_tag(tags_frame, f"{len(self.all_scenes)} SCENES")
 
         btn_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
@@ -306,86 +292,296 @@ class AnitabiApp(ctk.CTk):
                                      hover_color="#334155", height=45, width=140, corner_radius=22, command=self.show_passport)
         passport_btn.pack(side="left")
 
-        filter_bar = ctk.CTkScrollableFrame(main_scroll, orientation="horizontal", height=60, fg_color="transparent")
-        filter_bar.pack(fill="x", padx=30, pady=(30, 20))
+        self.search_results = None
+        self.search_entry = ctk.CTkEntry(header, placeholder_text="🔍  搜尋景點、區域 (繁簡中文、日文假名皆可)",
+                                         font=FONT_MAIN, height=40, corner_radius=20, border_color="#E2E8F0")
+        self.search_entry.pack(fill="x", padx=40, pady=(30, 0))
+        self.search_entry.bind("<KeyRelease>", self._on_search_typed)
+
+        filter_bar = ctk.CTkScrollableFrame(header, orientation="horizontal", height=60, fg_color="transparent")
+        filter_bar.pack(fill="x", padx=30, pady=(20, 20))
+        self.filter_pills = {}
         self.create_pill(filter_bar, "全部區域", 'all')
-        for i, c in enumerate(self.clusters[:15]):
-            label = f"{c['name']} ({len(c['points'])})"
-            self.create_pill(filter_bar, label, i)
-
-        target = self.clusters if self.current_filter == 'all' else [self.clusters[self.current_filter]]
-        limit = 3 if self.current_filter == 'all' else len(target)
-        for c in target[:limit]:
-            title_frame = ctk.CTkFrame(main_scroll, fg_color="transparent")
-            title_frame.pack(fill="x", padx=40, pady=(15, 5))
-            ctk.CTkFrame(title_frame, width=4, height=24, fg_color="#2563EB", corner_radius=2).pack(side="left", padx=(0, 10))
-            ctk.CTkLabel(title_frame, text=c['name'], font=(FONT_UI, 18, "bold"), text_color="#0F172A").pack(side="left")
-            count_lbl = ctk.CTkFrame(title_frame, fg_color="#F1F5F9", corner_radius=10)
-            count_lbl.pack(side="left", padx=10)
-            ctk.CTkLabel(count_lbl, text=f"{len(c['points'])} Scenes", font=("Arial", 11), text_color="#64748B").pack(padx=8, pady=2)
-            for s in c['points']:
-                self.create_card(main_scroll, s)
-        
-        if self.current_filter == 'all':
-            ctk.CTkLabel(main_scroll, text="...請點選上方區域查看更多...", text_color="#999").pack(pady=20)
+        # 其餘區域按鈕分幾格建立，列表先出現
+        self.scheduler.run_sliced(enumerate(self.clusters[:15]),
+                                  lambda ic: self.create_pill(filter_bar, f"{ic[1]['name']} ({len(ic[1]['points'])})", ic[0]),
+                                  token=self.page_token)
+
+        self.feed_list.set_header(header)
+        self.feed_list.set_items(self._feed_items())
+        self.app_state.subscribe('filter_changed', self._on_filter_changed, owner=self.page_token)
+        self.app_state.subscribe('checked_in', self._on_feed_checked_in, owner=self.page_token)
+
+    def _on_filter_changed(self, value):
+        # 只換掉卡片列表與膠囊按鈕的樣式，hero 與海報不重建
+        for val, btn in self.filter_pills.items():
+            self._style_pill(btn, val == value)
+        if self.search_results is not None:
+            self.search_seq += 1
+            self.search_results = None
+            self.search_entry.delete(0, "end")
+        self.feed_list.set_items(self._feed_items())
+
+    def _on_search_typed(self, event=None):
+        # 停止輸入 250ms 後才查詢，避免每個按鍵都重排列表
+        if self.search_after is not None: self.after_cancel(self.search_after)
+        self.search_after = self.after(250, self._run_search)
+
+    def _run_search(self):
+        self.search_after = None
+        query = self.search_entry.get().strip()
+        self.search_seq += 1
+        seq, token = self.search_seq, self.page_token
+        if not query:
+            if self.search_results is not None:
+                self.search_results = None
+                self.feed_list.set_items(self._feed_items())
+            return
+        # 在所有已載入的作品中搜尋
+        future = self.search_executor.submit(self.registry.search_ids, query, config.SEARCH_LIMIT)
+        future.add_done_callback(lambda f: self.scheduler.post(lambda: self._apply_search(seq, token, query, f)))
+
+    def _apply_search(self, seq, token, query, future):
+        if token.cancelled or seq != self.search_seq: return
+        try: ids = future.result()
+        except Exception as e:
+            print(f"搜尋失敗: {e}")
+            return
+        self.search_results = {"name": f"搜尋結果：{query}", "points": [s for s in map(self.registry.get_scene, ids) if s is not None]}
+        self.feed_list.set_items(self._feed_items())
+
+    def _on_feed_checked_in(self, scene_id):
+        for row in self.feed_list.visible_rows().values():
+            if row.kind == "scene" and row.scene['id'] == scene_id:
+                self._update_row_badge(row)
+
+    def _feed_items(self):
+        """目前篩選條件 (或搜尋結果) 下的列表內容：[("title", cluster), ("scene", scene), ...]"""
+        if self.search_results is not None:
+            return [("title", self.search_results)] + [("scene", s) for s in self.search_results['points']]
+        current = self.app_state.filter
+        target = self.clusters if current == 'all' else [self.clusters[current]]
+        items = []
+        for c in target:
+            items.append(("title", c))
+            items.extend(("scene", s) for s in c['points'])
+        return items
 
     def create_pill(self, parent, text, val):
-        active = (self.current_filter == val)
+        btn = ctk.CTkButton(parent, text=text, corner_radius=20, font=FONT_BOLD, width=len(text)*16+30, command=lambda v=val: self.app_state.set_filter(v))
+        self._style_pill(btn, self.app_state.filter == val)
+        btn.pack(side="left", padx=5)
+        self.filter_pills[val] = btn
+
+    def _style_pill(self, btn, active):
         fg = "#2563EB" if active else "white"
         txt = "white" if active else "#334155"
         border_col = "#2563EB" if active else "#E2E8F0"
         border_w = 0 if active else 1
-        btn = ctk.CTkButton(parent, text=text, fg_color=fg, text_color=txt, border_width=border_w, border_color=border_col, corner_radius=20, font=FONT_BOLD, width=len(text)*16+30, command=lambda v=val: [setattr(self, 'current_filter', v), self.show_feed()])
-        btn.pack(side="left", padx=5)
-
-    def create_card(self, parent, scene):
-        card = ctk.CTkFrame(parent, fg_color="white", corner_radius=12, border_width=1, border_color="#E2E8F0")
-        card.pack(fill="x", padx=40, pady=8)
+        btn.configure(fg_color=fg, text_color=txt, border_width=border_w, border_color=border_col)
+
+    def _get_placeholder(self, size):
+        key = f"placeholder_{size}"
+        if key not in self.custom_pins:
+            pil = Image.new("RGB", size, "#F1F5F9")
+            self.custom_pins[key] = ctk.CTkImage(pil, size=size)
+        return self.custom_pins[key]
+
+    def _create_feed_row(self, kind, parent):
+        row = ctk.CTkFrame(parent, fg_color="#F8FAFC", corner_radius=0)
+        row.kind = kind
+        if kind == "title":
+            title_frame = ctk.CTkFrame(row, fg_color="transparent")
+            title_frame.pack(fill="x", padx=40, pady=(15, 5))
+            ctk.CTkFrame(title_frame, width=4, height=24, fg_color="#2563EB", corner_radius=2).pack(side="left", padx=(0, 10))
+            row.title_lbl = ctk.CTkLabel(title_frame, text="", font=(FONT_UI, 18, "bold"), text_color="#0F172A")
+            row.title_lbl.pack(side="left")
+            count_lbl = ctk.CTkFrame(title_frame, fg_color="#F1F5F9", corner_radius=10)
+            count_lbl.pack(side="left", padx=10)
+            row.count_lbl = ctk.CTkLabel(count_lbl, text="", font=("Arial", 11), text_color="#64748B")
+            row.count_lbl.pack(padx=8, pady=2)
+            return row
+
+        row.scene = None
+        row.token = None
+        card = ctk.CTkFrame(row, fg_color="white", corner_radius=12, border_width=1, border_color="#E2E8F0")
+        card.pack(fill="both", expand=True, padx=40, pady=8)
         card.grid_columnconfigure(1, weight=1)
-        img = ctk.CTkLabel(card, text="", width=240, height=160, fg_color="#F1F5F9", corner_radius=8)
-        img.grid(row=0, column=0, rowspan=2, padx=12, pady=12)
-        def update_image(i):
-            if self.winfo_exists(): img.configure(image=i)
-        loader.load(scene.get('image'), lambda i: self.after(0, lambda: update_image(i)), size=(240, 160))
+        row.img = ctk.CTkLabel(card, text="", width=240, height=160, fg_color="#F1F5F9", corner_radius=8)
+        row.img.grid(row=0, column=0, rowspan=2, padx=12, pady=12)
         info = ctk.CTkFrame(card, fg_color="transparent")
         info.grid(row=0, column=1, sticky="nsew", padx=(0, 12), pady=12)
-        cn = scene.get('cn'); name = cn if cn and str(cn).lower() != 'nan' else scene['name']
-        ctk.CTkLabel(info, text=name, font=FONT_TITLE, text_color="#0F172A", anchor="w").pack(fill="x")
-        ctk.CTkLabel(info, text=f"原名：{scene['name']}  •  {self.format_seconds(scene.get('s'))}", font=FONT_MAIN, text_color="#64748B", anchor="w").pack(fill="x", pady=(2, 10))
+        row.name_lbl = ctk.CTkLabel(info, text="", font=FONT_TITLE, text_color="#0F172A", anchor="w")
+        row.name_lbl.pack(fill="x")
+        row.sub_lbl = ctk.CTkLabel(info, text="", font=FONT_MAIN, text_color="#64748B", anchor="w")
+        row.sub_lbl.pack(fill="x", pady=(2, 10))
         btns = ctk.CTkFrame(info, fg_color="transparent")
         btns.pack(side="bottom", fill="x")
-        if self.pm.is_visited(scene['id']):
-            ctk.CTkLabel(btns, text="✅ 已完成打卡", font=FONT_BOLD, text_color="#10B981").pack(side="left")
+        row.done_lbl = ctk.CTkLabel(btns, text="✅ 已完成打卡", font=FONT_BOLD, text_color="#10B981")
+        row.checkin_btn = ctk.CTkButton(btns, text="打卡 Challenge", fg_color="#2563EB", hover_color="#1D4ED8", command=lambda: self.open_overlay(row.scene))
+        return row
+
+    def _bind_feed_row(self, row, item):
+        if row.kind == "title":
+            row.title_lbl.configure(text=item['name'])
+            row.count_lbl.configure(text=f"{len(item['points'])} Scenes")
+            return
+        row.scene = item
+        row.img.configure(image=self._get_placeholder((240, 160)))
+        name = display_name(item)
+        row.name_lbl.configure(text=name)
+        row.sub_lbl.configure(text=f"原名：{item['name']}  •  {self.format_seconds(item.get('s'))}")
+        self._update_row_badge(row)
+
+    def _update_row_badge(self, row):
+        if self.pm.is_visited(row.scene['id']):
+            row.checkin_btn.pack_forget()
+            row.done_lbl.pack(side="left")
         else:
-            ctk.CTkButton(btns, text="打卡 Challenge", fg_color="#2563EB", hover_color="#1D4ED8", command=lambda: self.open_overlay(scene)).pack(side="left")
+            row.done_lbl.pack_forget()
+            row.checkin_btn.pack(side="left")
+
+    def _show_feed_row(self, row, item):
+        """列真正進入畫面時才載入圖片"""
+        if row.kind != "scene": return
+        row.token = CancelToken(parent=self.page_token)
+        def update_image(i):
+            if row.winfo_exists() and row.scene is item: row.img.configure(image=i)
+        loader.load(item.get('image'), lambda i: self.scheduler.post(lambda: update_image(i)), size=(240, 160),
+                    priority=PRIORITY_VISIBLE, token=row.token)
+
+    def _release_feed_row(self, row, item):
+        # 列被回收時，取消它還在排隊的圖片下載
+        if row.kind == "scene" and row.token is not None:
+            row.token.cancel()
+            row.token = None
 
     # ==========================================
     # 🗺️ Map Page
     # ==========================================
+    @metrics.timed("page.map")
     def show_map(self):
+        # 地圖元件 (連帶 requests / geocoder) 第一次開地圖才匯入
+        import tkintermapview
+        from tile_cache import TileCache, TileWriteThrough
         self.clear_content()
         map_frame = ctk.CTkFrame(self.content, fg_color="white")
         map_frame.pack(fill="both", expand=True)
-        self.map_widget = tkintermapview.TkinterMapView(map_frame, corner_radius=0)
+        # 圖磚先查 SQLite 離線庫，沒有才連網
+        tile_cache = TileCache()
+        tile_cache.ensure_schema()
+        self.map_widget = tkintermapview.TkinterMapView(map_frame, corner_radius=0, database_path=tile_cache.db_path)
+        if tile_cache.tile_server != self.map_widget.tile_server:
+            self.map_widget.set_tile_server(tile_cache.tile_server)
+        if config.TILE_CACHE_VIEWED:
+            # 看過的圖磚寫進離線庫 (預設的 OSM 不能預先下載，離線庫靠這裡累積)
+            if getattr(self, 'tile_write_through', None) is None:
+                self.tile_write_through = TileWriteThrough(tile_cache)
+            self.tile_write_through.install(self.map_widget)
         self.map_widget.pack(fill="both", expand=True)
+        self._start_tile_prefetch(tile_cache)
         if self.all_scenes:
             s = random.choice(self.all_scenes)
             self.map_widget.set_position(s['geo'][0], s['geo'][1])
             self.map_widget.set_zoom(14)
-        markers_to_add = []
-        for c in self.clusters:
-            for s in c['points']: markers_to_add.append(s)
-        self.add_markers_lazy(markers_to_add, 0)
-
-    def add_markers_lazy(self, markers, index):
-        batch_size = 5
-        limit = min(index + batch_size, len(markers))
-        for i in range(index, limit):
-            s = markers[i]
-            visited = self.pm.is_visited(s['id'])
-            if not hasattr(self, 'map_widget') or not self.map_widget.winfo_exists(): return
-            self.map_widget.set_marker(s['geo'][0], s['geo'][1], text=None, icon=self._get_pin_icon(visited), command=lambda m, data=s: self.open_map_card(data))
-        if limit < len(markers): self.after(10, lambda: self.add_markers_lazy(markers, limit))
+        # 地圖涵蓋所有已載入的作品；載入 / 釋放作品後重建索引
+        if getattr(self, 'map_index_version', None) != self.registry.version:
+            self.map_index = MapPointIndex(self.registry.loaded_scenes())
+            self.map_index_version = self.registry.version
+        # key -> marker；單一圖釘的 key 為景點 id，聚合泡泡為 (zoom, cx, cy)
+        self.map_markers = {}
+        self.map_view_state = None
+        self.app_state.subscribe('checked_in', self._on_map_checked_in, owner=self.page_token)
+        self._poll_map_viewport(self.page_token)
+
+    def _start_tile_prefetch(self, tile_cache):
+        """第一次開啟地圖時，在背景把所有區域的圖磚抓進離線庫 (每次啟動只跑一次)
+
+        只在設定開啟、且圖磚伺服器允許大量下載時執行 (預設的 OpenStreetMap 不允許)。
+        """
+        from tile_cache import bulk_prefetch_allowed
+        if not config.TILE_PREFETCH_ON_MAP_OPEN or getattr(self, 'tile_prefetch_started', False): return
+        if not bulk_prefetch_allowed(tile_cache.tile_server):
+            print("離線圖磚：目前的圖磚伺服器不允許大量下載，略過預先下載 (請在 config.json 設定 tile_server)")
+            return
+        self.tile_prefetch_started = True
+        def run():
+            from tile_cache import TilePrefetcher
+            prefetcher = TilePrefetcher(tile_cache)
+            stats = prefetcher.run(prefetcher.plan(self.clusters))
+            print(f"離線圖磚：已快取 {stats['cached']}，新下載 {stats['downloaded']}，失敗 {stats['failed']}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def _on_map_checked_in(self, scene_id):
+        marker = self.map_markers.get(scene_id)
+        if marker is not None:
+            marker.change_icon(self._get_pin_icon(True))
+        if getattr(self, 'map_card_scene_id', None) == scene_id and self.map_card.winfo_exists():
+            self._fill_map_card_buttons(self.map_card_btns, self.map_card_scene)
+
+    def _poll_map_viewport(self, token):
+        """TkinterMapView 沒有平移 / 縮放事件，定期檢查可視範圍，有變動才更新標記"""
+        if token.cancelled or not self.map_widget.winfo_exists(): return
+        mw = self.map_widget
+        state = (round(mw.zoom), mw.upper_left_tile_pos, mw.lower_right_tile_pos)
+        if state != self.map_view_state:
+            self.map_view_state = state
+            self._update_map_markers()
+        self.after(150, lambda: self._poll_map_viewport(token))
+
+    def _update_map_markers(self):
+        """只保留可視範圍內的標記：低縮放顯示「N 個景點」泡泡，高縮放顯示單一圖釘"""
+        mw = self.map_widget
+        zoom = round(mw.zoom)
+        north, west = tile_to_latlon(mw.upper_left_tile_pos[0], mw.upper_left_tile_pos[1], zoom)
+        south, east = tile_to_latlon(mw.lower_right_tile_pos[0], mw.lower_right_tile_pos[1], zoom)
+        wanted = {item[1]: item for item in self.map_index.query(zoom, north, west, south, east)}
+
+        for key in [k for k in self.map_markers if k not in wanted]:
+            self.map_markers.pop(key).delete()
+        # 新標記分幾格建立；視角再次變動時，上一批還沒建立的直接放棄
+        if getattr(self, 'map_marker_token', None) is not None: self.map_marker_token.cancel()
+        self.map_marker_token = CancelToken(parent=self.page_token)
+        self.scheduler.run_sliced([item for key, item in wanted.items() if key not in self.map_markers],
+                                  self._add_map_marker, token=self.map_marker_token)
+
+    def _add_map_marker(self, item):
+        mw = self.map_widget
+        key = item[1]
+        if key in self.map_markers: return
+        if item[0] == "pin":
+            _, _, scene, lat, lon = item
+            icon = self._get_pin_icon(self.pm.is_visited(scene['id']))
+            self.map_markers[key] = mw.set_marker(lat, lon, text=None, icon=icon, command=lambda m, data=scene: self.open_map_card(data))
+        else:
+            _, _, count, lat, lon, bounds = item
+            self.map_markers[key] = mw.set_marker(lat, lon, text=None, icon=self._get_bubble_icon(count), command=lambda m, b=bounds: self._zoom_to_bounds(b))
+
+    def _zoom_to_bounds(self, bounds):
+        min_lat, min_lon, max_lat, max_lon = bounds
+        if max_lat - min_lat < 1e-4 and max_lon - min_lon < 1e-4:
+            # 同一個位置的多個景點：直接放大到會顯示單一圖釘的層級
+            self.map_widget.set_position(min_lat, min_lon)
+            self.map_widget.set_zoom(self.map_index.max_zoom + 1)
+            return
+        self.map_widget.fit_bounding_box((max_lat, min_lon), (min_lat, max_lon))
+
+    def _get_bubble_icon(self, count):
+        label = str(count) if count < 1000 else f"{count // 1000}k"
+        key = f"bubble_{label}"
+        if key in self.custom_pins: return self.custom_pins[key]
+        size = 44 if count < 100 else 54
+        img = Image.new("RGBA", (size, size), (0,0,0,0))
+        draw = ImageDraw.Draw(img)
+        draw.ellipse((0, 0, size-1, size-1), fill=(37, 99, 235, 90))
+        draw.ellipse((5, 5, size-6, size-6), fill="#2563EB")
+        fnt = ImageFont.load_default(size=15)
+        bbox = draw.textbbox((0, 0), label, font=fnt)
+        w, h = bbox[2]-bbox[0], bbox[3]-bbox[1]
+        draw.text(((size-w)/2 - bbox[0], (size-h)/2 - bbox[1]), label, fill="white", font=fnt)
+        icon = ImageTk.PhotoImage(img)
+        self.custom_pins[key] = icon
+        return icon
 
     def _get_pin_icon(self, visited):
         color = "#10B981" if visited else "#EF4444"
@@ -409,25 +605,31 @@ class AnitabiApp(ctk.CTk):
         grid.pack(fill="both", expand=True, padx=16, pady=12)
         img = ctk.CTkLabel(grid, text="", width=120, height=90, fg_color="#F1F5F9", corner_radius=8)
         img.pack(side="left")
-        loader.load(scene.get('image'), lambda i: self.after(0, lambda: img.configure(image=i)), size=(120, 90))
+        loader.load(scene.get('image'), lambda i: self.scheduler.post(lambda: img.configure(image=i)), size=(120, 90),
+                    priority=PRIORITY_VISIBLE, token=self.page_token)
         info = ctk.CTkFrame(grid, fg_color="transparent")
         info.pack(side="left", padx=16, fill="both", expand=True)
-        cn = scene.get('cn')
-        title_name = cn if cn and str(cn).lower() != 'nan' else scene['name']
+        title_name = display_name(scene)
         ctk.CTkLabel(info, text=title_name, font=FONT_BOLD, text_color="#0F172A").pack(anchor="w")
         sub_text = f"原名：{scene['name']}  •  {self.format_seconds(scene.get('s'))}"
         ctk.CTkLabel(info, text=sub_text, font=("Arial", 10), text_color="#64748B", anchor="w").pack(anchor="w")
         btns = ctk.CTkFrame(info, fg_color="transparent")
         btns.pack(anchor="w", pady=5)
+        self.map_card_scene_id, self.map_card_scene, self.map_card_btns = scene['id'], scene, btns
+        self._fill_map_card_buttons(btns, scene)
+        ctk.CTkButton(self.map_card, text="✕", width=30, height=30, fg_color="transparent", text_color="#94A3B8", command=self.map_card.destroy).place(relx=0.96, rely=0.05, anchor="ne")
+
+    def _fill_map_card_buttons(self, btns, scene):
+        for w in btns.winfo_children(): w.destroy()
         if self.pm.is_visited(scene['id']):
             ctk.CTkLabel(btns, text="✅ 已完成", text_color="#10B981", font=FONT_BOLD).pack(side="left")
         else:
             ctk.CTkButton(btns, text="打卡 Challenge", height=28, fg_color="#2563EB", command=lambda: self.open_overlay(scene)).pack(side="left")
-        ctk.CTkButton(self.map_card, text="✕", width=30, height=30, fg_color="transparent", text_color="#94A3B8", command=self.map_card.destroy).place(relx=0.96, rely=0.05, anchor="ne")
 
     # ==========================================
     # 📘 Passport
     # ==========================================
+    @metrics.timed("page.passport")
     def show_passport(self):
         self.clear_content()
         scroll = ctk.CTkScrollableFrame(self.content, fg_color="transparent")
@@ -460,22 +662,28 @@ class AnitabiApp(ctk.CTk):
         right_box = ctk.CTkFrame(header_frame, fg_color="transparent")
         right_box.pack(side="right", padx=40)
         total_visited = self.pm.get_visited_count()
-        visited_clusters_count = len([c for c in self.clusters if any(self.pm.is_visited(p['id']) for p in c['points'])])
+        visited_clusters_count = len(self._visited_cluster_names())
         ctk.CTkFrame(right_box, width=2, height=50, fg_color="#E2E8F0").pack(side="right", padx=20)
         def create_stat(parent, num, label):
             f = ctk.CTkFrame(parent, fg_color="transparent")
             f.pack(side="right", padx=20)
-            ctk.CTkLabel(f, text=str(num), font=("Arial", 32, "bold"), text_color="#2563EB").pack()
+            num_lbl = ctk.CTkLabel(f, text=str(num), font=("Arial", 32, "bold"), text_color="#2563EB")
+            num_lbl.pack()
             ctk.CTkLabel(f, text=label, font=("Arial", 11, "bold"), text_color="#94A3B8").pack()
-        create_stat(right_box, visited_clusters_count, "REGIONS")
-        create_stat(right_box, total_visited, "STAMPS")
+            return num_lbl
+        regions_lbl = create_stat(right_box, visited_clusters_count, "REGIONS")
+        stamps_lbl = create_stat(right_box, total_visited, "STAMPS")
+        def update_counters(scene_id):
+            stamps_lbl.configure(text=str(self.pm.get_visited_count()))
+            regions_lbl.configure(text=str(len(self._visited_cluster_names())))
+        self.app_state.subscribe('checked_in', update_counters, owner=self.page_token)
 
         grid_frame = ctk.CTkFrame(scroll, fg_color="transparent")
         grid_frame.pack(fill="both", padx=30, pady=10)
         
         active_clusters = []
         for c in self.clusters:
-            visited_in_cluster = [p for p in c['points'] if self.pm.is_visited(p['id'])]
+            visited_in_cluster = [c['points'][i] for i, pid in enumerate(c['ids']) if self.pm.is_visited(pid)]
             if visited_in_cluster:
                 active_clusters.append({"cluster_data": c, "visited_scenes": visited_in_cluster})
         
@@ -483,9 +691,12 @@ class AnitabiApp(ctk.CTk):
              ctk.CTkLabel(scroll, text="尚未有旅程紀錄，快去地圖打卡吧！", font=FONT_TITLE, text_color="#94a3b8").pack(pady=50)
              return
 
-        for i, item in enumerate(active_clusters):
-            row, col = divmod(i, 3) 
-            self.create_region_collection_card(grid_frame, item, row, col)
+        self.scheduler.run_sliced(enumerate(active_clusters),
+                                  lambda ic: self.create_region_collection_card(grid_frame, ic[1], *divmod(ic[0], 3)),
+                                  token=self.page_token)
+
+    def _visited_cluster_names(self):
+        return {self.scene_to_cluster_map[sid] for sid in self.pm.visited_ids if sid in self.scene_to_cluster_map}
 
     def create_region_collection_card(self, parent, item, row, col):
         cluster = item['cluster_data']
@@ -502,18 +713,8 @@ class AnitabiApp(ctk.CTk):
         img_container.bind("<Button-1>", on_click)
         rep_point = cluster['points'][0]
         rep_image_url = rep_point.get('image')
-        def heavy_gradient_processor(img):
-            if img.mode != 'RGBA': img = img.convert('RGBA')
-            overlay = Image.new('RGBA', img.size, (0,0,0,0))
-            draw = ImageDraw.Draw(overlay)
-            w, h = img.size
-            gradient_h = int(h * 0.7) 
-            start_y = h - gradient_h
-            for y in range(gradient_h):
-                alpha = int(240 * (y / gradient_h))
-                draw.line([(0, start_y + y), (w, start_y + y)], fill=(0, 0, 0, alpha))
-            return Image.alpha_composite(img, overlay)
-        loader.load(rep_image_url, lambda i: self.after(0, lambda: img_container.configure(image=i)), size=(280, img_h), processor=heavy_gradient_processor)
+        token = self.page_token
+        loader.load(rep_image_url, lambda i: self.scheduler.post(lambda: img_container.configure(image=i), token), size=(280, img_h), processor="heavy_gradient", token=token)
         lbl_series = ctk.CTkLabel(img_container, text="REGION COLLECTION", font=("Arial", 9, "bold"), text_color="#E2E8F0", bg_color="transparent")
         lbl_series.place(x=15, y=145)
         lbl_title = ctk.CTkLabel(img_container, text=cluster['name'], font=(FONT_UI, 18, "bold"), text_color="white", bg_color="transparent")
@@ -546,37 +747,42 @@ class AnitabiApp(ctk.CTk):
         ctk.CTkLabel(info_frame, text=f"共 {len(scenes)} 張回憶卡", font=("Arial", 12), text_color="#64748B").pack(anchor="w")
         grid = ctk.CTkFrame(scroll, fg_color="transparent")
         grid.pack(fill="both", padx=40, pady=10)
-        for i, s in enumerate(scenes):
-            r, c = divmod(i, 3) 
-            self.create_memory_polaroid(grid, s, r, c)
+        self.scheduler.run_sliced(enumerate(scenes), lambda ic: self.create_memory_polaroid(grid, ic[1], *divmod(ic[0], 3)),
+                                  token=self.page_token)
 
     def create_memory_polaroid(self, parent, scene, row, col):
         card = ctk.CTkFrame(parent, width=280, height=320, fg_color="transparent")
         card.grid(row=row, column=col, padx=15, pady=15)
-        file_path = os.path.join(SAVE_DIR, f"{scene['id']}.png")
         img_lbl = ctk.CTkLabel(card, text="", corner_radius=8)
         img_lbl.pack()
-        def load_image_smartly():
-            target_path = file_path if os.path.exists(file_path) else None
-            if target_path:
-                try: pil = Image.open(target_path)
-                except: pil = None
-            else:
-                try:
-                    r = requests.get(scene.get('image'), timeout=3)
-                    pil = Image.open(BytesIO(r.content)).convert("RGB")
-                except: pil = None
-            if pil:
-                w_disp = 280
-                # 只要維持原圖比例縮放即可
-                ratio = w_disp / pil.width
-                h_disp = int(pil.height * ratio)
-                pil_resized = pil.resize((w_disp, h_disp), Image.LANCZOS)
-                ctk_img = ctk.CTkImage(pil_resized, size=(w_disp, h_disp))
-                self.after(0, lambda: img_lbl.configure(image=ctk_img))
-            else:
-                self.after(0, lambda: img_lbl.configure(text="No Image", text_color="grey"))
-        threading.Thread(target=load_image_smartly).start()
+        token = self.page_token
+
+        def show(future):
+            img = future.result() if not future.cancelled() else None
+            def apply():
+                if not img_lbl.winfo_exists(): return
+                if img is None: img_lbl.configure(text="No Image", text_color="grey")
+                else: img_lbl.configure(image=img)
+            self.scheduler.post(apply, token)
+
+        def load_thumb(thumb):
+            img_lbl.configure(width=thumb['w'], height=thumb['h'])
+            future = loader.load(thumb['path'], lambda i: None, priority=PRIORITY_VISIBLE, token=token)
+            future.add_done_callback(show)
+
+        # 縮圖索引有紀錄就直接排版並載入小縮圖；過期的交給背景工作池補做
+        thumb = memory_thumbs.get(scene['id'])
+        if thumb:
+            load_thumb(thumb)
+        elif thumb is False:
+            render_worker.submit(('thumb', scene['id']), lambda progress: memory_thumbs.ensure(scene['id']), token=CancelToken(token),
+                                 on_done=lambda t: self.scheduler.post(lambda: load_thumb(t) if img_lbl.winfo_exists() else None),
+                                 on_error=lambda e: print(f"縮圖製作失敗: {e}"))
+        else:
+            # 還沒有卡片 (例如舊版的打卡紀錄)，顯示場景圖
+            future = loader.load(scene.get('image'), lambda i: None, size=(280, 158), priority=PRIORITY_VISIBLE, token=token)
+            if future: future.add_done_callback(show)
+            else: img_lbl.configure(text="No Image", text_color="grey")
 
     # ==========================================
     # 🌑 打卡 Overlay 
@@ -606,7 +812,8 @@ class AnitabiApp(ctk.CTk):
         # 1. Scene Image (Top)
         scene_lbl = ctk.CTkLabel(card_frame, text="", width=card_w, height=h1, corner_radius=0)
         scene_lbl.place(x=0, y=0)
-        loader.load(scene.get('image'), lambda i: self.after(0, lambda: scene_lbl.configure(image=i)), size=(card_w, h1))
+        loader.load(scene.get('image'), lambda i: self.scheduler.post(lambda: scene_lbl.configure(image=i)), size=(card_w, h1),
+                    priority=PRIORITY_VISIBLE)
         
         # 2. User Image (Middle)
         user_lbl = ctk.CTkLabel(card_frame, text="📷 Upload Photo", font=("Arial", 14), text_color="#94A3B8", fg_color="#F1F5F9", width=card_w, height=h2, corner_radius=0)
@@ -616,7 +823,7 @@ class AnitabiApp(ctk.CTk):
         info_area = ctk.CTkFrame(card_frame, fg_color="white", width=card_w, height=h3, corner_radius=0)
         info_area.place(x=0, y=h1 + h2)
         
-        cn_name = scene.get('cn') if scene.get('cn') and str(scene.get('cn')).lower() != 'nan' else scene['name']
+        cn_name = display_name(scene)
         ctk.CTkLabel(info_area, text=cn_name, font=("Microsoft JhengHei", 18, "bold"), text_color="black", anchor="w").place(x=20, y=15)
         sub_info = f"{scene['name']} | {self.format_seconds(scene.get('s'))}"
         ctk.CTkLabel(info_area, text=sub_info, font=("Arial", 11), text_color="#64748B", anchor="w").place(x=20, y=45)
@@ -631,16 +838,17 @@ class AnitabiApp(ctk.CTk):
 
         ctrl_frame = ctk.CTkFrame(container, fg_color="transparent")
         ctrl_frame.pack()
-        self.user_upload_pil = None 
+        # 只記住照片路徑，預覽與製作卡片都從縮圖金字塔取需要的大小，不把原圖留在記憶體；
+        # 路徑屬於這個視窗 (同時開著的其他製作視窗不會互相覆蓋)
+        upload = {"path": None}
 
         def _select_photo(event=None):
             path = filedialog.askopenfilename(filetypes=[("Images", "*.jpg;*.png;*.jpeg")])
             if path:
                 try:
-                    pil = Image.open(path).convert("RGB")
-                    self.user_upload_pil = pil 
                     # UI 顯示 (Object Fit: Cover)
-                    display_img = ImageOps.fit(pil, (card_w, h2), method=Image.LANCZOS)
+                    display_img = ingest.thumbnail(path, (card_w, h2))
+                    upload['path'] = path
                     ctk_img = ctk.CTkImage(display_img, size=(card_w, h2))
                     user_lbl.configure(image=ctk_img, text="") 
                     btn_save.configure(state="normal", fg_color="#2563EB") 
@@ -651,70 +859,78 @@ class AnitabiApp(ctk.CTk):
         # --- 2. 存檔部分 (Logic) ---
 
         def _save_and_close():
-            if not self.user_upload_pil: return
-            try:
-                scale = 3 
-                out_w, out_h = card_w * scale, card_h * scale
-                
-                # 計算真實像素高度 (Strict Ratio)
-                h1_real = h1 * scale
-                h2_real = h2 * scale
-                h3_real = out_h - h1_real - h2_real
-                
-                canvas = Image.new("RGB", (out_w, out_h), "white")
-                draw = ImageDraw.Draw(canvas)
-                
-                # 1. Scene Image
-                r = requests.get(scene.get('image'))
-                scene_pil = Image.open(BytesIO(r.content)).convert("RGB")
-                scene_resized = ImageOps.fit(scene_pil, (out_w, h1_real), method=Image.LANCZOS)
-                canvas.paste(scene_resized, (0, 0))
-                
-                # 2. User Image
-                user_resized = ImageOps.fit(self.user_upload_pil, (out_w, h2_real), method=Image.LANCZOS)
-                canvas.paste(user_resized, (0, h1_real))
-                
-                # 3. Info Area (White Background)
-                info_y_real = h1_real + h2_real
-                draw.rectangle([(0, info_y_real), (out_w, out_h)], fill="white")
-
-                # 4. Text
-                font_path = "arial.ttf" 
-                system = platform.system()
-                if system == "Darwin": font_path = "/System/Library/Fonts/PingFang.ttc" 
-                elif system == "Windows": font_path = "msjh.ttc"
-                try:
-                    font_title = ImageFont.truetype(font_path, 18 * scale) 
-                    font_sub = ImageFont.truetype("Arial.ttf", 11 * scale)
-                except:
-                    font_title = ImageFont.load_default()
-                    font_sub = ImageFont.load_default()
-                
-                text_x = 20 * scale
-                # 文字基線相對於 info_y_real
-                draw.text((text_x, info_y_real + 15*scale), cn_name, fill="black", font=font_title)
-                draw.text((text_x, info_y_real + 50*scale), sub_info, fill="#64748B", font=font_sub)
-                draw.text((text_x, info_y_real + 75*scale), f"{date_str} • Takayama/Tokyo", fill="#94A3B8", font=font_sub)
-                
-                # 5. Stamp
-                stamp_cx, stamp_cy = out_w - 50*scale, info_y_real + 40*scale
-                r = 35 * scale
-                draw.ellipse((stamp_cx-r, stamp_cy-r, stamp_cx+r, stamp_cy+r), outline="#EF4444", width=3*scale)
-                draw.text((stamp_cx-25*scale, stamp_cy-10*scale), "ANITRIP", fill="#EF4444", font=font_sub)
-                draw.text((stamp_cx-25*scale, stamp_cy+5*scale), "SCENE", fill="#EF4444", font=font_sub)
-
-                file_name = f"{scene['id']}.png"
-                save_path = os.path.join(SAVE_DIR, file_name)
-                canvas.save(save_path)
-                
-                self.pm.check_in(scene['id'])
-                messagebox.showinfo("Success", "Scene Card 已製作並收藏！")
-                top.destroy()
-                self.show_feed() 
-            except Exception as e:
-                messagebox.showerror("Save Error", str(e))
+            user_path = upload['path']
+            if not user_path: return
+            cluster_id = self.scene_to_cluster_id.get(scene['id'])
+
+            def render(progress):
+                # 重用載入器已解碼的場景原圖，不在記憶體時才讀磁碟快取
+                progress(0.05, "準備場景圖片")
+                scene_pil = loader.get_source(scene.get('image'))
+                user_pil = ingest.load(user_path, (card_w * 3, h2 * 3))
+                card = self.ig.create_scene_card(scene_pil, user_pil, cn_name, sub_info, f"{date_str} • Takayama/Tokyo",
+                                                 card_size=(card_w, card_h), scale=3, progress=progress)
+                progress(0.85, "保存照片")
+                # 照片也留一份，之後可用 batch_export.py 換版型 / 解析度重新輸出
+                save_user_photo(scene['id'], user_path)
+                return card
+
+            def on_progress(fraction, message):
+                def update():
+                    if progress_bar.winfo_exists():
+                        progress_bar.set(fraction)
+                        status_lbl.configure(text=message)
+                self.scheduler.post(update)
+
+            def on_done(card):
+                # 編碼 (CARD_FORMAT) 交給另一個工作池，製作工作池可以先做下一張
+                self.scheduler.post(lambda: status_lbl.configure(text="編碼存檔") if status_lbl.winfo_exists() else None)
+                card_encoder.submit(card, scene['id'], save_dir=get_save_dir(), on_done=lambda path: on_saved(card, path),
+                                    on_error=on_error)
+
+            def on_saved(card, save_path):
+                memory_thumbs.make(scene['id'], card)
+                def finish():
+                    self.app_state.check_in(scene['id'], card_path=save_path, cluster_id=cluster_id)
+                    if top.winfo_exists(): top.destroy()
+                    messagebox.showinfo("Success", f"{cn_name} 的 Scene Card 已製作並收藏！")
+                self.scheduler.post(finish)
+
+            def on_error(e):
+                def fail():
+                    if top.winfo_exists():
+                        _set_rendering(False)
+                        status_lbl.configure(text="已取消" if isinstance(e, RenderCancelled) else "製作失敗")
+                    if not isinstance(e, RenderCancelled):
+                        messagebox.showerror("Save Error", str(e))
+                self.scheduler.post(fail)
+
+            job = render_worker.submit(scene['id'], render, on_progress=on_progress, on_done=on_done, on_error=on_error)
+            btn_cancel.configure(command=job.cancel)
+            _set_rendering(True)
+
+        def _set_rendering(rendering):
+            # 製作中可以關閉視窗 (在背景繼續製作) 或取消
+            if rendering:
+                btn_upload.pack_forget()
+                btn_save.pack_forget()
+                progress_bar.set(0)
+                progress_box.pack(side="left", padx=10)
+                btn_cancel.pack(side="left", padx=10)
+                top.grab_release()
+            else:
+                progress_box.pack_forget()
+                btn_cancel.pack_forget()
+                btn_upload.pack(side="left", padx=10)
+                btn_save.pack(side="left", padx=10)
 
         btn_upload = ctk.CTkButton(ctrl_frame, text="📷 Select Photo", command=_select_photo, width=160, height=40, fg_color="#334155", hover_color="#475569")
         btn_upload.pack(side="left", padx=10)
         btn_save = ctk.CTkButton(ctrl_frame, text="💾 Generate Scene Card", command=_save_and_close, width=200, height=40, fg_color="#94A3B8", state="disabled") 
-        btn_save.pack(side="left", padx=10)
\ No newline at end of file
+        btn_save.pack(side="left", padx=10)
+        progress_box = ctk.CTkFrame(ctrl_frame, fg_color="transparent")
+        progress_bar = ctk.CTkProgressBar(progress_box, width=220)
+        progress_bar.pack(pady=(6, 4))
+        status_lbl = ctk.CTkLabel(progress_box, text="", font=FONT_MAIN, text_color="#CBD5E1")
+        status_lbl.pack()
+        btn_cancel = ctk.CTkButton(ctrl_frame, text="✖ Cancel", width=120, height=40, fg_color="#475569", hover_color="#64748B")
@@ -0,0 +1,84 @@
+import threading
+from urllib.parse import urlsplit
+
+import config
+
+class HttpClient:
+    """全程式共用的 HTTP 客戶端
+
+    - 每個主機維持 keep-alive 連線池 (重用 TLS 連線)
+    - 統一的逾時設定
+    - 連線失敗 / 5xx / 429 時有上限的重試 (指數退避)
+    - 限制同時對同一主機發出的請求數
+
+    requests 在第一次發出請求時才匯入 (通常在背景執行緒)，不拖慢啟動。
+    """
+
+    def __init__(self, timeout=config.HTTP_TIMEOUT, retries=config.HTTP_RETRIES, backoff=config.HTTP_BACKOFF,
+                 pool_size=config.HTTP_POOL_SIZE, per_host_limit=config.HTTP_PER_HOST_LIMIT):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.per_host_limit = per_host_limit
+        self._session = None
+        self.host_slots = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    @property
+    def session(self):
+        with self.lock:
+            if self._session is None:
+                self._session = self._build_session()
+            return self._session
+
+    def _build_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        session.headers['User-Agent'] = config.HTTP_USER_AGENT
+        retry = Retry(total=self.retries, backoff_factor=self.backoff,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'HEAD']),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self.host_slots[host]
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        """發出 GET 請求 (參數同 requests.get)"""
+        with self._slot(url):
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+            except Exception:
+                self._count(errors=1)
+                raise
+        # urllib3 在連線層重試，重試紀錄留在回應的 Retry 物件上
+        retry = getattr(response.raw, 'retries', None)
+        self._count(requests=1, retries=len(retry.history) if retry is not None else 0)
+        return response
+
+    def _count(self, **counts):
+        with self.lock:
+            for name, n in counts.items():
+                self.stats[name] += n
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+http_client = HttpClient()
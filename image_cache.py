@@ -0,0 +1,252 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from http_client import http_client
+
+class DiskImageCache:
+    """以 URL 為鍵的圖片磁碟快取 (內容定址 + LRU 容量上限)
+
+    每個 URL 以 sha256 命名存成一個檔案，index.json 記錄
+    ETag / Last-Modified、檔案大小與最後存取時間。
+    索引不會每次寫入都存檔：累積 flush_every 筆新檔案、有淘汰時或程式結束時才寫回。
+    """
+
+    def __init__(self, cache_dir=config.IMAGE_CACHE_DIR, max_bytes=config.IMAGE_CACHE_MAX_BYTES,
+                 revalidate_after=config.IMAGE_CACHE_REVALIDATE_AFTER, client=None,
+                 flush_every=config.IMAGE_CACHE_FLUSH_EVERY):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.client = client or http_client
+        self.flush_every = flush_every
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()   # 寫檔不佔用 self.lock，下載不必排隊等存檔
+        self.index = None      # 延遲到第一次使用才讀取
+        self.total_bytes = 0
+        self.dirty = False
+        self.unflushed = 0     # 上次存檔後新增的檔案數
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0, "stale": 0}
+
+    # --- 索引 ---
+    def _ensure_index(self):
+        if self.index is not None: return
+        self.index = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"讀取圖片快取索引失敗: {e}")
+        # 移除檔案已不存在的紀錄
+        for key in [k for k in self.index if not os.path.exists(self._blob_path(k))]:
+            del self.index[key]
+        self.total_bytes = sum(e['size'] for e in self.index.values())
+
+    def flush(self):
+        """將索引寫回磁碟 (先寫暫存檔再 rename，避免寫到一半損毀)"""
+        with self.flush_lock:
+            # 只在複製索引時持有 self.lock，寫檔期間其他執行緒照常讀寫快取
+            with self.lock:
+                if not self.dirty or self.index is None: return
+                text = json.dumps(self.index, ensure_ascii=False)
+                self.dirty = False
+                self.unflushed = 0
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = self.index_file + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp_path, self.index_file)
+            except Exception as e:
+                print(f"圖片快取索引存檔失敗: {e}")
+                with self.lock: self.dirty = True
+
+    @staticmethod
+    def key_for(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    # --- 讀寫 ---
+    def get(self, url):
+        """只查快取，不連網；沒有則回傳 None"""
+        with self.lock:
+            self._ensure_index()
+            entry = self.index.get(self.key_for(url))
+            if entry is None: return None
+            data = self._read_blob(self.key_for(url))
+            if data is not None:
+                entry['atime'] = time.time()
+                self.dirty = True
+            return data
+
+    def path(self, url):
+        """快取檔案的路徑 (給其他行程直接讀取，不經過索引)；沒有快取回傳 None"""
+        with self.lock:
+            self._ensure_index()
+            if self.key_for(url) not in self.index: return None
+        return self._blob_path(self.key_for(url))
+
+    def _read_blob(self, key):
+        try:
+            with open(self._blob_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            self._remove(key)
+            return None
+
+    def put(self, url, data, etag=None, last_modified=None):
+        key = self.key_for(url)
+        path = self._blob_path(key)
+        with self.lock:
+            self._ensure_index()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"圖片快取寫入失敗: {e}")
+                return
+            old = self.index.get(key)
+            if old: self.total_bytes -= old['size']
+            now = time.time()
+            self.index[key] = {"url": url, "etag": etag, "last_modified": last_modified,
+                               "size": len(data), "fetched": now, "atime": now}
+            self.total_bytes += len(data)
+            evicted = self._evict()
+            self.dirty = True
+            self.unflushed += 1
+            flush = evicted or self.unflushed >= self.flush_every
+        # 索引裡的檔案已刪除時要盡快存檔，否則只有累積夠多筆才存
+        if flush: self.flush()
+
+    def _remove(self, key):
+        entry = self.index.pop(key, None)
+        if entry: self.total_bytes -= entry['size']
+        try: os.remove(self._blob_path(key))
+        except OSError: pass
+        self.dirty = True
+
+    def _evict(self):
+        """超過容量上限時，從最久沒用的開始刪；回傳刪除的檔案數"""
+        if self.total_bytes <= self.max_bytes: return 0
+        evicted = 0
+        for key, _ in sorted(self.index.items(), key=lambda kv: kv[1]['atime']):
+            if self.total_bytes <= self.max_bytes: break
+            self._remove(key)
+            evicted += 1
+        self.stats['evictions'] += evicted
+        return evicted
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.index or ()), bytes=self.total_bytes)
+
+    # --- 對外主要介面 ---
+    def fetch(self, url, timeout=None):
+        """取得圖片原始位元組：有快取直接回傳 (不連網)，過期才重新驗證，離線時回傳舊資料"""
+        key = self.key_for(url)
+        with self.lock:
+            self._ensure_index()
+            entry = self.index.get(key)
+            entry = dict(entry) if entry else None
+        cached = self.get(url) if entry else None
+
+        if cached is not None and time.time() - entry['fetched'] < self.revalidate_after:
+            self._count('hits')
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.client.get(url, headers=headers, timeout=timeout)
+            if cached is not None and response.status_code == 304:
+                self._count('revalidated')
+                with self.lock:
+                    if key in self.index:
+                        self.index[key]['fetched'] = time.time()
+                        self.dirty = True
+                return cached
+            response.raise_for_status()
+        except Exception:
+            if cached is not None:
+                # 離線或伺服器錯誤時，先用舊的快取頂著
+                self._count('stale')
+                return cached
+            raise
+        self._count('misses')
+        data = response.content
+        self.put(url, data, etag=response.headers.get('ETag'),
+                 last_modified=response.headers.get('Last-Modified'))
+        return data
+
+class MemoryImageCache:
+    """已解碼圖片的記憶體 LRU 快取，以像素位元組 (寬 x 高 x 色版數) 計算容量"""
+
+    def __init__(self, max_bytes=config.MEMORY_IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()   # key -> (value, nbytes)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def pixel_bytes(pil_img):
+        return pil_img.width * pil_img.height * len(pil_img.getbands())
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def put(self, key, value, nbytes):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old: self.total_bytes -= old[1]
+            if nbytes > self.max_bytes: return
+            self.entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self.entries), "bytes": self.total_bytes}
+
+image_cache = DiskImageCache()
+atexit.register(image_cache.flush)
@@ -1,15 +1,222 @@
 from PIL import Image, ImageDraw, ImageFont
-import requests
 from io import BytesIO
 import datetime
+import functools
+import platform
+import threading
+
+from image_cache import image_cache
+from metrics import metrics
+
+# ==========================================
+# 📐 卡片版型 (宣告式)
+# ==========================================
+# size：基準尺寸 (輸出時乘上 scale)
+# regions：box = (x, y, w, h) 為相對 size 的比例；image 為要填入的圖片，fill 為底色
+# texts：xy 為區塊內的基準像素座標 (x 為負數時從區塊右邊算起)
+# stamp：印章中心 (座標規則同 texts)、半徑與文字；可另指定線寬、字級與文字相對中心的位置
+TEMPLATES = {
+    # 場景 45% / 使用者照片 30% / 資訊 25%
+    "Classic": {
+        "size": (360, 540), "background": "white",
+        "regions": {
+            "scene": {"box": (0, 0, 1, 0.45), "image": "scene"},
+            "user": {"box": (0, 0.45, 1, 0.30), "image": "user"},
+            "info": {"box": (0, 0.75, 1, 0.25), "fill": "white"},
+        },
+        "texts": [
+            {"field": "title", "region": "info", "xy": (20, 15), "font": "title", "size": 18, "fill": "black"},
+            {"field": "subtitle", "region": "info", "xy": (20, 50), "font": "sub", "size": 11, "fill": "#64748B"},
+            {"field": "footer", "region": "info", "xy": (20, 75), "font": "sub", "size": 11, "fill": "#94A3B8"},
+        ],
+        "stamp": {"region": "info", "center": (-50, 40), "radius": 35, "color": "#EF4444", "lines": ("ANITRIP", "SCENE")},
+    },
+    # 場景與使用者照片左右並排 (橫式)
+    "Split": {
+        "size": (480, 400), "background": "white",
+        "regions": {
+            "scene": {"box": (0, 0, 0.5, 0.72), "image": "scene"},
+            "user": {"box": (0.5, 0, 0.5, 0.72), "image": "user"},
+            "info": {"box": (0, 0.72, 1, 0.28), "fill": "white"},
+        },
+        "texts": [
+            {"field": "title", "region": "info", "xy": (20, 16), "font": "title", "size": 18, "fill": "black"},
+            {"field": "subtitle", "region": "info", "xy": (20, 50), "font": "sub", "size": 11, "fill": "#64748B"},
+            {"field": "footer", "region": "info", "xy": (20, 75), "font": "sub", "size": 11, "fill": "#94A3B8"},
+        ],
+        "stamp": {"region": "info", "center": (-50, 56), "radius": 35, "color": "#EF4444", "lines": ("ANITRIP", "SCENE")},
+    },
+    # 拍立得：四周留白，場景在上、照片在下
+    "Polaroid": {
+        "size": (400, 560), "background": "#F8FAFC",
+        "regions": {
+            "scene": {"box": (0.05, 0.035, 0.9, 0.45), "image": "scene"},
+            "user": {"box": (0.05, 0.5, 0.9, 0.28), "image": "user"},
+            "info": {"box": (0, 0.8, 1, 0.2)},
+        },
+        "texts": [
+            {"field": "title", "region": "info", "xy": (24, 12), "font": "title", "size": 18, "fill": "#0F172A"},
+            {"field": "subtitle", "region": "info", "xy": (24, 46), "font": "sub", "size": 11, "fill": "#64748B"},
+            {"field": "footer", "region": "info", "xy": (24, 70), "font": "sub", "size": 11, "fill": "#94A3B8"},
+        ],
+        "stamp": {"region": "info", "center": (-54, 52), "radius": 35, "color": "#EF4444", "lines": ("ANITRIP", "SCENE")},
+    },
+    # create_card 原本的 800x1066 (3:4) 版面：場景與照片各 30%，右下角 VERIFIED 印章
+    "Verified": {
+        "size": (800, 1066), "background": "#F9FAFB",
+        "regions": {
+            "scene": {"box": (0, 0, 1, 0.3), "image": "scene"},
+            "user": {"box": (0, 0.3, 1, 0.3), "image": "user"},
+            "info": {"box": (0, 0.6, 1, 0.4)},
+        },
+        "texts": [
+            {"field": "title", "region": "info", "xy": (30, 30), "font": "title", "size": 40, "fill": "#1F2937"},
+            {"field": "subtitle", "region": "info", "xy": (30, 90), "font": "sub", "size": 20, "fill": "#4B5563"},
+            {"field": "footer", "region": "info", "xy": (30, 120), "font": "sub", "size": 20, "fill": "#6B7280"},
+        ],
+        "stamp": {"region": "info", "center": (-90, 337), "radius": 60, "color": "red", "lines": ("VERIFIED",),
+                  "width": 5, "font_size": 20, "text_xy": (-40, -10)},
+    },
+}
+
+# 各系統的字型候選 (依序嘗試，都失敗就用 Pillow 內建字型)
+if platform.system() == "Darwin":
+    FONT_CANDIDATES = {"title": ["/System/Library/Fonts/PingFang.ttc", "Arial.ttf"], "sub": ["Arial.ttf"]}
+elif platform.system() == "Windows":
+    FONT_CANDIDATES = {"title": ["msjh.ttc", "arial.ttf"], "sub": ["Arial.ttf", "arial.ttf"]}
+else:
+    FONT_CANDIDATES = {"title": ["arial.ttf", "DejaVuSans.ttf"], "sub": ["Arial.ttf", "arial.ttf", "DejaVuSans.ttf"]}
+
+@functools.lru_cache(maxsize=64)
+def load_font(role, size):
+    """依角色 (title / sub) 與像素大小取得字型 (快取，每種只載入一次)"""
+    for path in FONT_CANDIDATES.get(role, []):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+def fit_cover(image, size):
+    """裁切並縮放圖片以填滿區域 (Object Fit: Cover)
+
+    resize 時直接指定來源範圍，一次完成裁切與縮放；reducing_gap 讓大圖先以整數倍
+    縮小 (box filter)，剩下至少 1.5 倍再做 LANCZOS，手機原圖縮成卡片大小時快兩倍以上。
+    """
+    w, h = size
+    src_w, src_h = image.size
+    ratio = max(w / src_w, h / src_h)
+    crop_w, crop_h = w / ratio, h / ratio
+    left, top = (src_w - crop_w) / 2, (src_h - crop_h) / 2
+    return image.resize((w, h), Image.LANCZOS, box=(left, top, left + crop_w, top + crop_h), reducing_gap=1.5)
+
+# ==========================================
+# 🖨️ 卡片渲染引擎
+# ==========================================
+class CardRenderer:
+    """依 TEMPLATES 合成卡片
+
+    版面 (區塊座標、字型、預先畫好的印章圖層) 依 (版型, 尺寸, scale) 計算一次後快取，
+    之後每張卡片只剩縮放圖片與畫文字。不碰任何 Tk 物件，可在背景執行緒執行。
+    """
+
+    def __init__(self, templates=TEMPLATES):
+        self.templates = templates
+        self.layouts = {}    # (template, size, scale) -> 版面
+        self.lock = threading.Lock()
+
+    def layout(self, template, scale=3, size=None):
+        spec = self.templates[template]
+        key = (template, tuple(size or spec['size']), scale)
+        with self.lock:
+            if key not in self.layouts:
+                self.layouts[key] = self._build_layout(spec, key[1], scale)
+            return self.layouts[key]
+
+    def _build_layout(self, spec, size, scale):
+        base_w, base_h = size
+        regions = {}
+        for name, region in spec['regions'].items():
+            x, y, w, h = region['box']
+            regions[name] = (int(base_w * x) * scale, int(base_h * y) * scale,
+                             int(base_w * w) * scale, int(base_h * h) * scale)
+
+        def place(region, xy):
+            left, top, width, _ = regions[region]
+            x, y = xy
+            return (left + width + x * scale if x < 0 else left + x * scale, top + y * scale)
+
+        stamp = None
+        if spec.get('stamp'):
+            cx, cy = place(spec['stamp']['region'], spec['stamp']['center'])
+            layer = self._stamp_layer(spec['stamp'], scale)
+            stamp = (layer, (cx - layer.width // 2, cy - layer.height // 2))
+        return {
+            "size": (base_w * scale, base_h * scale),
+            "background": spec.get('background', 'white'),
+            "images": [(r['image'], regions[n]) for n, r in spec['regions'].items() if r.get('image')],
+            "fills": [(regions[n], r['fill']) for n, r in spec['regions'].items() if r.get('fill')],
+            "texts": [(t['field'], place(t['region'], t['xy']), load_font(t['font'], t['size'] * scale), t['fill'])
+                      for t in spec.get('texts', [])],
+            "stamp": stamp,
+        }
+
+    def _stamp_layer(self, stamp, scale):
+        """印章畫在透明圖層上，之後直接以 alpha 貼上"""
+        r = stamp['radius'] * scale
+        c = r + 2 * scale
+        layer = Image.new("RGBA", (2 * c, 2 * c), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(layer)
+        draw.ellipse((c - r, c - r, c + r, c + r), outline=stamp['color'], width=stamp.get('width', 3) * scale)
+        font = load_font("sub", stamp.get('font_size', 11) * scale)
+        tx, ty = stamp.get('text_xy', (-25, -10))
+        for i, text in enumerate(stamp.get('lines', ())):
+            draw.text((c + tx * scale, c + (ty + 15 * i) * scale), text, fill=stamp['color'], font=font)
+        return layer
+
+    @metrics.timed("card.render")
+    def render(self, template, images, texts, scale=3, size=None, progress=None):
+        """images: {'scene': PIL, 'user': PIL}；texts: {'title', 'subtitle', 'footer'}
+
+        size 可覆寫版型的基準尺寸；progress(比例, 說明) 會在各步驟之間呼叫，
+        可在裡面丟出例外以中止製作。
+        """
+        report = progress or (lambda fraction, message: None)
+        layout = self.layout(template, scale, size)
+        canvas = Image.new("RGB", layout['size'], layout['background'])
+
+        for i, (source, (left, top, width, height)) in enumerate(layout['images']):
+            report(0.2 + 0.45 * i / len(layout['images']), "縮放場景圖片" if source == "scene" else "縮放你的照片")
+            img = images.get(source)
+            if img is None: continue
+            if img.mode != "RGB": img = img.convert("RGB")
+            canvas.paste(fit_cover(img, (width, height)), (left, top))
+
+        report(0.65, "繪製文字與印章")
+        draw = ImageDraw.Draw(canvas)
+        for (left, top, width, height), fill in layout['fills']:
+            draw.rectangle([(left, top), (left + width, top + height)], fill=fill)
+        for field, xy, font, fill in layout['texts']:
+            if texts.get(field): draw.text(xy, str(texts[field]), fill=fill, font=font)
+        if layout['stamp']:
+            layer, xy = layout['stamp']
+            canvas.paste(layer, xy, layer)
+        return canvas
+
+card_renderer = CardRenderer()
 
 class ImageGenerator:
+    def __init__(self, renderer=None):
+        self.renderer = renderer or card_renderer
+
     def load_image_from_url(self, url):
-        """從網址下載圖片 (需要 requests)"""
+        """從網址下載圖片 (經由磁碟快取，離線時使用已快取的版本)"""
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            return Image.open(BytesIO(response.content)).convert("RGB")
+            data = image_cache.fetch(url)
+            return Image.open(BytesIO(data)).convert("RGB")
         except Exception as e:
             print(f"圖片下載失敗: {e}")
             # 回傳一張灰底圖當作錯誤替代
@@ -17,64 +224,73 @@ class ImageGenerator:
 
     def resize_cover(self, image, target_width, target_height):
         """裁切並縮放圖片以填滿區域 (Object Fit: Cover)"""
-        img_ratio = image.width / image.height
-        target_ratio = target_width / target_height
-        
-        if img_ratio > target_ratio:
-            new_height = target_height
-            new_width = int(new_height * img_ratio)
-            img = image.resize((new_width, new_height), Image.LANCZOS)
-            left = (new_width - target_width) / 2
-            img = img.crop((left, 0, left + target_width, target_height))
-        else:
-            new_width = target_width
-            new_height = int(new_width / img_ratio)
-            img = image.resize((new_width, new_height), Image.LANCZOS)
-            top = (new_height - target_height) / 2
-            img = img.crop((0, top, target_width, top + target_height))
-        return img
-
-    def create_card(self, scene_img, user_img, title, location, date_str, layout="Classic"):
-        """生成合成卡片"""
-        base_width = 800
-        target_size = (base_width, int(base_width * 4/3)) # 3:4 比例
-        cw, ch = target_size
-        
-        bg_color = "#F9FAFB"
-        text_color = "#1F2937"
-        
-        # 建立畫布
-        canvas = Image.new("RGB", target_size, bg_color)
+        return fit_cover(image, (target_width, target_height))
+
+    def create_card(self, scene_img, user_img, title, location, date_str, layout="Verified"):
+        """生成合成卡片 (layout 為 TEMPLATES 中的版型名稱，預設為原本 800x1066 的 VERIFIED 版面)"""
+        return self.renderer.render(layout, {"scene": scene_img, "user": user_img},
+                                    {"title": title, "subtitle": f"Location: {location}", "footer": f"Date: {date_str}"},
+                                    scale=1)
+
+    def create_scene_card(self, scene_img, user_img, title, subtitle, footer, card_size=None, scale=3,
+                          progress=None, template="Classic"):
+        """Scene Card，輸出為版型基準尺寸 (或 card_size) 的 scale 倍
+
+        progress(比例, 說明) 會在各步驟之間呼叫，可在裡面丟出例外以中止製作。
+        """
+        return self.renderer.render(template, {"scene": scene_img, "user": user_img},
+                                    {"title": title, "subtitle": subtitle, "footer": footer},
+                                    scale=scale, size=card_size, progress=progress)
+
+def main():
+    """比較舊做法 (每張重新載入字型、ImageOps.fit) 與渲染引擎的製作時間"""
+    import time
+    from PIL import ImageOps
+
+    scene = Image.effect_noise((1920, 1080), 64).convert("RGB")
+    user = Image.effect_noise((4032, 3024), 64).convert("RGB")
+    texts = ("新宿駅東口", "新宿駅東口 | 01:23", f"{datetime.date.today():%Y/%m/%d} • Takayama/Tokyo")
+    runs = 10
+
+    def legacy():
+        scale, card_w, card_h = 3, 360, 540
+        out_w, out_h = card_w * scale, card_h * scale
+        h1, h2 = int(card_h * 0.45) * scale, int(card_h * 0.30) * scale
+        canvas = Image.new("RGB", (out_w, out_h), "white")
         draw = ImageDraw.Draw(canvas)
-        
-        # 簡單字型處理 (如果沒有字型檔，使用預設)
+        canvas.paste(ImageOps.fit(scene, (out_w, h1), method=Image.LANCZOS), (0, 0))
+        canvas.paste(ImageOps.fit(user, (out_w, h2), method=Image.LANCZOS), (0, h1))
         try:
-            # 嘗試載入系統字型 (Windows: msjh.ttc, Mac: PingFang.ttc)
-            # 這裡為了通用，先用預設，若要美觀建議放一個 .ttf 在專案資料夾
-            font_title = ImageFont.truetype("arial.ttf", 40)
-            font_text = ImageFont.truetype("arial.ttf", 20)
-        except:
-            font_title = ImageFont.load_default()
-            font_text = ImageFont.load_default()
-
-        # 版面邏輯
-        img_h = int(ch * 0.6)
-        each_h = int(img_h / 2)
-        
-        s_img = self.resize_cover(scene_img, cw, each_h)
-        u_img = self.resize_cover(user_img, cw, each_h)
-        
-        canvas.paste(s_img, (0, 0))
-        canvas.paste(u_img, (0, each_h))
-        
-        # 繪製文字區域
-        info_y = img_h + 30
-        draw.text((30, info_y), title, fill=text_color, font=font_title)
-        draw.text((30, info_y + 60), f"Location: {location}", fill="#4B5563", font=font_text)
-        draw.text((30, info_y + 90), f"Date: {date_str}", fill="#6B7280", font=font_text)
-        
-        # 繪製印章
-        draw.ellipse([cw-150, ch-150, cw-30, ch-30], outline="red", width=5)
-        draw.text((cw-130, ch-100), "VERIFIED", fill="red", font=font_text)
-
-        return canvas
\ No newline at end of file
+            font_title = ImageFont.truetype(FONT_CANDIDATES['title'][0], 18 * scale)
+            font_sub = ImageFont.truetype(FONT_CANDIDATES['sub'][0], 11 * scale)
+        except OSError:
+            font_title = font_sub = ImageFont.load_default()
+        info_y = h1 + h2
+        draw.text((20 * scale, info_y + 15 * scale), texts[0], fill="black", font=font_title)
+        draw.text((20 * scale, info_y + 50 * scale), texts[1], fill="#64748B", font=font_sub)
+        draw.text((20 * scale, info_y + 75 * scale), texts[2], fill="#94A3B8", font=font_sub)
+        cx, cy, r = out_w - 50 * scale, info_y + 40 * scale, 35 * scale
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline="#EF4444", width=3 * scale)
+        draw.text((cx - 25 * scale, cy - 10 * scale), "ANITRIP", fill="#EF4444", font=font_sub)
+        draw.text((cx - 25 * scale, cy + 5 * scale), "SCENE", fill="#EF4444", font=font_sub)
+        return canvas
+
+    def bench(label, func):
+        func()  # 暖身 (第一次會建立版面快取)
+        start = time.perf_counter()
+        for _ in range(runs): func()
+        ms = (time.perf_counter() - start) / runs * 1000
+        print(f"{label:<20}{ms:8.1f} ms / 張")
+        return ms
+
+    ig = ImageGenerator()
+    print(f"場景圖 {scene.size}，使用者照片 {user.size}，輸出 x3，各 {runs} 張")
+    before = bench("舊做法", legacy)
+    after = bench("渲染引擎 Classic", lambda: ig.create_scene_card(scene, user, *texts))
+    for name in TEMPLATES:
+        if name != "Classic":
+            bench(f"渲染引擎 {name}", lambda n=name: ig.create_scene_card(scene, user, *texts, template=n))
+    print(f"Classic 加速 {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+
+from PIL import Image, ImageOps
+
+import config
+from dataset_cache import file_sha256
+from image_generator import fit_cover
+
+# EXIF Orientation 為這些值時，顯示的寬高與檔案內相反
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+def cover_request(src_size, size):
+    """要讓 src_size 縮放後仍能填滿 size (cover)，解碼時最少需要的寬高"""
+    src_w, src_h = src_size
+    ratio = max(size[0] / src_w, size[1] / src_h)
+    return (max(1, int(src_w * ratio + 0.999)), max(1, int(src_h * ratio + 0.999)))
+
+def decode(path, size=None):
+    """讀取本機圖片 (依 EXIF 轉正，RGB)
+
+    給了 size 時只解碼到「縮放後仍能填滿 size」的最小尺寸：JPEG 用 draft
+    直接在解碼時以 1/2、1/4、1/8 縮小，其他格式解碼後用 reduce 整數倍縮小。
+    回傳的圖片至少跟 size 一樣大，呼叫端再自行裁切縮放。
+    """
+    img = Image.open(path)
+    if size:
+        w, h = size
+        if img.getexif().get(0x0112) in ROTATED_ORIENTATIONS: w, h = h, w
+        need = cover_request(img.size, (w, h))
+        if img.format == "JPEG":
+            img.draft("RGB", need)
+        else:
+            factor = min(img.width // need[0], img.height // need[1])
+            if factor >= 2:
+                img = img.reduce(factor)
+    img = ImageOps.exif_transpose(img)
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+class ImageIngest:
+    """本機大圖 (封面、使用者照片) 的縮圖金字塔
+
+    每張圖依內容雜湊存一組長邊 DERIVATIVE_LEVELS 的 JPEG 衍生圖；檔案的
+    (mtime, 大小) 沒變就沿用上次算的雜湊，不必重讀整個檔案。
+    需要某個尺寸時挑最小、仍能填滿的那一層，原圖只在批次輸出等需要時才完整解碼。
+    """
+
+    def __init__(self, cache_dir=config.DERIVATIVE_CACHE_DIR, levels=config.DERIVATIVE_LEVELS):
+        self.cache_dir = cache_dir
+        self.levels = sorted(levels)
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.index = None      # 絕對路徑 -> {mtime_ns, size, sha256, w, h}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "built": 0, "direct": 0}
+
+    # --- 索引 ---
+    def _ensure_index(self):
+        if self.index is not None: return
+        self.index = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"讀取縮圖索引失敗: {e}")
+
+    def _save_index(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self.index_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            print(f"縮圖索引存檔失敗: {e}")
+
+    def fingerprint(self, path):
+        """{sha256, w, h} (轉正後的寬高)；檔案沒變時直接用索引裡的紀錄"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self.lock:
+            self._ensure_index()
+            entry = self.index.get(path)
+            if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                return entry
+        with Image.open(path) as img:
+            w, h = img.size
+            if img.getexif().get(0x0112) in ROTATED_ORIENTATIONS: w, h = h, w
+        entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": file_sha256(path), "w": w, "h": h}
+        with self.lock:
+            self.index[path] = entry
+            self._save_index()
+        return entry
+
+    # --- 金字塔 ---
+    def level_for(self, entry, size):
+        """能填滿 size 的最小層級 (長邊像素)；都不夠大時回傳 None (直接讀原圖)"""
+        w, h = entry['w'], entry['h']
+        need_w, need_h = cover_request((w, h), size)
+        for level in self.levels:
+            scale = level / max(w, h)
+            if scale >= 1: break
+            if w * scale >= need_w and h * scale >= need_h: return level
+        return None
+
+    def level_path(self, entry, level):
+        sha = entry['sha256']
+        return os.path.join(self.cache_dir, sha[:2], f"{sha}_{level}.jpg")
+
+    def _build(self, path, entry, level):
+        """從原圖 (draft 解碼) 產生 level 以及更小的各層"""
+        scale = level / max(entry['w'], entry['h'])
+        img = decode(path, (max(1, round(entry['w'] * scale)), max(1, round(entry['h'] * scale))))
+        result = None
+        for lv in reversed([lv for lv in self.levels if lv <= level]):
+            img = img.copy()
+            img.thumbnail((lv, lv), Image.LANCZOS, reducing_gap=2.0)
+            out = self.level_path(entry, lv)
+            if not os.path.exists(out):
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                tmp_path = f"{out}.{threading.get_ident()}.tmp"
+                img.save(tmp_path, "JPEG", quality=90)
+                os.replace(tmp_path, out)
+            if lv == level: result = img
+        return result
+
+    # --- 對外主要介面 ---
+    def load(self, path, size):
+        """至少能填滿 size 的圖片 (未裁切)：優先讀金字塔，沒有就從原圖建"""
+        entry = self.fingerprint(path)
+        level = self.level_for(entry, size)
+        if level is None:
+            self.stats['direct'] += 1
+            return decode(path, size)
+        cached = self.level_path(entry, level)
+        if os.path.exists(cached):
+            try:
+                with Image.open(cached) as img:
+                    self.stats['hits'] += 1
+                    return img.convert("RGB")
+            except OSError:
+                pass
+        self.stats['built'] += 1
+        return self._build(path, entry, level)
+
+    def thumbnail(self, path, size):
+        """裁切縮放到剛好 size (Object Fit: Cover)"""
+        return fit_cover(self.load(path, size), size)
+
+ingest = ImageIngest()
+
+def main():
+    """比較直接解碼原圖與 draft / 金字塔的耗時"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="本機大圖縮圖效能比較")
+    parser.add_argument('image', nargs='?', default='封面.jpeg')
+    parser.add_argument('--size', type=int, nargs=2, default=(172, 252))
+    args = parser.parse_args()
+    size = tuple(args.size)
+
+    def bench(label, func, runs=5):
+        start = time.perf_counter()
+        for _ in range(runs): img = func()
+        ms = (time.perf_counter() - start) / runs * 1000
+        print(f"{label:<16}{ms:8.1f} ms  解碼 {img.width}x{img.height} ({img.width * img.height * 3 / 1e6:.1f} MB)")
+
+    with Image.open(args.image) as img:
+        print(f"{args.image} {img.size} -> {size}")
+    bench("完整解碼", lambda: Image.open(args.image).convert("RGB"))
+    bench("draft 解碼", lambda: decode(args.image, size))
+    ingest.load(args.image, size)
+    bench("金字塔", lambda: ingest.load(args.image, size))
+    print(ingest.stats)
+
+if __name__ == "__main__":
+    main()
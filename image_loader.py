@@ -0,0 +1,234 @@
+import concurrent.futures
+import itertools
+import queue
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image
+
+import config
+from image_cache import image_cache, MemoryImageCache
+from image_ingest import ingest
+from metrics import metrics
+
+# ==========================================
+# 🎨 影像處理器註冊表
+# ==========================================
+# 處理器以固定名稱註冊，快取鍵才不會因為每次重建 closure 而失效
+PROCESSORS = {}
+
+def register_processor(name, func):
+    """註冊一個 PIL -> PIL 的影像處理函式"""
+    PROCESSORS[name] = func
+    return func
+
+def get_processor(name):
+    if name not in PROCESSORS:
+        raise KeyError(f"未註冊的影像處理器: {name}")
+    return PROCESSORS[name]
+
+# ==========================================
+# 🚀 非同步圖片載入器
+# ==========================================
+# 數字越小越先處理
+PRIORITY_VISIBLE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_PREFETCH = 20
+# close() 放入的結束訊號排在所有工作之後
+_STOP = float('inf')
+
+class CancelToken:
+    """一個頁面 (或一組請求) 的取消旗標，頁面銷毀時呼叫 cancel()
+
+    可指定 parent：父旗標取消時，子旗標也視為已取消 (例如頁面 -> 列表中的某一列)。
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._cancelled = False
+
+    @property
+    def cancelled(self):
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    def cancel(self):
+        self._cancelled = True
+
+class _Job:
+    """同一個快取鍵的下載工作，所有重複請求共用同一個 Future"""
+
+    def __init__(self, url, size, processor):
+        self.url = url
+        self.size = size
+        self.processor = processor
+        self.waiters = []     # [(callback, token)]
+        self.started = False
+        self.queued_at = time.perf_counter()
+        self.future = concurrent.futures.Future()
+
+    def is_wanted(self):
+        return any(token is None or not token.cancelled for _, token in self.waiters)
+
+class AsyncImageLoader:
+    def __init__(self, wrap=None, max_workers=4, cache=None):
+        """wrap: 將處理好的 PIL 圖片轉成 UI 用物件 (例如 CTkImage)，None 則直接回傳 PIL"""
+        self.wrap = wrap
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else MemoryImageCache()
+        # 縮放前的原圖 (PIL)，給製作卡片等需要高解析度的地方重用
+        self.sources = MemoryImageCache(config.MEMORY_SOURCE_CACHE_MAX_BYTES)
+        self.queue = queue.PriorityQueue()
+        self.pending = {}     # cache_key -> _Job (尚未完成的工作)
+        self.lock = threading.Lock()
+        self.seq = itertools.count()
+        self.workers = []
+        self.coalesced = 0
+        self.dropped = 0
+
+    def _ensure_workers(self):
+        # 第一次載入時才建立執行緒
+        if self.workers: return
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker_loop, name=f"image-loader-{i}", daemon=True)
+            t.start()
+            self.workers.append(t)
+
+    def load(self, url, callback, size=None, processor=None, priority=PRIORITY_NORMAL, token=None):
+        """processor 為 register_processor 註冊過的名稱；token 被取消後 callback 不會被呼叫
+
+        url 不是 http(s) 時當成本機檔案，有 size 時從縮圖金字塔 (image_ingest) 取需要的大小。
+
+        相同 (url, size, processor) 的請求若還在進行中，會併入同一個工作，回傳共用的 Future。
+        """
+        if not url: return None
+        cache_key = (url, size, processor or "raw")
+
+        img = self.cache.get(cache_key)
+        if img is not None:
+            callback(img)
+            future = concurrent.futures.Future()
+            future.set_result(img)
+            return future
+
+        with self.lock:
+            job = self.pending.get(cache_key)
+            if job is None:
+                job = _Job(url, size, processor)
+                self.pending[cache_key] = job
+            else:
+                self.coalesced += 1
+            job.waiters.append((callback, token))
+            # 重複放入佇列沒關係，worker 會略過已開始的工作；這樣較高優先權的請求可以插隊
+            if not job.started:
+                self.queue.put((priority, next(self.seq), cache_key))
+        self._ensure_workers()
+        return job.future
+
+    def close(self, timeout=None):
+        """處理完佇列中的工作後結束所有執行緒 (之後再 load 會重新建立)"""
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for _ in workers:
+            self.queue.put((_STOP, next(self.seq), None))
+        for t in workers:
+            t.join(timeout)
+
+    def _worker_loop(self):
+        while True:
+            priority, _, cache_key = self.queue.get()
+            if priority == _STOP: return
+            with self.lock:
+                job = self.pending.get(cache_key)
+                if job is None or job.started: continue
+                if not job.is_wanted():
+                    # 所有請求者都已取消 (例如頁面已切換)，直接丟棄
+                    del self.pending[cache_key]
+                    self.dropped += 1
+                    job.future.cancel()
+                    continue
+                job.started = True
+            metrics.observe("loader.wait", (time.perf_counter() - job.queued_at) * 1000)
+            self._download(job, cache_key)
+
+    def _download(self, job, cache_key):
+        img = None
+        try:
+            if job.size and not job.url.startswith(("http://", "https://")):
+                # 本機大圖 (例如封面) 不整張解碼，也不留在原圖快取
+                with metrics.span("loader.decode"):
+                    pil_img = ingest.thumbnail(job.url, job.size)
+            else:
+                pil_img = self.get_source(job.url)
+
+            if job.size and pil_img.size != tuple(job.size):
+                with metrics.span("loader.resize"):
+                    pil_img = self._resize_cover(pil_img, job.size)
+
+            if job.processor:
+                with metrics.span(f"loader.process.{job.processor}"):
+                    pil_img = get_processor(job.processor)(pil_img)
+
+            img = self.wrap(pil_img) if self.wrap else pil_img
+            self.cache.put(cache_key, img, MemoryImageCache.pixel_bytes(pil_img))
+        except Exception as e:
+            print(f"Image load failed: {e}")
+            metrics.incr("loader.failed")
+        finally:
+            with self.lock:
+                self.pending.pop(cache_key, None)
+                waiters = list(job.waiters)
+        if img is None:
+            job.future.set_result(None)
+            return
+        job.future.set_result(img)
+        for callback, token in waiters:
+            if token is not None and token.cancelled: continue
+            try: callback(img)
+            except Exception as e: print(f"Image callback failed: {e}")
+
+    def get_source(self, url, fetch=True):
+        """已解碼的原圖 (RGB)；不在記憶體時從磁碟快取 / 網路讀取 (fetch=False 則回傳 None)
+
+        url 不是 http(s) 時當成本機檔案路徑。回傳的圖片是共用的，呼叫端不可就地修改。
+        """
+        img = self.sources.get(url)
+        if img is not None or not fetch: return img
+        if url.startswith(("http://", "https://")):
+            # 下載 (含磁碟快取 / 重新驗證) 與解碼分開計時
+            with metrics.span("loader.download"):
+                data = image_cache.fetch(url)
+            with metrics.span("loader.decode"):
+                img = Image.open(BytesIO(data)).convert("RGB")
+        else:
+            with metrics.span("loader.decode"), Image.open(url) as f:
+                img = f.convert("RGB")
+        self.sources.put(url, img, MemoryImageCache.pixel_bytes(img))
+        return img
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def _resize_cover(self, image, size):
+        w, h = size
+        img_ratio = image.width / image.height
+        ratio = w / h
+        if img_ratio > ratio:
+            new_height = h
+            new_width = int(new_height * img_ratio)
+            img = image.resize((new_width, new_height), Image.LANCZOS)
+            left = (new_width - w) / 2
+            img = img.crop((left, 0, left + w, h))
+        else:
+            new_width = w
+            new_height = int(new_width / img_ratio)
+            img = image.resize((new_width, new_height), Image.LANCZOS)
+            top = (new_height - h) / 2
+            img = img.crop((0, top, w, top + h))
+        return img
+
+    def get_stats(self):
+        """記憶體快取的命中 / 未命中 / 淘汰次數，以及合併與丟棄的請求數"""
+        stats = self.cache.get_stats()
+        stats.update({"coalesced": self.coalesced, "dropped": self.dropped, "queued": self.queue_depth()})
+        return stats
@@ -1,12 +1,34 @@
-import customtkinter as ctk
-from gui_app import AnitabiApp
-
-ctk.set_widget_scaling(1.0)  
-ctk.set_window_scaling(1.0)
+from profiling import startup
+import argparse
 
 def main():
+    parser = argparse.ArgumentParser(description="AniTrip － 君の名は。聖地巡禮")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="印出啟動各階段耗時 (匯入、資料載入、分群、第一個畫面)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="記錄熱點耗時與事件迴圈延遲，定期寫入量測檔 (見 config.METRICS_FILE)")
+    parser.add_argument('--debug-overlay', action='store_true', help="同 --metrics，並在視窗右下角顯示量測浮層")
+    args = parser.parse_args()
+    startup.enabled = args.profile_startup
+    if args.metrics or args.debug_overlay:
+        import config
+        from metrics import metrics
+        metrics.enabled = True
+        config.METRICS_OVERLAY = config.METRICS_OVERLAY or args.debug_overlay
+
+    import customtkinter as ctk
+    from gui_app import AnitabiApp
+    ctk.set_widget_scaling(1.0)
+    ctk.set_window_scaling(1.0)
+    startup.mark("匯入模組")
+
     app = AnitabiApp()
+    if startup.enabled:
+        # 處理完待辦的繪製事件，視窗第一次完整畫出來
+        app.update()
+        startup.mark("第一個畫面")
+        startup.report()
     app.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+
+import config
+
+TILE_SIZE = 256
+
+def latlon_to_world(lat, lon):
+    """經緯度 -> Web Mercator 世界座標 (0~1)，可傳入 NumPy 陣列"""
+    lat = np.clip(lat, -85.05112878, 85.05112878)
+    x = (np.asarray(lon) + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+def tile_to_latlon(tile_x, tile_y, zoom):
+    """OSM 圖磚座標 (可為小數) -> 經緯度"""
+    n = 2.0 ** zoom
+    lon = tile_x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+    return lat, lon
+
+class MapPointIndex:
+    """地圖圖釘的階層式聚合索引
+
+    在最細的層級以螢幕像素網格把景點分桶，往上每一層把 2x2 個格子合併
+    (格子座標右移一位)，所以每個縮放層級都能直接查到「N 個景點」的聚合泡泡
+    與其範圍。每層以排序過的格子鍵 (cy * 寬 + cx) 存放，查詢時逐列二分搜尋。
+    """
+
+    def __init__(self, points, cell_px=config.MAP_CLUSTER_CELL_PX, max_zoom=config.MAP_PIN_ZOOM):
+        self.cell_px = cell_px
+        self.max_zoom = max_zoom
+        self.levels = {}
+        self.points = [p for p in points if p.get('geo') and len(p['geo']) >= 2]
+        self._build()
+
+    def _scale(self, zoom):
+        return TILE_SIZE * (2 ** zoom) / self.cell_px
+
+    def _build(self):
+        n = len(self.points)
+        self.lats = np.array([float(p['geo'][0]) for p in self.points], dtype=np.float64)
+        self.lons = np.array([float(p['geo'][1]) for p in self.points], dtype=np.float64)
+        if n == 0: return
+        wx, wy = latlon_to_world(self.lats, self.lons)
+        scale = self._scale(self.max_zoom)
+        finest_width = max(int(scale), 1)
+        cx = np.minimum((wx * scale).astype(np.int64), finest_width - 1)
+        cy = np.minimum((wy * scale).astype(np.int64), finest_width - 1)
+        point_ids = np.arange(n)
+
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            # 寬度要與右移後的格子座標一致 (cell_px 不是 256 的 2 次方因數時 int(_scale) 會少一格)
+            width = ((finest_width - 1) >> shift) + 1
+            keys = (cy >> shift) * width + (cx >> shift)
+            uniq, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            m = len(uniq)
+            lat_sum = np.bincount(inverse, weights=self.lats, minlength=m)
+            lon_sum = np.bincount(inverse, weights=self.lons, minlength=m)
+            bounds = np.empty((m, 4))
+            bounds[:, 0:2] = np.inf
+            bounds[:, 2:4] = -np.inf
+            np.minimum.at(bounds[:, 0], inverse, self.lats)
+            np.minimum.at(bounds[:, 1], inverse, self.lons)
+            np.maximum.at(bounds[:, 2], inverse, self.lats)
+            np.maximum.at(bounds[:, 3], inverse, self.lons)
+            single = np.full(m, -1, dtype=np.int64)
+            single[inverse[counts[inverse] == 1]] = point_ids[counts[inverse] == 1]
+            self.levels[zoom] = {"width": width, "keys": uniq, "count": counts,
+                                 "lat": lat_sum / counts, "lon": lon_sum / counts,
+                                 "bounds": bounds, "single": single}
+
+    def query(self, zoom, north, west, south, east):
+        """回傳可視範圍內要顯示的標記
+
+        每個元素為 ("pin", key, scene, lat, lon) 或
+        ("cluster", key, count, lat, lon, bounds)，bounds = [min_lat, min_lon, max_lat, max_lon]。
+        """
+        zoom = int(round(zoom))
+        if not self.points: return []
+        if zoom > self.max_zoom:
+            mask = (self.lats >= south) & (self.lats <= north) & (self.lons >= west) & (self.lons <= east)
+            return [("pin", self.points[i]['id'], self.points[i], float(self.lats[i]), float(self.lons[i]))
+                    for i in np.nonzero(mask)[0]]
+        zoom = max(zoom, 0)
+        level = self.levels[zoom]
+        width, keys = level['width'], level['keys']
+        scale = self._scale(zoom)
+        nw_x, nw_y = latlon_to_world(north, west)
+        se_x, se_y = latlon_to_world(south, east)
+        x0, x1 = max(int(nw_x * scale), 0), min(int(se_x * scale), width - 1)
+        y0, y1 = max(int(nw_y * scale), 0), min(int(se_y * scale), width - 1)
+
+        found = []
+        for cy in range(y0, y1 + 1):
+            lo = np.searchsorted(keys, cy * width + x0, side='left')
+            hi = np.searchsorted(keys, cy * width + x1, side='right')
+            for i in range(lo, hi):
+                key = (zoom, int(keys[i]))
+                if level['single'][i] >= 0:
+                    p = self.points[level['single'][i]]
+                    found.append(("pin", p['id'], p, float(level['lat'][i]), float(level['lon'][i])))
+                else:
+                    found.append(("cluster", key, int(level['count'][i]), float(level['lat'][i]),
+                                  float(level['lon'][i]), [float(v) for v in level['bounds'][i]]))
+        return found
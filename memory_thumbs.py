@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+from PIL import Image
+
+import config
+from card_encoder import card_file, card_ids
+
+INDEX_FILE = 'index.json'
+
+class ThumbnailStore:
+    """收藏卡片的小縮圖 (my_trip_memories/thumbs/)
+
+    卡片存檔時順便產生縮圖；舊卡片或被批次輸出覆寫過的卡片 (mtime 不同)
+    由 ensure() 補做。index.json 記錄每張縮圖的檔名與尺寸，回憶牆不必
+    開任何圖片就能先排好版面。縮圖檔名帶卡片的 mtime，內容更新後記憶體
+    快取的鍵也會跟著變，不會顯示舊圖。
+    """
+
+    def __init__(self, save_dir=config.SAVE_DIR, thumb_dir=config.THUMB_DIR, width=config.THUMB_WIDTH):
+        self.save_dir = save_dir
+        self.thumb_dir = thumb_dir
+        self.width = width
+        self.index_file = os.path.join(thumb_dir, INDEX_FILE)
+        self.index = None      # scene id -> {file, w, h, card_mtime_ns}
+        self.lock = threading.Lock()
+
+    def card_path(self, scene_id):
+        return card_file(scene_id, self.save_dir)
+
+    # --- 索引 ---
+    def _ensure_index(self):
+        if self.index is not None: return
+        self.index = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"讀取縮圖索引失敗: {e}")
+
+    def _save_index(self):
+        try:
+            os.makedirs(self.thumb_dir, exist_ok=True)
+            tmp_path = self.index_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            print(f"縮圖索引存檔失敗: {e}")
+
+    def get(self, scene_id):
+        """最新的縮圖 {path, w, h}；沒有卡片回傳 None，縮圖過期或還沒做回傳 False"""
+        card_path = self.card_path(scene_id)
+        if card_path is None: return None
+        try:
+            mtime_ns = os.stat(card_path).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            self._ensure_index()
+            entry = self.index.get(scene_id)
+        if not entry or entry['card_mtime_ns'] != mtime_ns: return False
+        path = os.path.join(self.thumb_dir, entry['file'])
+        if not os.path.exists(path): return False
+        return {"path": path, "w": entry['w'], "h": entry['h']}
+
+    # --- 產生 ---
+    def make(self, scene_id, card=None):
+        """產生縮圖 (card 為剛做好的 PIL 卡片時不必再讀檔)，回傳 {path, w, h}；卡片檔不存在回傳 None"""
+        card_path = self.card_path(scene_id)
+        if card_path is None: return None
+        try:
+            mtime_ns = os.stat(card_path).st_mtime_ns
+        except OSError:
+            # 查到路徑後卡片才被刪掉 / 換格式
+            return None
+        if card is None:
+            with Image.open(card_path) as img:
+                # JPEG 用 draft，其他格式先用 reduce 整數倍縮小再 LANCZOS
+                img.draft("RGB", (self.width, self.width))
+                factor = max(1, img.width // (self.width * 2))
+                card = img.reduce(factor) if factor > 1 else img.copy()
+        thumb = card.convert("RGB")
+        thumb.thumbnail((self.width, self.width * 4), Image.LANCZOS, reducing_gap=2.0)
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        name = f"{scene_id}_{mtime_ns}.jpg"
+        path = os.path.join(self.thumb_dir, name)
+        thumb.save(path + '.tmp', "JPEG", quality=88)
+        os.replace(path + '.tmp', path)
+        with self.lock:
+            self._ensure_index()
+            old = self.index.get(scene_id)
+            self.index[scene_id] = {"file": name, "w": thumb.width, "h": thumb.height, "card_mtime_ns": mtime_ns}
+            self._save_index()
+        if old and old['file'] != name:
+            try: os.remove(os.path.join(self.thumb_dir, old['file']))
+            except OSError: pass
+        return {"path": path, "w": thumb.width, "h": thumb.height}
+
+    def ensure(self, scene_id):
+        """有最新縮圖就直接回傳，否則從卡片補做；沒有卡片回傳 None"""
+        thumb = self.get(scene_id)
+        if thumb is False: return self.make(scene_id)
+        return thumb
+
+    def stale_ids(self):
+        """收藏資料夾中縮圖需要補做的卡片"""
+        return [sid for sid in card_ids(self.save_dir) if self.get(sid) is False]
+
+memory_thumbs = ThumbnailStore()
+
+def main():
+    parser = argparse.ArgumentParser(description="為收藏的卡片補做回憶牆縮圖")
+    parser.parse_args()
+    ids = memory_thumbs.stale_ids()
+    start = time.perf_counter()
+    for i, sid in enumerate(ids, 1):
+        try:
+            memory_thumbs.make(sid)
+            print(f"[{i}/{len(ids)}] {sid}")
+        except Exception as e:
+            print(f"[{i}/{len(ids)}] {sid} 失敗: {e}")
+    print(f"補做 {len(ids)} 張縮圖，耗時 {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import argparse
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import config
+
+class _NoopSpan:
+    """關閉量測時 span() 回傳的共用物件，什麼都不做"""
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): return False
+
+NOOP_SPAN = _NoopSpan()
+
+class Span:
+    """with metrics.span("loader.decode"): ... 結束時記錄耗時 (毫秒)；發生例外另計 <name>.errors"""
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        if exc_type is not None: self.metrics.incr(self.name + ".errors")
+        return False
+
+class Timing:
+    """一個計時項目：累計次數 / 總和 / 最大值，加上最近 window 筆算百分位數"""
+
+    __slots__ = ('count', 'total', 'max', 'recent')
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms > self.max: self.max = ms
+        self.recent.append(ms)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        pick = lambda q: recent[min(len(recent) - 1, int(q * len(recent)))] if recent else 0.0
+        return {"count": self.count, "mean": round(self.total / self.count, 3) if self.count else 0.0,
+                "p50": round(pick(0.50), 3), "p95": round(pick(0.95), 3), "max": round(self.max, 3)}
+
+class Metrics:
+    """熱點的耗時 (span / timed)、計數 (incr) 與即時數值 (gauge)
+
+    enabled 為 False 時 span() 回傳共用的空物件、incr() 等直接返回，
+    熱點路徑上只多一次屬性檢查。collect() 註冊的函式 (例如各快取的 get_stats)
+    在取快照時才呼叫，不會增加熱點的成本。
+    """
+
+    def __init__(self, enabled=config.METRICS_ENABLED, window=512):
+        self.enabled = enabled
+        self.window = window
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+        self.collectors = {}
+        self.started = time.time()
+        self.exporter = None
+
+    # --- 記錄 ---
+    def span(self, name):
+        if not self.enabled: return NOOP_SPAN
+        return Span(self, name)
+
+    def timed(self, name):
+        """裝飾器版的 span，開關在呼叫時才檢查"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled: return func(*args, **kwargs)
+                with Span(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name, ms):
+        if not self.enabled: return
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing(self.window)
+            timing.add(ms)
+
+    def incr(self, name, n=1):
+        if not self.enabled: return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if not self.enabled: return
+        self.gauges[name] = value
+
+    def collect(self, prefix, func):
+        """func() 回傳 {名稱: 數值}，取快照時以 <prefix>.<名稱> 加入；有 hits / misses 時另算命中率"""
+        self.collectors[prefix] = func
+
+    # --- 快照 ---
+    def snapshot(self):
+        gauges = dict(self.gauges)
+        for prefix, func in list(self.collectors.items()):
+            try:
+                stats = func()
+            except Exception as e:
+                print(f"讀取量測數值失敗 ({prefix}): {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)): gauges[f"{prefix}.{key}"] = value
+            lookups = stats.get('hits', 0) + stats.get('misses', 0)
+            if lookups: gauges[f"{prefix}.hit_rate"] = round(stats['hits'] / lookups, 4)
+        with self.lock:
+            counters = dict(self.counters)
+            timings = {name: t.summary() for name, t in self.timings.items()}
+        return {"ts": round(time.time(), 3), "uptime_s": round(time.time() - self.started, 1),
+                "counters": counters, "gauges": gauges, "timings": timings}
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timings.clear()
+
+    # --- Tk 事件迴圈 ---
+    def watch_tk(self, widget, interval_ms=config.METRICS_HEARTBEAT_MS, stall_ms=config.METRICS_STALL_MS):
+        """用 after() 心跳量測事件迴圈延遲：實際被呼叫的時間比預期晚多少就是 lag"""
+        if not self.enabled: return
+        interval = interval_ms / 1000
+        expected = [time.perf_counter() + interval]
+
+        def beat():
+            now = time.perf_counter()
+            lag = max(0.0, (now - expected[0]) * 1000)
+            self.observe("tk.lag", lag)
+            if lag >= stall_ms: self.incr("tk.stalls")
+            expected[0] = now + interval
+            widget.after(interval_ms, beat)
+
+        widget.after(interval_ms, beat)
+
+    # --- 匯出 ---
+    def start_export(self, path=config.METRICS_FILE, interval=config.METRICS_INTERVAL,
+                     max_bytes=config.METRICS_MAX_BYTES, backups=config.METRICS_BACKUPS):
+        if not self.enabled or self.exporter is not None: return self.exporter
+        self.exporter = JsonlExporter(self, path, interval, max_bytes, backups)
+        self.exporter.start()
+        atexit.register(self.exporter.stop)
+        return self.exporter
+
+class JsonlExporter:
+    """每 interval 秒把快照寫成一行 JSON；檔案超過 max_bytes 時輪替 (metrics.jsonl.1 ... .<backups>)"""
+
+    def __init__(self, metrics, path, interval, max_bytes, backups):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="metrics-export", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.stopped.is_set(): return
+        self.stopped.set()
+        if self.thread is not None: self.thread.join(timeout=2)
+        self.write(self.metrics.snapshot())
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            self.write(self.metrics.snapshot())
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except Exception as e:
+            print(f"量測資料寫入失敗: {e}")
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src): os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0: os.replace(self.path, f"{self.path}.1")
+        else: os.remove(self.path)
+
+# ==========================================
+# 🪟 除錯浮層
+# ==========================================
+def format_snapshot(snap, limit=10):
+    """快照轉成幾行文字：事件迴圈延遲、命中率 / 佇列，再依 p95 列出最慢的計時項目"""
+    lines = []
+    lag = snap['timings'].get('tk.lag')
+    if lag:
+        lines.append(f"tk lag  p50 {lag['p50']:.0f}  p95 {lag['p95']:.0f}  max {lag['max']:.0f} ms  "
+                     f"stalls {snap['counters'].get('tk.stalls', 0)}")
+    gauges = snap['gauges']
+    rates = [f"{k.rsplit('.', 1)[0]} {v:.0%}" for k, v in sorted(gauges.items()) if k.endswith('.hit_rate')]
+    if rates: lines.append("hit  " + "  ".join(rates))
+    if 'loader.queued' in gauges: lines.append(f"loader queue {gauges['loader.queued']}")
+    slow = sorted(((k, t) for k, t in snap['timings'].items() if k != 'tk.lag'), key=lambda kv: -kv[1]['p95'])
+    for name, t in slow[:limit]:
+        lines.append(f"{name:<22} p50 {t['p50']:7.1f}  p95 {t['p95']:7.1f} ms  x{t['count']}")
+    return "\n".join(lines) or "(尚無資料)"
+
+class DebugOverlay:
+    """主視窗右下角的半透明量測面板，每秒更新 (F12 顯示 / 隱藏)"""
+
+    def __init__(self, root, metrics, refresh_ms=1000):
+        import customtkinter as ctk
+        self.root = root
+        self.metrics = metrics
+        self.refresh_ms = refresh_ms
+        self.visible = True
+        self.label = ctk.CTkLabel(root, text="", font=("Consolas", 11), justify="left", anchor="w",
+                                  fg_color="#0F172A", text_color="#E2E8F0", corner_radius=6)
+        self.label.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor="se")
+        root.bind("<F12>", lambda e: self.toggle(), add="+")
+        self._refresh()
+
+    def toggle(self):
+        self.visible = not self.visible
+        if self.visible:
+            self.label.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor="se")
+            self.label.lift()
+        else:
+            self.label.place_forget()
+
+    def _refresh(self):
+        if self.visible:
+            self.label.configure(text=format_snapshot(self.metrics.snapshot()))
+            self.label.lift()
+        self.root.after(self.refresh_ms, self._refresh)
+
+metrics = Metrics()
+
+def main():
+    parser = argparse.ArgumentParser(description="顯示量測檔 (JSON lines) 最後一筆快照")
+    parser.add_argument('file', nargs='?', default=config.METRICS_FILE)
+    parser.add_argument('--limit', type=int, default=30, help="最多列出幾個計時項目")
+    args = parser.parse_args()
+    last = None
+    try:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip(): last = line
+    except OSError as e:
+        print(f"讀取量測檔失敗: {e}")
+        return
+    if last is None:
+        print("量測檔是空的")
+        return
+    snap = json.loads(last)
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snap['ts']))}  (啟動後 {snap['uptime_s']:.0f}s)")
+    print(format_snapshot(snap, args.limit))
+    for name, value in sorted(snap['counters'].items()):
+        print(f"  {name:<30}{value:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,152 @@
 import json
 import os
+import sqlite3
+import threading
+import time
+
+import config
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS profiles (
+           name TEXT PRIMARY KEY NOT NULL,
+           created REAL NOT NULL);""",
+    """CREATE TABLE IF NOT EXISTS checkins (
+           profile TEXT NOT NULL,
+           scene_id TEXT NOT NULL,
+           visited_at REAL NOT NULL,
+           card_path TEXT,
+           cluster_id TEXT,
+           PRIMARY KEY (profile, scene_id));""",
+    """CREATE TABLE IF NOT EXISTS meta (
+           key TEXT PRIMARY KEY NOT NULL,
+           value TEXT);""",
+]
 
 class PassportManager:
-    def __init__(self, save_file='visited.json'):
-        self.save_file = save_file
-        self.visited_ids = self.load_visited()
+    """打卡紀錄 (SQLite WAL)
+
+    每次打卡都是一個交易，當機或斷電也不會留下寫一半的存檔；
+    記憶體裡另存一份已打卡 id (依打卡時間排序的 dict)，is_visited 為 O(1)。
+    支援多個使用者檔案 (profile)，第一次啟動時會把舊的 visited.json 匯入。
+    """
+
+    def __init__(self, db_path=config.PASSPORT_DB_PATH, profile=config.PASSPORT_PROFILE, legacy_file='visited.json'):
+        self.db_path = db_path
+        self.legacy_file = legacy_file
+        self.lock = threading.Lock()
+        self.conn = self.connect()
+        self.switch_profile(profile)
+
+    def connect(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir: os.makedirs(db_dir, exist_ok=True)
+        # 存檔 / 打卡可能在背景執行緒發生，統一用 self.lock 保護
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        with conn:
+            for stmt in SCHEMA:
+                conn.execute(stmt)
+        return conn
+
+    def switch_profile(self, profile):
+        """切換使用者檔案 (不存在就建立)"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO profiles (name, created) VALUES (?, ?);", (profile, time.time()))
+        self.profile = profile
+        self.migrate_legacy()
+        self.visited = self.load_visited()
+
+    def profiles(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT name FROM profiles ORDER BY created;")]
 
     def load_visited(self):
-        """從 JSON 讀取已打卡的 ID 列表"""
-        if not os.path.exists(self.save_file):
-            return []
-        try:
-            with open(self.save_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('visited', [])
-        except Exception as e:
-            print(f"讀取存檔失敗: {e}")
-            return []
+        """從資料庫讀取目前使用者已打卡的 ID (依打卡時間排序)"""
+        with self.lock:
+            rows = self.conn.execute("SELECT scene_id FROM checkins WHERE profile=? ORDER BY visited_at, rowid;",
+                                     (self.profile,))
+            return {row[0]: True for row in rows}
+
+    def migrate_legacy(self):
+        """把舊版 visited.json 匯入第一個使用的 profile (只做一次)"""
+        key = f"migrated:{os.path.abspath(self.legacy_file)}"
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key=?;", (key,)).fetchone(): return
+        ids = []
+        if os.path.exists(self.legacy_file):
+            try:
+                with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                    ids = json.load(f).get('visited', [])
+            except Exception as e:
+                print(f"讀取舊存檔失敗: {e}")
+                return
+        when = os.path.getmtime(self.legacy_file) if ids else time.time()
+        with self.lock, self.conn:
+            # GUI / service / batch_export 可能同時第一次開啟同一個資料庫：
+            # 再檢查一次與寫入放在同一個 IMMEDIATE 交易，只有一個行程會匯入
+            self.conn.execute("BEGIN IMMEDIATE;")
+            if self.conn.execute("SELECT 1 FROM meta WHERE key=?;", (key,)).fetchone(): return
+            self.conn.executemany("INSERT OR IGNORE INTO checkins (profile, scene_id, visited_at) VALUES (?, ?, ?);",
+                                  [(self.profile, sid, when) for sid in ids])
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?);", (key, f"{self.profile}:{len(ids)}"))
+        if ids: print(f"已從 {self.legacy_file} 匯入 {len(ids)} 筆打卡紀錄")
+
+    @property
+    def visited_ids(self):
+        return list(self.visited)
+
+    def check_in(self, scene_id, card_path=None, cluster_id=None):
+        """執行打卡；已打過卡則只更新卡片路徑 / 區域並回傳 False"""
+        return bool(self.check_in_many([(scene_id, card_path, cluster_id)]))
 
-    def save_visited(self):
-        """儲存打卡紀錄"""
+    def check_in_many(self, entries):
+        """批次打卡 (例如匯入一趟旅程)，全部在同一個交易內完成
+
+        entries: [scene_id 或 (scene_id, card_path, cluster_id)]，回傳新打卡的 id。
+        """
+        now = time.time()
+        rows = []
+        for entry in entries:
+            scene_id, card_path, cluster_id = (entry, None, None) if isinstance(entry, str) else entry
+            rows.append((self.profile, scene_id, now, card_path, cluster_id))
+        added = []
         try:
-            with open(self.save_file, 'w', encoding='utf-8') as f:
-                json.dump({'visited': self.visited_ids}, f, ensure_ascii=False, indent=4)
+            with self.lock, self.conn:
+                for row in rows:
+                    cur = self.conn.execute("INSERT OR IGNORE INTO checkins (profile, scene_id, visited_at, card_path, cluster_id) "
+                                            "VALUES (?, ?, ?, ?, ?);", row)
+                    if cur.rowcount:
+                        added.append(row[1])
+                    elif row[3] or row[4]:
+                        self.conn.execute("UPDATE checkins SET card_path=COALESCE(?, card_path), cluster_id=COALESCE(?, cluster_id) "
+                                          "WHERE profile=? AND scene_id=?;", (row[3], row[4], row[0], row[1]))
         except Exception as e:
             print(f"存檔失敗: {e}")
+            return []
+        # 交易成功後才更新記憶體
+        for scene_id in added:
+            self.visited[scene_id] = True
+        return added
 
-    def check_in(self, scene_id):
-        """執行打卡"""
-        if scene_id not in self.visited_ids:
-            self.visited_ids.append(scene_id)
-            self.save_visited()
-            return True
-        return False
+    def get_checkin(self, scene_id):
+        """{'visited_at', 'card_path', 'cluster_id'}，沒打過卡回傳 None"""
+        with self.lock:
+            row = self.conn.execute("SELECT visited_at, card_path, cluster_id FROM checkins WHERE profile=? AND scene_id=?;",
+                                    (self.profile, scene_id)).fetchone()
+        if row is None: return None
+        return {"visited_at": row[0], "card_path": row[1], "cluster_id": row[2]}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
 
     def is_visited(self, scene_id):
-        return scene_id in self.visited_ids
+        return scene_id in self.visited
 
     def get_visited_count(self):
-        return len(self.visited_ids)
-        
+        return len(self.visited)
+
     def get_user_title(self):
         """根據數量回傳稱號 (移植自您的 Streamlit 邏輯)"""
         count = self.get_visited_count()
@@ -47,4 +154,4 @@ class PassportManager:
         if count >= 5: return "🥇 聖地巡禮大師"
         if count >= 3: return "🥈 資深阿宅"
         if count >= 1: return "🥉 見習巡禮者"
-        return "🌱 路人A"
\ No newline at end of file
+        return "🌱 路人A"
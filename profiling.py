@@ -0,0 +1,31 @@
+import time
+
+class StartupProfiler:
+    """記錄啟動各階段的耗時 (main.py --profile-startup 時印出)
+
+    mark(phase) 記下「上一個 mark 到現在」的時間；沒有開啟時只是多存一筆數字。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self):
+        if not self.enabled: return
+        width = max((len(name) for name, _ in self.phases), default=0) + 2
+        print("⏱️  啟動耗時")
+        for name, seconds in self.phases:
+            print(f"  {name:<{width}}{seconds * 1000:8.1f} ms")
+        print(f"  {'合計':<{width}}{self.total() * 1000:8.1f} ms")
+
+startup = StartupProfiler()
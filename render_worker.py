@@ -0,0 +1,95 @@
+import concurrent.futures
+import itertools
+import threading
+
+import config
+from image_loader import CancelToken
+from metrics import metrics
+
+class RenderCancelled(Exception):
+    """使用者取消了製作"""
+
+class RenderJob:
+    """一張卡片的製作工作
+
+    func(progress) 在背景執行緒執行，progress(比例, 說明) 會轉給 on_progress；
+    工作被取消後下一次回報進度時丟出 RenderCancelled 中止。
+    """
+
+    def __init__(self, job_id, key, func, token, on_progress=None):
+        self.id = job_id
+        self.key = key
+        self.func = func
+        self.token = token
+        self.on_progress = on_progress
+        self.fraction = 0.0
+        self.message = "排隊中"
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    def cancel(self):
+        # 還在排隊的工作一開始就會因為回報進度而中止，同樣走 on_error
+        self.token.cancel()
+
+    def progress(self, fraction, message=""):
+        if self.cancelled: raise RenderCancelled()
+        self.fraction, self.message = fraction, message
+        if self.on_progress:
+            try: self.on_progress(fraction, message)
+            except Exception as e: print(f"進度回報失敗: {e}")
+
+class RenderWorker:
+    """卡片製作的背景工作池 (最多 max_workers 張同時製作，其餘排隊)
+
+    callback 都在背景執行緒呼叫，GUI 端需自行用 after() 轉回 Tk 執行緒。
+    """
+
+    def __init__(self, max_workers=config.RENDER_WORKERS):
+        self.max_workers = max_workers
+        self.executor = None
+        self.jobs = {}       # job id -> RenderJob (尚未結束的工作)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def submit(self, key, func, token=None, on_progress=None, on_done=None, on_error=None):
+        """key 用來辨識工作 (例如景點 id)；on_done(result)、on_error(exception) 二擇一呼叫"""
+        job = RenderJob(next(self.ids), key, func, token or CancelToken(), on_progress)
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                      thread_name_prefix="render")
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(self._run, job, on_done, on_error)
+        return job
+
+    def _run(self, job, on_done, on_error):
+        try:
+            job.progress(0.0, "開始製作")
+            with metrics.span("render.job"):
+                result = job.func(job.progress)
+            job.progress(1.0, "完成")
+        except Exception as e:
+            metrics.incr("render.cancelled" if isinstance(e, RenderCancelled) else "render.failed")
+            if on_error:
+                try: on_error(e)
+                except Exception as cb_error: print(f"Render error callback failed: {cb_error}")
+            else: print(f"卡片製作失敗 ({job.key}): {e}")
+            return None
+        finally:
+            with self.lock:
+                self.jobs.pop(job.id, None)
+        if on_done:
+            # 與 image_loader 相同：callback 的例外只印出來，不讓 future 帶著沒人讀的例外結束
+            try: on_done(result)
+            except Exception as e: print(f"Render callback failed: {e}")
+        return result
+
+    def active(self, key=None):
+        """尚未結束的工作 (可指定 key)"""
+        with self.lock:
+            return [job for job in self.jobs.values() if key is None or job.key == key]
+
+render_worker = RenderWorker()
@@ -0,0 +1,107 @@
+import collections
+import threading
+import time
+
+import config
+from metrics import metrics
+
+_DONE = object()
+
+class _Slice:
+    """run_sliced() 的一個工作：逐項呼叫 func(item)，全部做完後呼叫 on_done()"""
+
+    __slots__ = ('items', 'func', 'token', 'on_done')
+
+    def __init__(self, items, func, token, on_done):
+        self.items = items
+        self.func = func
+        self.token = token
+        self.on_done = on_done
+
+class FrameScheduler:
+    """Tk 主執行緒的工作排程：每一格 (frame) 最多執行 budget_ms 毫秒，做不完的留到下一格
+
+    - post(func, token)：任何執行緒都可呼叫。背景結果先放進佇列，由主執行緒一批批交付，
+      不會每個結果各排一個 after(0) 塞滿 Tk 的事件佇列
+    - run_sliced(items, func, token, on_done)：只能在主執行緒呼叫。逐項處理 (例如建立元件)，
+      預算用完就讓出，讓 Tk 先重繪、處理輸入
+
+    token (CancelToken) 被取消後，還沒執行的工作直接丟棄。
+    """
+
+    def __init__(self, root, budget_ms=config.FRAME_BUDGET_MS, interval_ms=config.FRAME_INTERVAL_MS):
+        self.root = root
+        self.budget = budget_ms / 1000
+        self.interval_ms = interval_ms
+        self.inbox = collections.deque()     # [(func, token)]
+        self.slices = collections.deque()    # [_Slice]
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.posted = 0
+        self.frames = 0
+
+    def post(self, func, token=None):
+        with self.lock:
+            self.inbox.append((func, token))
+            self.posted += 1
+            if self.scheduled: return
+            self.scheduled = True
+        self._schedule(0)
+
+    def run_sliced(self, items, func, token=None, on_done=None):
+        with self.lock:
+            self.slices.append(_Slice(iter(items), func, token, on_done))
+            if self.scheduled: return
+            self.scheduled = True
+        self._schedule(0)
+
+    def pending(self):
+        return len(self.inbox) + len(self.slices)
+
+    def get_stats(self):
+        return {"queued": len(self.inbox), "slices": len(self.slices), "posted": self.posted, "frames": self.frames}
+
+    def _schedule(self, delay_ms):
+        try:
+            self.root.after(delay_ms, self._frame)
+        except RuntimeError:
+            # 主視窗已關閉，背景執行緒還在交付結果
+            pass
+
+    @staticmethod
+    def _call(func, *args):
+        try: func(*args)
+        except Exception as e: print(f"排程工作失敗: {e}")
+
+    def _frame(self):
+        start = time.perf_counter()
+        deadline = start + self.budget
+        # 先交付背景結果 (多半只是 configure)，再做切片工作；兩者每一格都至少前進一步
+        delivered = 0
+        while self.inbox:
+            func, token = self.inbox.popleft()
+            if token is not None and token.cancelled: continue
+            self._call(func)
+            delivered += 1
+            if time.perf_counter() >= deadline: break
+        sliced = 0
+        while self.slices and (sliced == 0 or time.perf_counter() < deadline):
+            job = self.slices[0]
+            if job.token is not None and job.token.cancelled:
+                self.slices.popleft()
+                continue
+            item = next(job.items, _DONE)
+            if item is _DONE:
+                self.slices.popleft()
+                if job.on_done: self._call(job.on_done)
+                continue
+            self._call(job.func, item)
+            sliced += 1
+        self.frames += 1
+        metrics.observe("scheduler.frame", (time.perf_counter() - start) * 1000)
+        with self.lock:
+            if self.inbox or self.slices:
+                # 隔一小段時間再繼續，中間讓 Tk 處理重繪與輸入事件
+                self._schedule(self.interval_ms)
+            else:
+                self.scheduled = False
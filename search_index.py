@@ -0,0 +1,277 @@
+import os
+import unicodedata
+from array import array
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from dataset_cache import is_missing, read_ipc, write_ipc
+
+# 索引檔格式或計分方式變動時調整，讓舊的 .search.arrow 失效
+FORMAT_VERSION = 1
+
+# ==========================================
+# 🔤 文字正規化
+# ==========================================
+# 繁體 / 日文新字體 -> 簡體 的常用字對照 (地名、店名常見字為主)
+_VARIANT_PAIRS = """
+東东 車车 橋桥 館馆 舘馆 園园 門门 長长 鉄铁 鐵铁 電电 線线 場场 飛飞 騨驒 廣广 広广 國国 圖图 図图
+圓圆 円圆 書书 聯联 實实 鎮镇 瀧泷 滝泷 氣气 気气 來来 見见 視视 覺觉 覚觉 說说 説说 話话 語语 讀读
+買买 賣卖 貝贝 頭头 題题 風风 鳥鸟 魚鱼 馬马 龍龙 竜龙 學学 體体 會会 號号 條条 樂乐 楽乐 歷历 歴历
+發发 発发 經经 経经 紅红 綠绿 緑绿 藍蓝 網网 縣县 県县 區区 廳厅 庁厅 處处 処处 數数 樣样 様样 機机
+極极 櫻樱 桜樱 歲岁 歳岁 齋斋 斎斋 邊边 辺边 遠远 運运 過过 進进 達达 選选 遊游 遺遗 鄉乡 郷乡 醫医
+開开 關关 関关 陽阳 陰阴 隊队 際际 雲云 霧雾 韓韩 順顺 預预 領领 類类 飯饭 驗验 験验 髮发 麥麦 黃黄
+齊齐 斉齐 齒齿 歯齿 寶宝 對对 対对 專专 専专 尋寻 導导 層层 嶺岭 島岛 嶋岛 峽峡 帶带 帯带 廟庙 灣湾
+從从 従从 徑径 戀恋 戰战 戦战 擇择 択择 護护 讓让 譲让 變变 変变 觀观 観观 覽览 覧览 計计 記记 訪访
+設设 許许 詩诗 認认 調调 談谈 請请 論论 諏诹 識识 議议 貨货 質质 購购 跡迹 踐践 輪轮 輸输 辦办 農农
+郵邮 鄰邻 醬酱 針针 鈴铃 銀银 銅铜 錢钱 銭钱 鍋锅 鏡镜 鐘钟 閉闭 間间 閣阁 陳陈 陸陆 隨随 難难 離离
+雞鸡 靈灵 霊灵 靜静 頁页 頂顶 項项 須须 顏颜 願愿 飲饮 駐驻 騎骑 驚惊 鬧闹 魯鲁 鮮鲜 鳴鸣 鶴鹤 鹽盐
+塩盐 麗丽 點点 黨党 齡龄 龜龟 亀龟 亂乱 亞亚 亜亚 們们 個个 倉仓 傳传 伝传 價价 価价 優优 兒儿 児儿
+內内 兩两 両两 冊册 凍冻 劃划 劍剑 剣剑 動动 務务 勝胜 勞劳 労劳 勢势 匯汇 協协 參参 雙双 吳吴 員员
+問问 單单 単单 嘆叹 嚴严 厳严 團团 団团 壓压 圧压 壞坏 壊坏 壽寿 夢梦 奧奥 婦妇 媽妈 孫孙 寫写 寬宽
+寛宽 寧宁 屆届 廠厂 彈弹 弾弹 徵征 徳德 惡恶 悪恶 愛爱 憶忆 應应 応应 懷怀 懐怀 戲戏 戯戏 揚扬 換换
+擊击 撃击 擔担 據据 擬拟 擴扩 拡扩 攝摄 敗败 敵敌 斷断 時时 晝昼 曉晓 暁晓 棧栈 楊杨 業业 構构 槍枪
+標标 樓楼 權权 権权 檢检 検检 歐欧 殘残 殺杀 決决 沒没 況况 淺浅 渋涩 澀涩 滿满 満满 漢汉 漁渔 潔洁
+澤泽 沢泽 濱滨 浜滨 濟济 済济 災灾 為为 烏乌 無无 煙烟 燈灯 爭争 爺爷 牆墙 獨独 獲获 獸兽 獣兽 現现
+環环 產产 産产 畫画 當当 疊叠 畳叠 療疗 盡尽 監监 盤盘 眾众 礦矿 鉱矿 禮礼 禪禅 種种 稱称 穩稳 穏稳
+窮穷 竊窃 窓窗 競竞 筆笔 築筑 簡简 節节 範范 糧粮 紀纪 約约 級级 紙纸 細细 終终 組组 結结 絵绘 繪绘
+統统 絲丝 綱纲 維维 綿绵 總总 総总 緒绪 練练 緣缘 縁缘 縱纵 縦纵 織织 繩绳 縄绳 續续 続续 罷罢 羅罗
+義义 習习 聖圣 聞闻 聲声 聽听 聴听 職职 肅肃 脫脱 腦脑 脳脑 臉脸 臨临 興兴 舊旧 艦舰 莊庄 荘庄 華华
+萬万 葉叶 蓋盖 蘇苏 蘭兰 蟲虫 蠶蚕 衛卫 補补 裝装 製制 複复 親亲 觸触 訓训 訊讯 託托 試试 詳详 誠诚
+誤误 誰谁 課课 謝谢 證证 証证 譯译 訳译 豐丰 豊丰 貓猫 貞贞 負负 財财 責责 貴贵 費费 貿贸 資资 賓宾
+賞赏 賢贤 賴赖 贈赠 趕赶 躍跃 軍军 軌轨 軟软 軽轻 輕轻 較较 載载 輛辆 輝辉 辭辞 邏逻 還还 鄭郑 釋释
+釈释 鋼钢 錄录 録录 鎌镰 鎖锁 閃闪 閑闲 陣阵 隱隐 隠隐 雜杂 雑杂 雖虽 頓顿 頻频 顧顾 顯显 顕显 飾饰
+餅饼 養养 駒驹 駛驶 駄驮 髙高 鳳凤 鴨鸭 鷹鹰 麵面 黙默 黒黑 戶户 戸户 瀨濑 瀬濑 渓溪 驛驿 駅驿
+"""
+_VARIANTS = {pair[0]: pair[1] for pair in _VARIANT_PAIRS.split() if pair[0] != pair[1]}
+# 片假名 -> 平假名、繁體 / 新字體 -> 簡體，一次 str.translate 完成
+_TRANSLATE = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+_TRANSLATE.update((ord(k), v) for k, v in _VARIANTS.items())
+
+def normalize(text):
+    """搜尋用的正規化：全形半形統一、大小寫、片假名轉平假名、繁體 / 新字體轉簡體"""
+    if not text: return ""
+    return unicodedata.normalize('NFKC', str(text)).casefold().translate(_TRANSLATE).strip()
+
+def grams(text):
+    """單字與雙字 n-gram (CJK 沒有空白分詞，直接以字元切)"""
+    result = set(text)
+    result.update(text[i:i + 2] for i in range(len(text) - 1))
+    result.discard(" ")
+    return result
+
+def _list_array(arrays, value_type):
+    """[np.ndarray] -> Arrow ListArray (None 為空值)"""
+    offsets, values, mask = [0], [], []
+    for a in arrays:
+        mask.append(a is None)
+        if a is not None: values.append(a)
+        offsets.append(offsets[-1] + (0 if a is None else len(a)))
+    flat = np.concatenate(values) if values else np.empty(0)
+    return pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), pa.array(flat, value_type),
+                                    mask=pa.array(mask, pa.bool_()))
+
+def _lists(column):
+    """ListArray 欄 -> [np.ndarray 或 None]；值是記憶體映射檔的零複製視圖"""
+    arr = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    values = arr.values.to_numpy()
+    offsets = arr.offsets.to_numpy()
+    valid = arr.is_valid().to_numpy(zero_copy_only=False)
+    return [values[offsets[i]:offsets[i + 1]] if valid[i] else None for i in range(len(arr))]
+
+# ==========================================
+# 🔍 倒排索引
+# ==========================================
+class SearchIndex:
+    """景點名稱的 n-gram 倒排索引
+
+    查詢先用最少的 posting list 縮小候選，再對候選整批 (Arrow compute) 確認子字串並計分。
+    欄位權重：name / cn > 所屬區域 > origin；前綴比對與完全相符額外加分。
+    超過 RANK_AT 筆的 posting list 另存依分數排好的前 RANK_CAP 筆，單字 / 雙字查詢直接取用，
+    不必對上萬個候選計分。索引可存成 Arrow 檔 (save / load)，以來源檔雜湊判斷是否過期。
+    """
+
+    FIELD_WEIGHTS = {"name": 3.0, "cn": 3.0, "origin": 1.0}
+    GROUP_WEIGHT = 2.0
+    RANK_AT = 4096
+    RANK_CAP = 1000
+
+    def __init__(self, ids, texts, postings, ranked=None):
+        self.ids = ids            # Arrow 陣列：文件編號 -> 景點 id
+        self.texts = texts        # {欄位: Arrow 字串陣列 (正規化文字，空值為 null)}
+        self.postings = postings  # gram -> np.uint32 文件編號 (遞增)
+        self.ranked = ranked if ranked is not None else {}   # gram -> (文件編號, 分數)，分數高者在前
+        self.group_names = pa.array([], pa.string())   # 區域編號 -> 正規化區域名稱
+        self.group_members = np.empty(0, dtype=np.uint32) # 各區域的文件編號 (攤平)
+        self.group_owners = np.empty(0, dtype=np.int32)   # group_members 每一項所屬的區域編號
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records):
+        ids, postings = [], {}
+        texts = {name: [] for name in cls.FIELD_WEIGHTS}
+        for doc, rec in enumerate(records):
+            ids.append(rec.get('id'))
+            doc_grams = set()
+            for name in cls.FIELD_WEIGHTS:
+                value = rec.get(name)
+                text = "" if is_missing(value) else normalize(value)
+                texts[name].append(text or None)
+                doc_grams |= grams(text)
+            for g in doc_grams:
+                posting = postings.get(g)
+                if posting is None:
+                    postings[g] = posting = array('I')
+                posting.append(doc)
+        index = cls(pa.array(ids), {name: pa.array(values, pa.string()) for name, values in texts.items()},
+                    {g: np.array(p, dtype=np.uint32) for g, p in postings.items()})
+        for g, posting in index.postings.items():
+            if len(posting) > cls.RANK_AT: index.ranked[g] = index._rank(g, posting)
+        return index
+
+    # --- 存檔 / 讀取 ---
+    @staticmethod
+    def _paths(path):
+        return path, path[:-len(".arrow")] + "-docs.arrow" if path.endswith(".arrow") else path + "-docs"
+
+    @staticmethod
+    def _metadata(digest):
+        return {b'source_sha256': digest.encode('ascii'), b'format': str(FORMAT_VERSION).encode('ascii')}
+
+    def save(self, path, digest):
+        grams_path, docs_path = self._paths(path)
+        names = list(self.postings)
+        grams_table = pa.table({
+            "gram": pa.array(names, pa.string()),
+            "docs": _list_array([self.postings[g] for g in names], pa.uint32()),
+            "ranked": _list_array([self.ranked[g][0] if g in self.ranked else None for g in names], pa.uint32()),
+            "ranked_scores": _list_array([self.ranked[g][1] if g in self.ranked else None for g in names],
+                                         pa.float32()),
+        })
+        docs_table = pa.table(dict(id=self.ids, **self.texts))
+        # 先寫文件表，索引表 (讀取時先檢查) 最後才換上
+        write_ipc(docs_path, docs_table.replace_schema_metadata(self._metadata(digest)))
+        write_ipc(grams_path, grams_table.replace_schema_metadata(self._metadata(digest)))
+
+    @classmethod
+    def load(cls, path, digest):
+        """雜湊相符時回傳記憶體映射的索引，否則回傳 None"""
+        grams_path, docs_path = cls._paths(path)
+        grams_table = read_ipc(grams_path, cls._metadata(digest))
+        docs_table = read_ipc(docs_path, cls._metadata(digest)) if grams_table is not None else None
+        if docs_table is None: return None
+        names = grams_table.column("gram").to_pylist()
+        postings = dict(zip(names, _lists(grams_table.column("docs"))))
+        ranked = {g: (docs, scores) for g, docs, scores in zip(names, _lists(grams_table.column("ranked")),
+                                                               _lists(grams_table.column("ranked_scores")))
+                  if docs is not None}
+        column = lambda name: docs_table.column(name).combine_chunks()
+        return cls(column("id"), {name: column(name) for name in cls.FIELD_WEIGHTS}, postings, ranked)
+
+    @classmethod
+    def load_or_build(cls, path, digest, records):
+        """有相同雜湊的索引檔就直接讀取，否則以 records() 建立並存檔"""
+        if digest is not None and os.path.exists(path):
+            index = cls.load(path, digest)
+            if index is not None: return index
+        index = cls.from_records(records())
+        if digest is not None:
+            try:
+                index.save(path, digest)
+            except Exception as e:
+                print(f"搜尋索引存檔失敗: {e}")
+        return index
+
+    # --- 查詢 ---
+    def set_groups(self, groups, doc_of=None):
+        """groups: {區域名稱: [景點 id]}，讓搜尋區域名稱也能找到其中的景點
+
+        doc_of 為 {景點 id: 文件編號}，呼叫端已有時傳入 (文件編號與資料列順序相同)。
+        區域名稱與成員攤平成陣列，查詢時整批比對，區域上萬個也不必逐一迴圈。
+        """
+        if doc_of is None: doc_of = {sid: doc for doc, sid in enumerate(self.ids.to_pylist())}
+        names, members, owners = [], [], []
+        for group, (name, scene_ids) in enumerate(groups.items()):
+            names.append(normalize(name))
+            docs = [doc_of[sid] for sid in scene_ids if sid in doc_of]
+            members.extend(docs)
+            owners.extend([group] * len(docs))
+        self.group_names = pa.array(names, pa.string())
+        self.group_members = np.array(members, dtype=np.uint32)
+        self.group_owners = np.array(owners, dtype=np.int32)
+
+    def _group_scores(self, q):
+        """各區域對 q 的分數 (名稱開頭相符加倍)；沒有任何區域符合時回傳 None"""
+        if not len(self.group_names): return None
+        pos = pc.find_substring(self.group_names, q).to_numpy(zero_copy_only=False)
+        if not (pos >= 0).any(): return None
+        return np.where(pos < 0, 0.0, self.GROUP_WEIGHT * np.where(pos == 0, 2.0, 1.0)).astype(np.float32)
+
+    def _candidates(self, q):
+        if len(q) == 1:
+            return self.postings.get(q, np.empty(0, dtype=np.uint32))
+        best = None
+        for i in range(len(q) - 1):
+            posting = self.postings.get(q[i:i + 2])
+            if posting is None: return np.empty(0, dtype=np.uint32)
+            if best is None or len(posting) < len(best): best = posting
+        return best
+
+    def _score(self, docs, q):
+        """docs 中每個文件對 q 的文字分數 (0 表示不符合)"""
+        best = np.zeros(len(docs), dtype=np.float32)
+        if not len(docs): return best
+        indices = pa.array(docs, pa.uint32())
+        for name, weight in self.FIELD_WEIGHTS.items():
+            texts = self.texts[name].take(indices)
+            pos = pc.fill_null(pc.find_substring(texts, q), -1).to_numpy(zero_copy_only=False)
+            exact = pc.fill_null(pc.equal(texts, q), False).to_numpy(zero_copy_only=False)
+            score = np.where(pos < 0, 0.0, weight * np.where(pos == 0, 2.0, 1.0) + exact)
+            np.maximum(best, score, out=best)
+        return best
+
+    def _rank(self, q, docs):
+        scores = self._score(docs, q)
+        order = np.lexsort((docs, -scores))[:self.RANK_CAP]
+        order = order[scores[order] > 0]
+        return docs[order], scores[order]
+
+    def search_scored(self, keyword, limit=None):
+        """[(分數, 景點 id)]，分數高者優先，同分時依原資料順序"""
+        q = normalize(keyword)
+        if not q: return []
+        ranked = self.ranked.get(q) if limit and limit <= self.RANK_CAP else None
+        if ranked is not None:
+            # 常見的單字 / 雙字：已依分數排好，前 limit 筆就是文字分數最高的
+            docs, scores = ranked[0][:limit], ranked[1][:limit]
+        else:
+            docs = self._candidates(q)
+            scores = self._score(docs, q)
+            keep = scores > 0
+            docs, scores = docs[keep], scores[keep]
+
+        # 文字與區域分數合併到每個文件一格的陣列 (同一文件取較高分)，再取前 limit 名
+        best = np.zeros(len(self.ids), dtype=np.float32)
+        group_scores = self._group_scores(q)
+        if group_scores is not None:
+            member_scores = group_scores[self.group_owners]
+            for value in np.unique(member_scores[member_scores > 0]):   # 由低到高，高分覆蓋低分
+                best[self.group_members[member_scores == value]] = value
+        best[docs] = np.maximum(best[docs], scores)
+
+        docs = np.flatnonzero(best)
+        scores = best[docs]
+        if limit and len(docs) > limit:
+            key = -scores.astype(np.float64) * (len(best) + 1) + docs
+            keep = np.argpartition(key, limit - 1)[:limit]
+            docs, scores = docs[keep], scores[keep]
+        order = np.lexsort((docs, -scores))
+        ids = self.ids.take(pa.array(docs[order], pa.uint32())).to_pylist()
+        return list(zip(scores[order].tolist(), ids))
+
+    def search(self, keyword, limit=None):
+        """回傳依相關度排序的景點 id 列表"""
+        return [sid for _, sid in self.search_scored(keyword, limit)]
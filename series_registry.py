@@ -0,0 +1,217 @@
+import argparse
+import heapq
+import json
+import os
+import threading
+import time
+
+import config
+from clustering import ClusterEngine, get_geo
+from data_manager import DataManager
+
+MANIFEST_FILE = 'manifest.json'
+# 還沒建立分片目錄時，把原本的單一作品檔當成預設作品
+LEGACY_SERIES = {"id": config.DEFAULT_SERIES_ID, "title": "君の名は。", "cn": "你的名字。",
+                 "file": os.path.abspath('你的名字.json'), "tags": ["2016", "Romance", "Fantasy"],
+                 "cover": "https://upload.wikimedia.org/wikipedia/zh/4/4e/Your_name_poster.jpg"}
+
+def summarize(records):
+    """manifest 用的分片摘要：景點數、範圍 [south, west, north, east]、封面
+
+    records 為 SceneRecords 時只讀 geo / image 兩欄，不展開整列。
+    """
+    if hasattr(records, 'columns'):
+        cols = records.columns(['geo', 'image'])
+        geo_values, images = cols['geo'], cols['image']
+    else:
+        geo_values, images = [r.get('geo') for r in records], [r.get('image') for r in records]
+    geos = [g for g in (get_geo({'geo': v}) for v in geo_values) if g]
+    bbox = None
+    if geos:
+        lats, lons = [g[0] for g in geos], [g[1] for g in geos]
+        bbox = [min(lats), min(lons), max(lats), max(lons)]
+    cover = next((image for image in images if image), None)
+    return {"count": len(records), "bbox": bbox, "cover": cover}
+
+class SeriesRegistry:
+    """作品登錄表
+
+    manifest (每部作品的名稱、景點數、範圍、封面) 常駐記憶體；各作品的景點
+    分片 (<id>.json，各自有 Arrow 快取) 第一次用到才載入，閒置超過
+    idle_seconds 就釋放，記憶體只跟著正在瀏覽的作品成長。
+    搜尋、分群與地圖都以「目前已載入的分片」為範圍。
+    """
+
+    def __init__(self, series_dir=config.SERIES_DIR, idle_seconds=config.SERIES_IDLE_SECONDS):
+        self.series_dir = series_dir
+        self.idle_seconds = idle_seconds
+        self.manifest = self.load_manifest()
+        self.shards = {}          # id -> DataManager
+        self.clusters = {}        # id -> 分群結果
+        self.last_used = {}       # id -> 最後使用時間
+        self.version = 0          # 已載入分片變動時 +1，地圖索引據此重建
+        self.lock = threading.RLock()
+
+    # --- manifest ---
+    @property
+    def manifest_path(self):
+        return os.path.join(self.series_dir, MANIFEST_FILE)
+
+    def load_manifest(self):
+        series = {}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    series = json.load(f).get('series', {})
+            except Exception as e:
+                print(f"讀取作品清單失敗: {e}")
+        if LEGACY_SERIES['id'] not in series and os.path.exists(LEGACY_SERIES['file']):
+            series[LEGACY_SERIES['id']] = dict(LEGACY_SERIES)
+        return series
+
+    def save_manifest(self):
+        try:
+            os.makedirs(self.series_dir, exist_ok=True)
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'series': self.manifest}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            print(f"儲存作品清單失敗: {e}")
+
+    def series(self):
+        """所有作品 (依景點數多到少)"""
+        return sorted(self.manifest.values(), key=lambda e: -(e.get('count') or 0))
+
+    def entry(self, series_id):
+        return self.manifest.get(str(series_id))
+
+    def shard_path(self, entry):
+        return os.path.join(self.series_dir, entry.get('file') or f"{entry['id']}.json")
+
+    def add_series(self, series_id, records, title, cn=None, cover=None, tags=None):
+        """寫入一部作品的分片並更新 manifest"""
+        series_id = str(series_id)
+        entry = {"id": series_id, "title": title, "cn": cn or title, "file": f"{series_id}.json", "tags": tags or []}
+        entry.update(summarize(records))
+        if cover: entry['cover'] = cover
+        os.makedirs(self.series_dir, exist_ok=True)
+        path = self.shard_path(entry)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.manifest[series_id] = entry
+            if series_id in self.shards: self.unload(series_id)
+        self.save_manifest()
+        return entry
+
+    # --- 分片載入 / 釋放 ---
+    def get(self, series_id):
+        """取得作品的 DataManager (沒載入就載入)"""
+        series_id = str(series_id)
+        with self.lock:
+            self.last_used[series_id] = time.monotonic()
+            dm = self.shards.get(series_id)
+            if dm is not None: return dm
+            entry = self.entry(series_id)
+            if entry is None: raise KeyError(f"找不到作品 {series_id}")
+            dm = DataManager(self.shard_path(entry), series_title=entry.get('cn') or entry.get('title'))
+            if entry.get('count') is None:
+                entry.update(summarize(dm.get_all_scenes()))
+                # 已有 manifest 的分片目錄才寫回，下次啟動不必再算
+                if os.path.exists(self.manifest_path): self.save_manifest()
+            self.shards[series_id] = dm
+            self.version += 1
+            return dm
+
+    def clusters_for(self, series_id):
+        """作品的區域分群 (磁碟快取)，區域名稱同時加入該分片的搜尋索引"""
+        series_id = str(series_id)
+        dm = self.get(series_id)
+        with self.lock:
+            if series_id not in self.clusters:
+                scenes = dm.get_all_scenes()
+                clusters = ClusterEngine().load_or_build(scenes) if len(scenes) else []
+                dm.search_index.set_groups({c['name']: c['ids'] for c in clusters}, dm.row_of_id)
+                self.clusters[series_id] = clusters
+            return self.clusters[series_id]
+
+    def unload(self, series_id):
+        with self.lock:
+            self.shards.pop(series_id, None)
+            self.clusters.pop(series_id, None)
+            self.last_used.pop(series_id, None)
+            self.version += 1
+
+    def evict_idle(self, keep=()):
+        """釋放閒置過久的分片，回傳被釋放的作品 id"""
+        now = time.monotonic()
+        with self.lock:
+            idle = [sid for sid, t in self.last_used.items()
+                    if sid not in keep and now - t > self.idle_seconds]
+            for sid in idle: self.unload(sid)
+        return idle
+
+    def loaded_ids(self):
+        with self.lock:
+            return list(self.shards)
+
+    # --- 跨分片查詢 ---
+    def loaded_scenes(self):
+        with self.lock:
+            shards = list(self.shards.values())
+        scenes = []
+        for dm in shards:
+            scenes.extend(dm.get_all_scenes())
+        return scenes
+
+    def loaded_clusters(self):
+        return [c for sid in self.loaded_ids() for c in self.clusters_for(sid)]
+
+    def get_scene(self, scene_id):
+        with self.lock:
+            shards = list(self.shards.values())
+        for dm in shards:
+            scene = dm.get_scene(scene_id)
+            if scene is not None: return scene
+        return None
+
+    def search_ids(self, keyword, limit=None):
+        """在所有已載入的作品中搜尋，依分數合併排序"""
+        with self.lock:
+            shards = list(self.shards.values())
+        merged = []
+        for rank, dm in enumerate(shards):
+            for order, (score, sid) in enumerate(dm.search_index.search_scored(keyword, limit)):
+                merged.append((-score, rank, order, sid))
+        merged = heapq.nsmallest(limit, merged) if limit else sorted(merged)
+        return [sid for *_, sid in merged]
+
+def main():
+    parser = argparse.ArgumentParser(description="管理作品分片 (每部作品一個 <bangumi id>.json)")
+    sub = parser.add_subparsers(dest='cmd')
+    sub.add_parser('list', help="列出所有作品")
+    add = sub.add_parser('add', help="把一個景點 JSON 檔加入為作品分片")
+    add.add_argument('json_file')
+    add.add_argument('--id', required=True, help="bangumi id")
+    add.add_argument('--title', required=True)
+    add.add_argument('--cn')
+    add.add_argument('--cover')
+    add.add_argument('--tags', nargs='*')
+    args = parser.parse_args()
+
+    registry = SeriesRegistry()
+    if args.cmd == 'add':
+        with open(args.json_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        entry = registry.add_series(args.id, records, args.title, args.cn, args.cover, args.tags)
+        print(f"已加入 {entry['id']} {entry['title']}：{entry['count']} 個景點")
+        return
+    for entry in registry.series():
+        count = entry.get('count')
+        print(f"{entry['id']:>8}  {entry.get('cn') or entry['title']}  ({'?' if count is None else count} 個景點)")
+
+if __name__ == "__main__":
+    main()
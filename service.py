@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import json
+import math
+import re
+import signal
+import time
+from urllib.parse import urlsplit, parse_qs
+
+import config
+from card_encoder import ENCODERS
+from engine import Engine, EngineError, render_card
+from image_cache import MemoryImageCache
+from metrics import metrics
+
+CONTENT_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+class Response:
+    def __init__(self, status=200, body=b"", content_type="application/json; charset=utf-8", headers=None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+def json_response(data, status=200):
+    return Response(status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+def error_response(message, status):
+    return json_response({"error": message}, status)
+
+REQUIRED = object()
+
+def param(query, name, cast, default=REQUIRED, low=None, high=None):
+    """取出查詢參數並轉型、檢查範圍；缺少或不合法時丟 EngineError (400)"""
+    value = query.get(name)
+    if value is None or value == "":
+        if default is REQUIRED: raise EngineError(f"缺少參數 {name}")
+        return default
+    try:
+        value = cast(value)
+    except ValueError:
+        raise EngineError(f"參數 {name} 格式錯誤: {value}")
+    if isinstance(value, float) and not math.isfinite(value): raise EngineError(f"參數 {name} 格式錯誤: {value}")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise EngineError(f"參數 {name} 需介於 {low} ~ {high}")
+    return value
+
+class Service:
+    """AniTrip 的本機 HTTP 服務 (asyncio，只用標準函式庫)
+
+    查詢 / 打卡在執行緒池呼叫 Engine，卡片製作交給行程池；已編碼的卡片依快取鍵
+    (景點、版型、尺寸、格式、照片雜湊…) 放在記憶體 LRU，相同的請求同時進來只做一次。
+
+        GET  /health                     GET  /series
+        GET  /scenes/<id>                GET  /search?q=新宿&limit=20&series=160209
+        GET  /nearby?lat=&lon=&radius=1000&limit=20
+        GET  /clusters?series=           GET  /clusters/<id>
+        GET  /passport                   POST /checkins          {"scene_id": "..."}
+        GET  /cards/<id>?template=Classic&scale=2&format=jpeg&quality=
+        POST /cards/<id>?...             (body 為照片檔案內容)
+        GET  /stats
+    """
+
+    def __init__(self, engine=None, host=config.SERVICE_HOST, port=config.SERVICE_PORT,
+                 render_workers=config.SERVICE_RENDER_WORKERS, io_workers=config.SERVICE_IO_WORKERS):
+        self.engine = engine or Engine()
+        self.host = host
+        self.port = port
+        self.render_workers = render_workers
+        self.io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="service-io")
+        self.render_pool = None
+        self.cards = MemoryImageCache(config.SERVICE_CARD_CACHE_MAX_BYTES)
+        self.inflight = {}       # 快取鍵 -> asyncio.Future (製作中的卡片)
+        self.server = None
+        self.evictor = None      # 定期釋放閒置作品分片的 asyncio task
+        self.started = time.time()
+        self.stats = {"requests": 0, "errors": 0, "renders": 0, "render_coalesced": 0, "not_modified": 0}
+        routes = [
+            ("GET", r"/health", self.health),
+            ("GET", r"/series", self.series),
+            ("GET", r"/scenes/(?P<scene_id>[^/]+)", self.scene),
+            ("GET", r"/search", self.search),
+            ("GET", r"/nearby", self.nearby),
+            ("GET", r"/clusters", self.clusters),
+            ("GET", r"/clusters/(?P<cluster_id>[^/]+)", self.cluster),
+            ("GET", r"/passport", self.passport),
+            ("POST", r"/checkins", self.check_in),
+            ("GET", r"/cards/(?P<scene_id>[^/]+)", self.card),
+            ("POST", r"/cards/(?P<scene_id>[^/]+)", self.card),
+            ("GET", r"/stats", self.get_stats),
+        ]
+        self.routes = [(method, re.compile(pattern + "$"), handler) for method, pattern, handler in routes]
+
+    # --- 啟動 / 停止 ---
+    async def start(self):
+        self.render_pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.render_workers)
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.evictor = asyncio.create_task(self._evict_idle_loop())
+        return self
+
+    def close(self):
+        if self.evictor is not None: self.evictor.cancel()
+        if self.server is not None: self.server.close()
+        if self.render_pool is not None: self.render_pool.shutdown(cancel_futures=True)
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def call(self, func, *args, **kwargs):
+        """在執行緒池呼叫 Engine (SQLite、搜尋、分群都是同步的)"""
+        return await asyncio.get_running_loop().run_in_executor(self.io_pool, functools.partial(func, *args, **kwargs))
+
+    async def _evict_idle_loop(self, interval=config.SERVICE_EVICT_INTERVAL_S):
+        """定期釋放閒置的作品分片 (與 GUI 的 _evict_idle_series 相同)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = await self.call(self.engine.evict_idle)
+                if evicted: print(f"釋放閒置作品: {', '.join(evicted)}")
+            except Exception as e:
+                print(f"釋放閒置作品失敗: {e}")
+
+    # --- HTTP ---
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line: break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._write(writer, error_response("無法解析的請求", 400), keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""): break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > config.SERVICE_MAX_BODY_BYTES:
+                    await self._write(writer, error_response("請求內容太大", 413), keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get('connection', '').lower() != 'close') and version == "HTTP/1.1"
+                response = await self._dispatch(method, target, headers, body)
+                await self._write(writer, response, keep_alive)
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, headers, body):
+        self.stats['requests'] += 1
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if match is None: continue
+            if route_method != method:
+                allowed = True
+                continue
+            start = time.perf_counter()
+            try:
+                return await handler(query=query, headers=headers, body=body, **match.groupdict())
+            except EngineError as e:
+                return error_response(str(e), e.status)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"請求處理失敗 ({method} {url.path}): {e}")
+                return error_response("伺服器錯誤", 500)
+            finally:
+                metrics.observe(f"service.{handler.__name__}", (time.perf_counter() - start) * 1000)
+        return error_response("不支援的方法", 405) if allowed else error_response("找不到路徑", 404)
+
+    async def _write(self, writer, response, keep_alive):
+        lines = [f"HTTP/1.1 {response.status} {REASONS.get(response.status, '')}",
+                 f"Content-Type: {response.content_type}", f"Content-Length: {len(response.body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{k}: {v}" for k, v in response.headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + response.body)
+        await writer.drain()
+
+    # --- 端點 ---
+    async def health(self, **_):
+        return json_response({"ok": True, "uptime_s": round(time.time() - self.started, 1)})
+
+    async def series(self, **_):
+        return json_response(await self.call(self.engine.series))
+
+    async def scene(self, scene_id, **_):
+        return json_response(await self.call(self.engine.scene, scene_id))
+
+    async def search(self, query, **_):
+        limit = param(query, 'limit', int, 20, 1, config.SERVICE_MAX_LIMIT)
+        return json_response(await self.call(self.engine.search, query.get('q', ''), limit, query.get('series')))
+
+    async def nearby(self, query, **_):
+        lat, lon = param(query, 'lat', float, low=-90, high=90), param(query, 'lon', float, low=-180, high=180)
+        radius = param(query, 'radius', float, 1000.0, 0)
+        limit = param(query, 'limit', int, 20, 1, config.SERVICE_MAX_LIMIT)
+        return json_response(await self.call(self.engine.nearby, lat, lon, radius, limit, query.get('series')))
+
+    async def clusters(self, query, **_):
+        return json_response(await self.call(self.engine.clusters, query.get('series')))
+
+    async def cluster(self, cluster_id, **_):
+        return json_response(await self.call(self.engine.cluster, cluster_id))
+
+    async def passport(self, **_):
+        return json_response(await self.call(self.engine.passport))
+
+    async def check_in(self, body, **_):
+        try:
+            data = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            raise EngineError("請求內容不是 JSON")
+        if not isinstance(data, dict) or not isinstance(data.get('scene_id'), str) or not data['scene_id']:
+            raise EngineError("缺少 scene_id")
+        return json_response(await self.call(self.engine.check_in, data['scene_id']))
+
+    async def card(self, scene_id, query, headers, body, **_):
+        fmt = query.get('format', config.CARD_FORMAT)
+        quality = param(query, 'quality', int, None, 1, 100)
+        scale = param(query, 'scale', int, 2)
+        key, task = await self.call(self.engine.card_task, scene_id, query.get('template', "Classic"),
+                                    scale, fmt, quality, body or None)
+        etag = f'"{key}"'
+        cache_headers = {"ETag": etag, "Cache-Control": "max-age=3600"}
+        if headers.get('if-none-match') == etag:
+            self.stats['not_modified'] += 1
+            return Response(304, headers=cache_headers)
+        data, hit = await self.render(key, task)
+        return Response(200, data, CONTENT_TYPES.get(fmt, "application/octet-stream"),
+                        dict(cache_headers, **{"X-Cache": "hit" if hit else "miss"}))
+
+    async def render(self, key, task):
+        """快取 -> 製作中的同一張卡片 -> 交給行程池；回傳 (卡片內容, 是否命中快取)"""
+        data = self.cards.get(key)
+        if data is not None: return data, True
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats['render_coalesced'] += 1
+            return await asyncio.shield(future), False
+        future = asyncio.get_running_loop().run_in_executor(self.render_pool, render_card, task)
+        self.inflight[key] = future
+        self.stats['renders'] += 1
+        try:
+            with metrics.span("service.render"):
+                data = await asyncio.shield(future)
+        finally:
+            self.inflight.pop(key, None)
+        self.cards.put(key, data, len(data))
+        return data, False
+
+    async def get_stats(self, **_):
+        return json_response({"uptime_s": round(time.time() - self.started, 1), "requests": dict(self.stats),
+                              "card_cache": self.cards.get_stats(), "inflight": len(self.inflight),
+                              "metrics": metrics.snapshot() if metrics.enabled else None})
+
+async def serve(host, port, render_workers):
+    service = await Service(host=host, port=port, render_workers=render_workers).start()
+    # SIGTERM 也要正常結束，卡片製作的子行程才會一起關閉
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try: loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError: pass   # Windows：Ctrl+C 由 asyncio.run 轉成 KeyboardInterrupt
+    print(f"AniTrip 服務已啟動: http://{service.host}:{service.port}  (卡片格式 {', '.join(ENCODERS)})", flush=True)
+    try:
+        await stop.wait()
+    finally:
+        service.close()
+    print("服務已停止")
+
+def main():
+    parser = argparse.ArgumentParser(description="AniTrip 本機 HTTP 服務 (搜尋、附近景點、區域、打卡、卡片)")
+    parser.add_argument('--host', default=config.SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVICE_PORT)
+    parser.add_argument('--render-workers', type=int, default=config.SERVICE_RENDER_WORKERS, help="卡片製作行程數")
+    parser.add_argument('--metrics', action='store_true', help="記錄各端點耗時 (/stats 可查看)")
+    args = parser.parse_args()
+    metrics.enabled = metrics.enabled or args.metrics
+    try:
+        asyncio.run(serve(args.host, args.port, args.render_workers))
+    except KeyboardInterrupt:
+        print("服務已停止")
+
+if __name__ == "__main__":
+    main()
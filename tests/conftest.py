@@ -0,0 +1,15 @@
+import os
+import sys
+
+# 測試直接匯入專案根目錄的模組 (與 python main.py 相同的匯入方式)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+import pytest
+
+from benchmarks.stub_server import ImageStub
+
+@pytest.fixture
+def stub():
+    with ImageStub() as server:
+        yield server
@@ -0,0 +1,27 @@
+import config
+from batch_export import BatchExporter
+from passport_manager import PassportManager
+
+def make_passport(tmp_path):
+    pm = PassportManager(db_path=str(tmp_path / "passport.db"), legacy_file=str(tmp_path / "none.json"))
+    pm.check_in("s1", card_path=str(tmp_path / "cards" / "s1.png"))
+    return pm
+
+def test_default_out_is_not_the_collection(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'SAVE_DIR', str(tmp_path / "cards"))
+    exporter = BatchExporter()
+    assert exporter.out_dir == config.EXPORT_DIR and not exporter.replaces_collection
+    pm = make_passport(tmp_path)
+    exporter.update_passport(pm, ["s1"])
+    assert pm.get_checkin("s1")['card_path'].endswith("s1.png")
+    pm.close()
+
+def test_export_into_collection_updates_card_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'SAVE_DIR', str(tmp_path / "cards"))
+    exporter = BatchExporter(str(tmp_path / "cards"), fmt="jpeg")
+    assert exporter.replaces_collection
+    pm = make_passport(tmp_path)
+    exporter.update_passport(pm, ["s1", "not-visited"])
+    assert pm.get_checkin("s1")['card_path'] == exporter.out_path("s1")
+    assert not pm.is_visited("not-visited")
+    pm.close()
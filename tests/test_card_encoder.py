@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from PIL import Image
+
+import card_encoder
+from card_encoder import card_file, card_ids, save_card, transcode
+from passport_manager import PassportManager
+
+def make_card():
+    return Image.linear_gradient("L").resize((120, 180)).convert("RGB")
+
+def test_save_replaces_other_formats(tmp_path):
+    save_dir = str(tmp_path / "cards")
+    jpeg = save_card(make_card(), "s1", save_dir, fmt="jpeg")
+    assert os.listdir(save_dir) == ["s1.jpg"]
+    webp = save_card(make_card(), "s1", save_dir, fmt="webp")
+    # 新格式寫完才刪舊檔，資料夾裡只剩一張，沒有暫存檔
+    assert os.listdir(save_dir) == ["s1.webp"]
+    assert not os.path.exists(jpeg) and card_file("s1", save_dir) == webp
+    with Image.open(webp) as img: assert img.format == "WEBP" and img.size == (120, 180)
+    assert card_ids(save_dir) == ["s1"]
+
+def test_failed_encode_keeps_old_card(tmp_path, monkeypatch):
+    save_dir = str(tmp_path / "cards")
+    old = save_card(make_card(), "s1", save_dir, fmt="jpeg")
+    monkeypatch.setitem(card_encoder.ENCODERS["webp"], "options", {"quality": "bad"})
+    with pytest.raises(Exception):
+        save_card(make_card(), "s1", save_dir, fmt="webp")
+    assert os.listdir(save_dir) == ["s1.jpg"] and card_file("s1", save_dir) == old
+
+def test_transcode_updates_card_path(tmp_path, monkeypatch):
+    # transcode 使用預設的 passport.db / visited.json (相對路徑)
+    monkeypatch.chdir(tmp_path)
+    save_dir = str(tmp_path / "cards")
+    jpeg = save_card(make_card(), "s1", save_dir, fmt="jpeg")
+    save_card(make_card(), "s2", save_dir, fmt="jpeg")
+    pm = PassportManager()
+    pm.check_in("s1", card_path=jpeg)
+    pm.close()
+    transcode("webp", save_dir=save_dir)
+    assert sorted(os.listdir(save_dir)) == ["s1.webp", "s2.webp"]
+    pm = PassportManager()
+    assert pm.get_checkin("s1")['card_path'] == os.path.join(save_dir, "s1.webp")
+    # 沒打過卡的景點不會因為轉檔而被打卡
+    assert pm.get_checkin("s2") is None
+    pm.close()
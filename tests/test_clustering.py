@@ -0,0 +1,37 @@
+import json
+
+from benchmarks import synthetic
+from clustering import ClusterEngine
+from dataset_cache import DatasetCache
+from series_registry import summarize
+
+def load_records(tmp_path, n=2000):
+    json_file = tmp_path / "scenes.json"
+    json_file.write_text(json.dumps(synthetic.generate(n), ensure_ascii=False), encoding='utf-8')
+    return DatasetCache(str(tmp_path / "dataset")).load(str(json_file))
+
+def test_cache_hit_keeps_rows_lazy(tmp_path):
+    built = ClusterEngine(cache_dir=str(tmp_path / "clusters")).load_or_build(load_records(tmp_path))
+    records = load_records(tmp_path)
+    loaded = ClusterEngine(cache_dir=str(tmp_path / "clusters")).load_or_build(records)
+    # 快取鍵用來源 sha256、by_id 只讀 id 欄：載入分群不展開任何一列
+    assert all(row is None for row in records._rows)
+    assert [c['ids'] for c in loaded] == [c['ids'] for c in built]
+    first = loaded[0]
+    assert [p['id'] for p in first['points']] == first['ids']
+
+def test_add_point_after_cache_hit(tmp_path):
+    engine = ClusterEngine(cache_dir=str(tmp_path / "clusters"))
+    engine.load_or_build(load_records(tmp_path))
+    engine = ClusterEngine(cache_dir=str(tmp_path / "clusters"))
+    clusters = engine.load_or_build(load_records(tmp_path))
+    center = clusters[0]['center']
+    cluster = engine.add_point({"id": "new", "name": "新景點", "geo": list(center)})
+    assert cluster['ids'][-1] == "new" and cluster['points'][-1]['id'] == "new"
+
+def test_summarize_reads_columns_only(tmp_path):
+    records = load_records(tmp_path, 500)
+    summary = summarize(records)
+    assert all(row is None for row in records._rows)
+    assert summary == summarize([dict(r) for r in load_records(tmp_path, 500)])
+    assert summary['count'] == 500 and summary['bbox'] is not None
@@ -0,0 +1,32 @@
+import concurrent.futures
+import json
+import os
+
+import pyarrow as pa
+
+from dataset_cache import DatasetCache, read_ipc, write_ipc
+
+def write_json(path, records):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+def test_same_basename_in_different_folders(tmp_path):
+    cache = DatasetCache(str(tmp_path / "dataset"))
+    first = write_json(tmp_path / "a" / "data.json", [{"id": "a1", "name": "新宿"}])
+    second = write_json(tmp_path / "b" / "data.json", [{"id": "b1", "name": "飛騨古川"}, {"id": "b2", "name": "須賀"}])
+    assert cache.sidecar_path(first) != cache.sidecar_path(second)
+    assert cache.load(first).ids() == ["a1"]
+    assert cache.load(second).ids() == ["b1", "b2"]
+    # 兩份快取都還在，再載入不必重建
+    assert cache.load(first).ids() == ["a1"]
+    assert len(os.listdir(tmp_path / "dataset")) == 2
+
+def test_concurrent_writers_leave_no_temp_files(tmp_path):
+    path = str(tmp_path / "dataset" / "scenes.arrow")
+    metadata = {b'source_sha256': b'digest'}
+    table = pa.table({"id": [str(i) for i in range(5000)]}).replace_schema_metadata(metadata)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: write_ipc(path, table), range(8)))
+    assert os.listdir(tmp_path / "dataset") == ["scenes.arrow"]
+    assert read_ipc(path, metadata).num_rows == 5000
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import effects
+
+SIZES = [(1200, 500), (280, 200), (333, 77)]
+
+def sample_images(size):
+    noise = Image.effect_noise(size, 60).convert("RGB")
+    ramp = Image.linear_gradient("L").resize(size).convert("RGB")
+    mixed = Image.merge("RGB", [Image.linear_gradient("L").resize(size), Image.radial_gradient("L").resize(size),
+                                Image.effect_noise(size, 30)])
+    return [noise, ramp, mixed]
+
+def pixel_diff(a, b):
+    assert a.size == b.size
+    diff = np.abs(np.asarray(a.convert("RGB"), dtype=np.int16) - np.asarray(b.convert("RGB"), dtype=np.int16))
+    return diff.mean(), diff.max()
+
+@pytest.mark.parametrize("size", SIZES)
+def test_bottom_fade_matches_legacy(size):
+    for img in sample_images(size):
+        out = effects.bottom_fade(img)
+        assert out.mode == "RGB" and out.size == size
+        mean, worst = pixel_diff(effects._legacy_bottom_fade(img), out)
+        # 奇數高度時漸層起點可能差一列
+        assert mean < 1.5 and worst <= 6
+
+@pytest.mark.parametrize("size", SIZES)
+def test_hero_background_matches_legacy(size):
+    for img in sample_images(size):
+        mean, worst = pixel_diff(effects._legacy_hero_background(img), effects.hero_background(img))
+        assert mean < 1.0 and worst <= 6
+
+def test_shade_mask_rows_and_cache():
+    w, h = 40, 100
+    mask = effects.shade_mask((w, h), brightness=0.5, fade_from=0.3, max_alpha=230)
+    assert mask is effects.shade_mask((w, h), brightness=0.5, fade_from=0.3, max_alpha=230)
+    rows = np.asarray(mask)
+    assert mask.size == (w, h) and (rows == rows[:, :1, :1]).all()   # 每一列同一個值
+    # 舊做法：亮度 x 0.5 後疊上 alpha = 230 * y / grad_h 的黑色漸層
+    start = int(h * 0.3)
+    alpha = np.array([0] * start + [int(230 * y / (h - start)) for y in range(h - start)])
+    expected = 255 * 0.5 * (1 - alpha / 255)
+    assert np.abs(rows[:, 0, 0] - expected).max() <= 1
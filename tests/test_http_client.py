@@ -0,0 +1,45 @@
+import concurrent.futures
+
+import pytest
+import requests
+
+from benchmarks.stub_server import ImageStub
+from http_client import HttpClient
+
+def test_reuses_keep_alive_connections(stub):
+    client = HttpClient(pool_size=4, per_host_limit=4)
+    urls = [f"{stub.base_url}/points/{i}.jpg" for i in range(40)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as ex:
+        bodies = list(ex.map(lambda u: client.get(u).content, urls))
+    client.close()
+    assert all(body == stub.payload for body in bodies)
+    assert stub.requests == 40
+    # 同時最多 4 個請求，連線池重用後連線數不會超過 4
+    assert stub.connections <= 4
+    assert client.get_stats() == {"requests": 40, "retries": 0, "errors": 0}
+
+def test_retries_server_errors_with_backoff():
+    with ImageStub(fail_first=2) as stub:
+        client = HttpClient(retries=3, backoff=0.01)
+        response = client.get(f"{stub.base_url}/a.jpg")
+        client.close()
+    assert response.status_code == 200
+    assert stub.requests == 3
+    assert client.get_stats()['retries'] == 2
+
+def test_gives_up_after_retry_limit():
+    with ImageStub(fail_first=10) as stub:
+        client = HttpClient(retries=2, backoff=0.01)
+        response = client.get(f"{stub.base_url}/a.jpg")
+        client.close()
+    assert response.status_code == 503
+    assert stub.requests == 3
+
+def test_connection_errors_are_counted():
+    stub = ImageStub().start()
+    url = f"{stub.base_url}/a.jpg"
+    stub.stop()
+    client = HttpClient(retries=0)
+    with pytest.raises(requests.ConnectionError):
+        client.get(url)
+    assert client.get_stats()['errors'] == 1
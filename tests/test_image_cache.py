@@ -0,0 +1,65 @@
+import json
+import os
+
+from http_client import HttpClient
+from image_cache import DiskImageCache
+
+def make_cache(tmp_path, **kwargs):
+    return DiskImageCache(cache_dir=str(tmp_path / "images"), client=HttpClient(retries=0), **kwargs)
+
+def test_warm_fetch_does_not_hit_network(tmp_path, stub):
+    urls = [f"{stub.base_url}/points/{i}.jpg" for i in range(5)]
+    cache = make_cache(tmp_path)
+    for url in urls:
+        assert cache.fetch(url) == stub.payload
+    assert stub.requests == 5
+    cache.flush()
+
+    # 重新啟動 (新的實例讀取 index.json) 後全部由磁碟提供
+    warm = make_cache(tmp_path)
+    for url in urls:
+        assert warm.fetch(url) == stub.payload
+    assert stub.requests == 5
+    assert warm.get_stats()['hits'] == 5
+
+def test_offline_serves_stale_copy(tmp_path, stub):
+    url = f"{stub.base_url}/a.jpg"
+    cache = make_cache(tmp_path, revalidate_after=0)
+    cache.fetch(url)
+    stub.stop()
+    cache.client.close()      # 丟掉 keep-alive 連線，之後的請求都連不上
+    assert cache.fetch(url) == stub.payload
+    assert cache.get_stats()['stale'] == 1
+
+def test_revalidates_with_etag(tmp_path, stub):
+    url = f"{stub.base_url}/a.jpg"
+    cache = make_cache(tmp_path, revalidate_after=0)
+    cache.fetch(url)
+    assert cache.fetch(url) == stub.payload
+    assert stub.requests == 2
+    assert stub.not_modified == 1
+    assert cache.get_stats()['revalidated'] == 1
+
+def test_index_flush_is_batched(tmp_path, stub):
+    cache = make_cache(tmp_path, flush_every=4)
+    for i in range(3):
+        cache.fetch(f"{stub.base_url}/{i}.jpg")
+    assert not os.path.exists(cache.index_file)
+    cache.fetch(f"{stub.base_url}/3.jpg")
+    with open(cache.index_file, encoding='utf-8') as f:
+        assert len(json.load(f)) == 4
+
+def test_evicts_least_recently_used(tmp_path, stub):
+    size = len(stub.payload)
+    cache = make_cache(tmp_path, max_bytes=size * 2)
+    first, second, third = (f"{stub.base_url}/{i}.jpg" for i in range(3))
+    cache.fetch(first)
+    cache.fetch(second)
+    cache.get(first)          # first 較近使用，second 先被淘汰
+    cache.fetch(third)
+    assert cache.path(second) is None
+    assert cache.path(first) is not None and cache.path(third) is not None
+    assert cache.get_stats()['evictions'] == 1
+    # 有淘汰時立即存檔
+    with open(cache.index_file, encoding='utf-8') as f:
+        assert len(json.load(f)) == 2
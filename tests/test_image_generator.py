@@ -0,0 +1,57 @@
+import pytest
+from PIL import Image
+
+from image_generator import CardRenderer, ImageGenerator, TEMPLATES, load_font
+
+SCENE = Image.new("RGB", (640, 360), (0, 0, 255))
+USER = Image.new("RGB", (300, 400), (0, 255, 0))
+TEXTS = {"title": "新宿駅東口", "subtitle": "新宿駅東口 | 01:23", "footer": "2026/10/18 • Takayama/Tokyo"}
+
+@pytest.mark.parametrize("template", list(TEMPLATES))
+@pytest.mark.parametrize("scale", [1, 3])
+def test_each_template_renders_at_its_size(template, scale):
+    card = CardRenderer().render(template, {"scene": SCENE, "user": USER}, TEXTS, scale=scale)
+    w, h = TEMPLATES[template]['size']
+    assert card.size == (w * scale, h * scale) and card.mode == "RGB"
+
+def test_classic_scene_card_layout():
+    card = ImageGenerator(CardRenderer()).create_scene_card(SCENE, USER, *TEXTS.values())
+    # 1080x1620：場景 45% / 照片 30% / 資訊 25%
+    assert card.size == (1080, 1620)
+    assert card.getpixel((540, 300)) == (0, 0, 255)
+    assert card.getpixel((540, 729 + 200)) == (0, 255, 0)
+    assert card.getpixel((5, 1620 - 5)) == (255, 255, 255)
+    # 印章 (右下，半徑 35 x3) 的紅圈
+    stamp = card.crop((1080 - 270, 1215, 1080, 1620))
+    assert (239, 68, 68) in {c for _, c in stamp.getcolors(1 << 20)}
+
+def test_create_card_keeps_the_verified_layout():
+    card = ImageGenerator(CardRenderer()).create_card(SCENE, USER, "新宿", "Tokyo", "2026/10/18")
+    # 原本的 800x1066 版面：場景與照片各佔 30%，淺灰底，右下角紅色 VERIFIED 印章
+    assert card.size == (800, 1066)
+    assert card.getpixel((400, 150)) == (0, 0, 255)
+    assert card.getpixel((400, 319 + 150)) == (0, 255, 0)
+    assert card.getpixel((5, 1060)) == (249, 250, 251)
+    stamp = card.crop((800 - 150, 1066 - 150, 800 - 30, 1066 - 30))
+    assert (255, 0, 0) in {c for _, c in stamp.getcolors(1 << 20)}
+
+def test_layout_font_and_stamp_caches_are_reused():
+    renderer = CardRenderer()
+    first = renderer.layout("Classic", 2)
+    assert renderer.layout("Classic", 2) is first
+    assert renderer.layout("Classic", 2, size=(360, 540)) is first
+    assert renderer.layout("Classic", 3) is not first
+    assert renderer.layout("Classic", 2, size=(400, 600)) is not first
+    assert len(renderer.layouts) == 3
+
+    # 同角色、同像素大小的字型在不同版型之間共用同一個物件
+    assert renderer.layout("Split", 2)['texts'][0][2] is first['texts'][0][2]
+    assert load_font("title", 36) is first['texts'][0][2]
+
+    # 印章圖層只畫一次，連續製作多張都貼同一個圖層，且不被修改
+    layer = first['stamp'][0]
+    before = layer.tobytes()
+    for _ in range(3):
+        renderer.render("Classic", {"scene": SCENE, "user": USER}, TEXTS, scale=2)
+    assert renderer.layout("Classic", 2)['stamp'][0] is layer and layer.tobytes() == before
+    assert len(renderer.layouts) == 4
@@ -0,0 +1,29 @@
+import pytest
+
+from benchmarks import synthetic
+from map_index import MapPointIndex
+
+EDGE_POINTS = [{"id": "e", "geo": [0.0, 179.9]}, {"id": "w", "geo": [0.0, -179.9]},
+               {"id": "n", "geo": [80.0, 10.0]}, {"id": "s", "geo": [-80.0, 10.0]}]
+
+def total(found):
+    return sum(1 if kind == "pin" else item for kind, _, item, *_ in found)
+
+@pytest.mark.parametrize("cell_px", [64, 100, 60])
+def test_world_query_keeps_every_point_at_every_zoom(cell_px):
+    points = EDGE_POINTS + synthetic.generate(500)
+    index = MapPointIndex(points, cell_px=cell_px, max_zoom=14)
+    for zoom in range(0, 15):
+        assert total(index.query(zoom, 85, -180, -85, 180)) == len(index.points), zoom
+
+def test_high_zoom_returns_single_pins_in_view():
+    index = MapPointIndex(EDGE_POINTS, cell_px=100, max_zoom=10)
+    found = index.query(12, 1, 179, -1, 180)
+    assert [(kind, key) for kind, key, *_ in found] == [("pin", "e")]
+
+def test_bubble_bounds_cover_members():
+    points = [{"id": str(i), "geo": [35.0 + i * 1e-4, 139.0 + i * 1e-4]} for i in range(5)]
+    index = MapPointIndex(points, cell_px=100, max_zoom=10)
+    (kind, _, count, _, _, bounds), = index.query(3, 40, 130, 30, 150)
+    assert (kind, count) == ("cluster", 5)
+    assert bounds == [35.0, 139.0, 35.0004, 139.0004]
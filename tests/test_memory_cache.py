@@ -0,0 +1,56 @@
+from PIL import Image
+
+import image_loader
+from image_cache import DiskImageCache, MemoryImageCache
+from image_loader import AsyncImageLoader, register_processor
+
+def test_lru_counters_and_byte_budget():
+    cache = MemoryImageCache(max_bytes=100)
+    cache.put("a", "A", 40)
+    cache.put("b", "B", 40)
+    assert cache.get("a") == "A"        # a 變成最近使用
+    cache.put("c", "C", 40)              # 超過 100 bytes，淘汰最久沒用的 b
+    assert cache.get("b") is None
+    assert cache.get_stats() == {"hits": 1, "misses": 1, "evictions": 1, "entries": 2, "bytes": 80}
+
+def test_oversized_entry_is_not_cached():
+    cache = MemoryImageCache(max_bytes=10)
+    cache.put("big", "X", 11)
+    assert "big" not in cache
+    assert cache.get_stats()['bytes'] == 0
+
+def test_pixel_bytes():
+    assert MemoryImageCache.pixel_bytes(Image.new("RGBA", (10, 20))) == 10 * 20 * 4
+
+def test_loader_keys_by_processor_name(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_loader, "image_cache", DiskImageCache(cache_dir=str(tmp_path / "images")))
+    register_processor("test_gray", lambda img: img.convert("L").convert("RGB"))
+    loader = AsyncImageLoader(max_workers=1)
+    url = f"{stub.base_url}/poster.jpg"
+    first = loader.load(url, lambda img: None, size=(64, 36), processor="test_gray").result(timeout=10)
+    # 處理器以名稱為鍵：同一個請求第二次直接命中記憶體快取
+    second = loader.load(url, lambda img: None, size=(64, 36), processor="test_gray").result(timeout=10)
+    assert second is first
+    stats = loader.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+def test_loader_reads_local_files_from_pyramid(tmp_path, monkeypatch):
+    from image_ingest import ImageIngest
+    monkeypatch.setattr(image_loader, "ingest", ImageIngest(cache_dir=str(tmp_path / "derived")))
+    path = str(tmp_path / "cover.jpg")
+    Image.new("RGB", (2400, 1600), (200, 40, 40)).save(path, quality=90)
+    loader = AsyncImageLoader(max_workers=1)
+    img = loader.load(path, lambda img: None, size=(172, 252)).result(timeout=10)
+    assert img.size == (172, 252)
+    # 本機大圖不整張解碼進原圖快取
+    assert loader.sources.get(path) is None
+
+def test_loader_close_stops_workers(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_loader, "image_cache", DiskImageCache(cache_dir=str(tmp_path / "images")))
+    loader = AsyncImageLoader(max_workers=2)
+    futures = [loader.load(f"{stub.base_url}/points/t/{i}.jpg", lambda img: None, size=(32, 32)) for i in range(6)]
+    workers = list(loader.workers)
+    loader.close(timeout=10)
+    # 佇列中的工作先做完才結束
+    assert all(f.result(timeout=0) is not None for f in futures)
+    assert not any(t.is_alive() for t in workers) and loader.workers == []
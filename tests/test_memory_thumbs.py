@@ -0,0 +1,68 @@
+import os
+
+from PIL import Image
+
+from card_encoder import save_card
+from memory_thumbs import ThumbnailStore
+
+def make_card(size=(900, 1350)):
+    return Image.linear_gradient("L").resize(size).convert("RGB")
+
+def make_store(tmp_path):
+    save_dir = str(tmp_path / "cards")
+    return ThumbnailStore(save_dir, os.path.join(save_dir, "thumbs"), width=100)
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_make_records_index(tmp_path):
+    store = make_store(tmp_path)
+    save_card(make_card(), "s1", store.save_dir)
+    thumb = store.make("s1")
+    assert (thumb['w'], thumb['h']) == (100, 150)
+    with Image.open(thumb['path']) as img: assert img.size == (100, 150)
+    # 新的 store 從 index.json 讀出尺寸，不必開圖片
+    again = make_store(tmp_path)
+    assert again.get("s1") == thumb
+    assert again.ensure("s1") == thumb
+
+def test_missing_card(tmp_path):
+    store = make_store(tmp_path)
+    assert store.get("nope") is None
+    assert store.make("nope") is None and store.make("nope", make_card()) is None
+    assert store.ensure("nope") is None
+    assert not os.path.exists(store.index_file)
+
+def test_changed_card_regenerates_thumb(tmp_path):
+    store = make_store(tmp_path)
+    path = save_card(make_card(), "s1", store.save_dir)
+    old = store.make("s1")
+    # 卡片被覆寫 (例如批次輸出)：縮圖過期，補做後換新檔名並刪掉舊縮圖
+    save_card(make_card((600, 600)), "s1", store.save_dir)
+    bump_mtime(path)
+    assert store.get("s1") is False
+    assert store.stale_ids() == ["s1"]
+    new = store.ensure("s1")
+    assert new['path'] != old['path'] and (new['w'], new['h']) == (100, 100)
+    assert not os.path.exists(old['path'])
+    assert store.get("s1") == new and store.stale_ids() == []
+
+def test_deleted_thumb_is_stale(tmp_path):
+    store = make_store(tmp_path)
+    save_card(make_card(), "s1", store.save_dir)
+    os.remove(store.make("s1")['path'])
+    assert store.get("s1") is False
+    assert os.path.exists(store.ensure("s1")['path'])
+
+def test_backfill_only_touches_stale_cards(tmp_path):
+    store = make_store(tmp_path)
+    for sid in ("a", "b", "c"):
+        save_card(make_card(), sid, store.save_dir)
+    store.make("b")
+    assert store.stale_ids() == ["a", "c"]
+    for sid in store.stale_ids():
+        store.ensure(sid)
+    assert store.stale_ids() == []
+    thumbs = sorted(name for name in os.listdir(store.thumb_dir) if name.endswith(".jpg"))
+    assert [name.split("_")[0] for name in thumbs] == ["a", "b", "c"]
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+
+from passport_manager import PassportManager
+
+def write_legacy(tmp_path, ids):
+    path = tmp_path / "visited.json"
+    path.write_text(json.dumps({"visited": ids}), encoding='utf-8')
+    return str(path)
+
+def open_passport(tmp_path, profile="default", legacy=None):
+    return PassportManager(db_path=str(tmp_path / "passport.db"), profile=profile,
+                           legacy_file=legacy or str(tmp_path / "none.json"))
+
+def test_legacy_import_once(tmp_path):
+    legacy = write_legacy(tmp_path, ["a", "b", "c"])
+    pm = open_passport(tmp_path, legacy=legacy)
+    assert pm.visited_ids == ["a", "b", "c"]
+    pm.close()
+    # 第二次啟動不再匯入 (舊檔多了一筆也一樣)，其他 profile 也不會拿到舊紀錄
+    write_legacy(tmp_path, ["a", "b", "c", "d"])
+    pm = open_passport(tmp_path, legacy=legacy)
+    assert pm.visited_ids == ["a", "b", "c"]
+    pm.switch_profile("friend")
+    assert pm.visited_ids == []
+    pm.close()
+
+def test_concurrent_first_start_imports_once(tmp_path, monkeypatch):
+    import passport_manager
+    legacy = write_legacy(tmp_path, ["a", "b"])
+    real_load = json.load
+    others = []
+
+    def load_while_another_process_migrates(f):
+        # 第一次檢查之後、寫入之前，另一個行程完成匯入
+        if not others:
+            monkeypatch.setattr(passport_manager.json, "load", real_load)
+            others.append(open_passport(tmp_path, legacy=legacy))
+        return real_load(f)
+
+    monkeypatch.setattr(passport_manager.json, "load", load_while_another_process_migrates)
+    pm = open_passport(tmp_path, legacy=legacy)
+    assert pm.visited_ids == ["a", "b"] == others[0].visited_ids
+    with sqlite3.connect(str(tmp_path / "passport.db")) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM meta;").fetchone()[0] == 1
+    pm.close()
+    others[0].close()
+
+def test_profiles_are_isolated(tmp_path):
+    pm = open_passport(tmp_path)
+    pm.check_in("a")
+    pm.switch_profile("friend")
+    assert not pm.is_visited("a")
+    pm.check_in("b")
+    assert pm.visited_ids == ["b"]
+    pm.switch_profile("default")
+    assert pm.visited_ids == ["a"] and pm.get_checkin("b") is None
+    assert pm.profiles() == ["default", "friend"]
+    pm.close()
+
+def test_check_in_updates_card_path_without_losing_fields(tmp_path):
+    pm = open_passport(tmp_path)
+    assert pm.check_in("a", card_path="a.png", cluster_id="c1") is True
+    assert pm.check_in("a", card_path="a.jpg") is False
+    checkin = pm.get_checkin("a")
+    assert (checkin['card_path'], checkin['cluster_id']) == ("a.jpg", "c1")
+    pm.close()
+
+def test_batch_rolls_back_as_a_whole_and_mirror_follows_commit(tmp_path):
+    pm = open_passport(tmp_path)
+    # 第三筆的 scene_id 無法寫入 SQLite (前兩筆已執行)：整批都不寫入，記憶體也不更新
+    assert pm.check_in_many(["a", ("b", "b.jpg", None), ({"bad": 1}, None, None)]) == []
+    assert pm.visited_ids == [] and pm.get_checkin("a") is None
+    assert pm.check_in_many(["a", ("b", "b.jpg", "c1")]) == ["a", "b"]
+    assert pm.visited_ids == ["a", "b"]
+    pm.close()
+    assert open_passport(tmp_path).visited_ids == ["a", "b"]
+
+def test_mirror_not_updated_when_commit_fails(tmp_path):
+    pm = open_passport(tmp_path)
+    blocker = sqlite3.connect(str(tmp_path / "passport.db"), timeout=0)
+    blocker.execute("BEGIN IMMEDIATE;")
+    pm.conn.execute("PRAGMA busy_timeout=50;")
+    try:
+        assert pm.check_in("a") is False
+        assert not pm.is_visited("a")
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert pm.check_in("a") is True and pm.is_visited("a")
+    pm.close()
@@ -0,0 +1,92 @@
+import threading
+
+from render_worker import RenderCancelled, RenderWorker
+
+def collect():
+    """回傳 (結果 dict, 完成事件, on_done, on_error)"""
+    out = {}
+    done = threading.Event()
+
+    def on_done(result):
+        out['result'] = result
+        done.set()
+
+    def on_error(error):
+        out['error'] = error
+        done.set()
+    return out, done, on_done, on_error
+
+def test_progress_is_reported_in_order():
+    worker = RenderWorker(max_workers=1)
+    seen = []
+    out, done, on_done, on_error = collect()
+
+    def func(progress):
+        progress(0.5, "一半")
+        return "card"
+    job = worker.submit("a", func, on_progress=lambda f, m: seen.append((f, m)), on_done=on_done, on_error=on_error)
+    assert done.wait(5)
+    assert out == {'result': "card"}
+    assert seen == [(0.0, "開始製作"), (0.5, "一半"), (1.0, "完成")]
+    assert (job.fraction, job.message) == (1.0, "完成")
+    assert worker.active() == []
+
+def test_cancel_stops_at_next_progress():
+    worker = RenderWorker(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    steps = []
+    out, done, on_done, on_error = collect()
+
+    def func(progress):
+        started.set()
+        release.wait(5)
+        progress(0.5, "繼續")
+        steps.append("after")
+        return "card"
+    job = worker.submit("a", func, on_done=on_done, on_error=on_error)
+    assert started.wait(5)
+    assert worker.active("a") == [job]
+    job.cancel()
+    release.set()
+    assert done.wait(5)
+    assert isinstance(out['error'], RenderCancelled) and 'result' not in out
+    assert steps == [] and worker.active() == []
+
+def test_queued_jobs_run_in_turn():
+    worker = RenderWorker(max_workers=1)
+    release = threading.Event()
+    order = []
+    finished = threading.Semaphore(0)
+
+    def make(name):
+        def func(progress):
+            if name == "a": release.wait(5)
+            order.append(name)
+            return name
+        return func
+    jobs = [worker.submit(name, make(name), on_done=lambda r: finished.release()) for name in "abc"]
+    # 第一張還在製作時，其餘排隊
+    assert [job.key for job in worker.active()] == ["a", "b", "c"]
+    assert all(job.fraction == 0.0 and job.message == "排隊中" for job in jobs[1:])
+    # 排隊中的工作被取消，輪到它時直接中止
+    errors = []
+    cancelled = worker.submit("d", make("d"), on_error=lambda e: (errors.append(e), finished.release()))
+    cancelled.cancel()
+    release.set()
+    for _ in range(4): assert finished.acquire(timeout=5)
+    assert order == ["a", "b", "c"]
+    assert [job.future.result() for job in jobs] == ["a", "b", "c"]
+    assert len(errors) == 1 and isinstance(errors[0], RenderCancelled)
+
+def test_callback_errors_do_not_break_worker():
+    worker = RenderWorker(max_workers=1)
+
+    def broken(result):
+        raise RuntimeError("callback bug")
+    first = worker.submit("a", lambda progress: "card", on_done=broken)
+    assert first.future.result(timeout=5) == "card"
+    failing = worker.submit("b", lambda progress: 1 / 0, on_error=broken)
+    assert failing.future.result(timeout=5) is None
+    out, done, on_done, on_error = collect()
+    worker.submit("c", lambda progress: "next", on_done=on_done, on_error=on_error)
+    assert done.wait(5) and out == {'result': "next"}
@@ -0,0 +1,60 @@
+from benchmarks import synthetic
+from search_index import SearchIndex, normalize
+
+RECORDS = [
+    {"id": "a", "name": "新宿駅東口", "cn": "新宿站", "origin": "@anitabi"},
+    {"id": "b", "name": "須賀神社", "cn": "须贺神社", "origin": None},
+    {"id": "c", "name": "シンジュク", "cn": None, "origin": float("nan")},
+    {"id": "d", "name": "飛騨古川駅", "cn": "飞驒古川站", "origin": "@nekoumi"},
+]
+
+def test_normalize_variants_and_kana():
+    assert normalize("ＳＨＯＰ") == "shop"
+    assert normalize("シンジュク") == "しんじゅく"
+    assert normalize("飛騨古川駅") == normalize("飞驒古川驿")
+
+def test_ranking_and_groups():
+    index = SearchIndex.from_records(RECORDS)
+    assert index.search("新宿") == ["a"]
+    assert index.search("しんじゅく") == ["c"]
+    assert index.search("須賀") == ["b"]          # 繁簡互通
+    assert index.search("駅") == ["a", "d"]
+    assert index.search("zzz") == []
+    index.set_groups({"新宿周邊": ["a", "c"]})
+    assert index.search("周邊") == ["a", "c"]
+    # 名稱開頭相符 (3 x 2) 高於區域開頭相符 (2 x 2)
+    assert index.search_scored("新宿") == [(6.0, "a"), (4.0, "c")]
+
+def test_saved_index_matches_rebuilt(tmp_path):
+    records = synthetic.generate(3000)
+    built = SearchIndex.from_records(records)
+    path = str(tmp_path / "scenes.json.search.arrow")
+    built.save(path, "digest")
+    assert SearchIndex.load(path, "other") is None
+    loaded = SearchIndex.load(path, "digest")
+    for q in ["新宿", "駅", "しんじゅく", "须贺", "@", "zzz"]:
+        for limit in (None, 20):
+            assert loaded.search_scored(q, limit) == built.search_scored(q, limit)
+
+def test_load_or_build_only_builds_once(tmp_path):
+    path = str(tmp_path / "scenes.json.search.arrow")
+    calls = []
+    def records():
+        calls.append(1)
+        return RECORDS
+    SearchIndex.load_or_build(path, "digest", records)
+    index = SearchIndex.load_or_build(path, "digest", records)
+    assert len(calls) == 1 and index.search("須賀") == ["b"]
+    SearchIndex.load_or_build(path, "changed", records)
+    assert len(calls) == 2
+
+def test_rank_pruned_postings_match_full_scoring(monkeypatch):
+    monkeypatch.setattr(SearchIndex, "RANK_AT", 50)
+    monkeypatch.setattr(SearchIndex, "RANK_CAP", 30)
+    records = synthetic.generate(2000)
+    index = SearchIndex.from_records(records)
+    index.set_groups({"駅前周邊": [r['id'] for r in records[:40]]})
+    assert normalize("駅") in index.ranked
+    for q in ["駅", "新宿", "@", "周"]:
+        full = index.search_scored(q)
+        assert index.search_scored(q, 20) == full[:20]
@@ -0,0 +1,108 @@
+import asyncio
+import concurrent.futures
+import json
+import time
+
+import pytest
+
+import config
+
+import engine as engine_module
+import service as service_module
+from benchmarks import synthetic
+from engine import Engine
+from image_cache import DiskImageCache
+from passport_manager import PassportManager
+from series_registry import SeriesRegistry
+from service import Service
+
+SCENE_ID = synthetic.make_id(0, 0)
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, stub):
+    # 分群 / 欄式快取寫在目前目錄下的 .cache；場景圖從本機假伺服器下載
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(engine_module, "image_cache", DiskImageCache(cache_dir=str(tmp_path / "images")))
+    registry = SeriesRegistry(str(tmp_path / "series"), idle_seconds=0)
+    # 與預設作品同 id，取代舊版 你的名字.json
+    registry.add_series(config.DEFAULT_SERIES_ID, synthetic.generate(300, image_base=stub.base_url), "Test")
+    pm = PassportManager(db_path=str(tmp_path / "passport.db"), legacy_file=str(tmp_path / "none.json"))
+    service = Service(Engine(registry, pm))
+    service.render_pool = concurrent.futures.ProcessPoolExecutor(max_workers=2)
+    yield service
+    service.close()
+    pm.close()
+
+def dispatch(service, target, method="GET", body=b"", headers=None):
+    return asyncio.run(service._dispatch(method, target, headers or {}, body))
+
+def request(service, target, method="GET", body=b""):
+    response = dispatch(service, target, method, body)
+    return response.status, json.loads(response.body)
+
+def test_bad_params_are_400(service):
+    assert request(service, "/nearby?lat=35.6&lon=139.7")[0] == 200
+    for target in ("/nearby?lon=139.7", "/nearby?lat=abc&lon=139.7", "/nearby?lat=nan&lon=139.7",
+                   "/nearby?lat=95&lon=139.7", "/search?q=a&limit=0", "/search?q=a&limit=x",
+                   "/cards/x?scale=two"):
+        status, data = request(service, target)
+        assert status == 400, target
+        assert "參數" in data['error']
+    assert request(service, "/checkins", "POST", b"[1]")[0] == 400
+
+def test_unexpected_errors_are_500(service, monkeypatch):
+    def broken(*args):
+        raise KeyError("bug")
+    monkeypatch.setattr(service.engine, "search", broken)
+    status, data = request(service, "/search?q=a")
+    assert status == 500 and service.stats['errors'] == 1
+
+def test_evict_idle_drops_engine_caches(service):
+    request(service, "/nearby?lat=35.6&lon=139.7")
+    request(service, f"/scenes/{synthetic.make_id(0, 0)}")
+    engine = service.engine
+    sid = config.DEFAULT_SERIES_ID
+    assert sid in engine.geo and sid in engine.cluster_maps
+    assert engine.evict_idle() == [sid]
+    assert engine.geo == {} and engine.cluster_maps == {} and engine.registry.loaded_ids() == []
+
+def test_card_render_and_cache(service, stub):
+    first = dispatch(service, f"/cards/{SCENE_ID}?template=Polaroid&scale=1&format=png")
+    assert first.status == 200 and first.content_type == "image/png" and first.headers['X-Cache'] == "miss"
+    assert first.body.startswith(b"\x89PNG") and stub.requests == 1   # 場景圖真的抓進磁碟快取
+    second = dispatch(service, f"/cards/{SCENE_ID}?template=Polaroid&scale=1&format=png")
+    assert second.headers['X-Cache'] == "hit" and second.body == first.body
+    # 參數不同就是另一張卡片
+    other = dispatch(service, f"/cards/{SCENE_ID}?template=Polaroid&scale=1&format=jpeg")
+    assert other.headers['X-Cache'] == "miss" and other.headers['ETag'] != first.headers['ETag']
+    assert service.stats['renders'] == 2 and service.cards.get_stats()['entries'] == 2
+
+def test_concurrent_card_requests_render_once(service, monkeypatch):
+    real_render = service_module.render_card
+
+    def slow_render(task):
+        time.sleep(0.3)
+        return real_render(task)
+
+    # 執行緒池才能換掉製作函式；拉長製作時間，確保 4 個請求都在製作中抵達
+    service.render_pool.shutdown()
+    service.render_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(service_module, "render_card", slow_render)
+
+    async def burst():
+        return await asyncio.gather(*(service._dispatch("GET", f"/cards/{SCENE_ID}?scale=1", {}, b"")
+                                      for _ in range(4)))
+    responses = asyncio.run(burst())
+    assert [r.status for r in responses] == [200] * 4
+    assert len({r.body for r in responses}) == 1
+    assert (service.stats['renders'], service.stats['render_coalesced']) == (1, 3)
+    assert service.inflight == {}
+
+def test_if_none_match_gets_304(service):
+    first = dispatch(service, f"/cards/{SCENE_ID}?scale=1")
+    etag = first.headers['ETag']
+    again = dispatch(service, f"/cards/{SCENE_ID}?scale=1", headers={"if-none-match": etag})
+    assert again.status == 304 and again.body == b"" and again.headers['ETag'] == etag
+    assert service.stats['not_modified'] == 1 and service.stats['renders'] == 1
+    stale = dispatch(service, f"/cards/{SCENE_ID}?scale=1", headers={"if-none-match": '"other"'})
+    assert stale.status == 200 and stale.headers['X-Cache'] == "hit"
@@ -0,0 +1,110 @@
+from benchmarks.stub_server import ImageStub
+from http_client import HttpClient
+from image_loader import CancelToken
+from tile_cache import TileCache, TilePrefetcher, TileWriteThrough, bulk_prefetch_allowed
+
+# 新宿站周邊與飛驒古川站周邊兩個區域
+CLUSTERS = [
+    {"points": [{"geo": [35.6896, 139.7006]}, {"geo": [35.6852, 139.7101]}]},
+    {"points": [{"geo": [36.2380, 137.1860]}, {"geo": [36.2335, 137.1900]}, {"points_without_geo": 1}]},
+]
+
+class FakeMapWidget:
+    """只模擬 tkintermapview 的 request_image：從離線庫讀圖磚，沒有就回傳 None"""
+
+    empty_tile_image = "empty"
+
+    def __init__(self, tile_server):
+        self.tile_server = tile_server
+        self.use_database_only = False
+        self.calls = 0
+
+    def request_image(self, zoom, x, y, db_cursor=None):
+        self.calls += 1
+        row = db_cursor.execute("SELECT tile_image FROM tiles WHERE zoom=? AND x=? AND y=? AND server=?;",
+                                (zoom, x, y, self.tile_server)).fetchone()
+        return row[0] if row else None
+
+def make_prefetcher(tmp_path, stub, **kwargs):
+    cache = TileCache(str(tmp_path / "tiles.db"), f"{stub.base_url}/{{z}}/{{x}}/{{y}}.png")
+    return TilePrefetcher(cache, client=HttpClient(retries=0), **kwargs)
+
+def test_prefetch_downloads_every_planned_tile_once(tmp_path, stub):
+    prefetcher = make_prefetcher(tmp_path, stub, batch_size=8)
+    tiles = prefetcher.plan(CLUSTERS, (12, 15), padding_m=200)
+    assert len(tiles) == len(set(tiles)) > 8
+    assert {z for z, _, _ in tiles} == {12, 13, 14, 15}
+
+    progress = []
+    stats = prefetcher.run(tiles, progress=lambda done, total: progress.append((done, total)))
+    assert stats['downloaded'] == len(tiles) and stats['failed'] == 0
+    assert stub.requests == len(tiles)
+    assert prefetcher.cache.count() == len(tiles)
+    assert progress[-1] == (len(tiles), len(tiles))
+
+    # 再跑一次全部命中離線庫，不再連網
+    again = prefetcher.run(tiles)
+    assert again['cached'] == len(tiles) and again['downloaded'] == 0
+    assert stub.requests == len(tiles)
+
+def test_failed_tiles_are_retried_next_run(tmp_path):
+    with ImageStub(fail_first=2) as stub:
+        prefetcher = make_prefetcher(tmp_path, stub, max_workers=1)
+        tiles = prefetcher.plan(CLUSTERS[:1], (15, 16), padding_m=200)
+        first = prefetcher.run(tiles)
+        assert first['failed'] == 2 and first['downloaded'] == len(tiles) - 2
+        second = prefetcher.run(tiles)
+        assert second['cached'] == len(tiles) - 2 and second['downloaded'] == 2
+        assert prefetcher.cache.count() == len(tiles)
+
+def test_cancelled_run_stops_early(tmp_path, stub):
+    prefetcher = make_prefetcher(tmp_path, stub, max_workers=1)
+    tiles = prefetcher.plan(CLUSTERS, (12, 16), padding_m=200)
+    token = CancelToken()
+    token.cancel()
+    stats = prefetcher.run(tiles, token=token)
+    assert stats['downloaded'] < len(tiles)
+
+def test_bulk_prefetch_policy():
+    assert not bulk_prefetch_allowed("https://a.tile.openstreetmap.org/{z}/{x}/{y}.png")
+    assert not bulk_prefetch_allowed("https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png")
+    assert not bulk_prefetch_allowed("https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+    assert bulk_prefetch_allowed("http://127.0.0.1:8080/{z}/{x}/{y}.png")
+
+def make_write_through(tmp_path, stub):
+    cache = TileCache(str(tmp_path / "tiles.db"), f"{stub.base_url}/{{z}}/{{x}}/{{y}}.png")
+    cache.ensure_schema()
+    widget = TileWriteThrough(cache, client=HttpClient(retries=0)).install(FakeMapWidget(cache.tile_server))
+    return cache, widget
+
+def test_viewed_tiles_are_written_through(tmp_path, stub):
+    cache, widget = make_write_through(tmp_path, stub)
+    conn = cache.connect()
+    assert widget.request_image(15, 29100, 12903, db_cursor=conn.cursor()) == stub.payload
+    assert stub.requests == 1 and cache.count() == 1
+    # 再看一次直接從離線庫讀
+    assert widget.request_image(15, 29100, 12903, db_cursor=conn.cursor()) == stub.payload
+    assert stub.requests == 1 and widget.calls == 2
+    conn.close()
+
+def test_failed_tile_is_not_stored(tmp_path):
+    with ImageStub(fail_first=1) as stub:
+        cache, widget = make_write_through(tmp_path, stub)
+        conn = cache.connect()
+        assert widget.request_image(15, 1, 2, db_cursor=conn.cursor()) == "empty"
+        assert cache.count() == 0 and widget.calls == 0
+        # 下次看到時重新下載
+        assert widget.request_image(15, 1, 2, db_cursor=conn.cursor()) == stub.payload
+        assert cache.count() == 1
+        conn.close()
+
+def test_other_server_or_database_only_is_not_written(tmp_path, stub):
+    cache, widget = make_write_through(tmp_path, stub)
+    conn = cache.connect()
+    widget.use_database_only = True
+    assert widget.request_image(15, 1, 2, db_cursor=conn.cursor()) is None
+    widget.use_database_only = False
+    widget.tile_server = "https://tiles.example.com/{z}/{x}/{y}.png"
+    assert widget.request_image(15, 1, 2, db_cursor=conn.cursor()) is None
+    assert stub.requests == 0 and cache.count() == 0
+    conn.close()
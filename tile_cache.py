@@ -0,0 +1,251 @@
+import argparse
+import concurrent.futures
+import math
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import config
+from http_client import http_client
+from map_index import latlon_to_world
+
+# 與 tkintermapview.OfflineLoader 相同的資料表，TkinterMapView(database_path=...) 可直接讀取
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS server (
+           url VARCHAR(300) PRIMARY KEY NOT NULL,
+           max_zoom INTEGER NOT NULL);""",
+    """CREATE TABLE IF NOT EXISTS tiles (
+           zoom INTEGER NOT NULL,
+           x INTEGER NOT NULL,
+           y INTEGER NOT NULL,
+           server VARCHAR(300) NOT NULL,
+           tile_image BLOB NOT NULL,
+           CONSTRAINT fk_server FOREIGN KEY (server) REFERENCES server (url),
+           CONSTRAINT pk_tiles PRIMARY KEY (zoom, x, y, server));""",
+    """CREATE TABLE IF NOT EXISTS sections (
+           position_a VARCHAR(100) NOT NULL,
+           position_b VARCHAR(100) NOT NULL,
+           zoom_a INTEGER NOT NULL,
+           zoom_b INTEGER NOT NULL,
+           server VARCHAR(300) NOT NULL,
+           CONSTRAINT fk_server FOREIGN KEY (server) REFERENCES server (url),
+           CONSTRAINT pk_tiles PRIMARY KEY (position_a, position_b, zoom_a, zoom_b, server));""",
+]
+
+# 這些伺服器的使用規範禁止大量 / 預先下載圖磚 (https://operations.osmfoundation.org/policies/tiles/)
+NO_BULK_HOSTS = ("tile.openstreetmap.org",)
+
+def bulk_prefetch_allowed(tile_server):
+    """圖磚伺服器是否允許預先下載 (OpenStreetMap 公用伺服器不允許)"""
+    host = urlsplit(tile_server.replace("{s}", "a")).hostname or ""
+    return not any(host == h or host.endswith("." + h) for h in NO_BULK_HOSTS)
+
+def tile_url(tile_server, zoom, x, y):
+    return tile_server.replace("{x}", str(x)).replace("{y}", str(y)).replace("{z}", str(zoom))
+
+class TileCache:
+    """SQLite 圖磚庫 (WAL 模式，地圖讀取時背景仍可寫入)"""
+
+    def __init__(self, db_path=config.TILE_DB_PATH, tile_server=config.TILE_SERVER):
+        self.db_path = db_path
+        self.tile_server = tile_server
+
+    def connect(self, check_same_thread=True):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir: os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        for stmt in SCHEMA:
+            conn.execute(stmt)
+        conn.execute("INSERT OR IGNORE INTO server (url, max_zoom) VALUES (?, ?);", (self.tile_server, 19))
+        conn.commit()
+        return conn
+
+    def ensure_schema(self):
+        self.connect().close()
+
+    def existing(self, conn, zoom):
+        """某縮放層級已存在的 (x, y)"""
+        rows = conn.execute("SELECT x, y FROM tiles WHERE zoom=? AND server=?;", (zoom, self.tile_server))
+        return set(rows.fetchall())
+
+    def put_many(self, conn, tiles):
+        """tiles: [(zoom, x, y, data)]"""
+        conn.executemany("INSERT OR REPLACE INTO tiles (zoom, x, y, server, tile_image) VALUES (?, ?, ?, ?, ?);",
+                         [(z, x, y, self.tile_server, data) for z, x, y, data in tiles])
+        conn.commit()
+
+    def count(self):
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM tiles WHERE server=?;", (self.tile_server,)).fetchone()[0]
+        finally:
+            conn.close()
+
+def tiles_for_bbox(south, west, north, east, zoom):
+    """涵蓋經緯度範圍的所有圖磚座標"""
+    n = 2 ** zoom
+    x0, y0 = latlon_to_world(north, west)
+    x1, y1 = latlon_to_world(south, east)
+    tx0, ty0 = max(int(x0 * n), 0), max(int(y0 * n), 0)
+    tx1, ty1 = min(int(x1 * n), n - 1), min(int(y1 * n), n - 1)
+    return [(zoom, x, y) for x in range(tx0, tx1 + 1) for y in range(ty0, ty1 + 1)]
+
+def cluster_bbox(cluster, padding_m=config.TILE_PREFETCH_PADDING_M):
+    """群內所有景點的範圍 (south, west, north, east)，向外多留 padding_m 公尺"""
+    geos = [p['geo'] for p in cluster['points'] if p.get('geo') and len(p['geo']) >= 2]
+    lats = [float(g[0]) for g in geos]
+    lons = [float(g[1]) for g in geos]
+    pad_lat = padding_m / 111320.0
+    pad_lon = padding_m / (111320.0 * max(math.cos(math.radians(sum(lats) / len(lats))), 0.01))
+    return min(lats) - pad_lat, min(lons) - pad_lon, max(lats) + pad_lat, max(lons) + pad_lon
+
+class TilePrefetcher:
+    """在背景把各區域範圍內的圖磚下載進 TileCache (有上限的併發數)"""
+
+    def __init__(self, cache=None, client=None, max_workers=config.TILE_PREFETCH_WORKERS, batch_size=64):
+        self.cache = cache or TileCache()
+        self.client = client or http_client
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+    def plan(self, clusters, zoom_range=config.TILE_PREFETCH_ZOOM, padding_m=config.TILE_PREFETCH_PADDING_M):
+        """所有區域在縮放範圍內需要的圖磚 (去重，低縮放層級優先)"""
+        zoom_min, zoom_max = zoom_range
+        wanted = set()
+        for c in clusters:
+            if not any(p.get('geo') for p in c['points']): continue
+            south, west, north, east = cluster_bbox(c, padding_m)
+            for zoom in range(zoom_min, zoom_max + 1):
+                wanted.update(tiles_for_bbox(south, west, north, east, zoom))
+        return sorted(wanted)
+
+    def _download(self, tile):
+        response = self.client.get(tile_url(self.cache.tile_server, *tile))
+        response.raise_for_status()
+        return response.content
+
+    def run(self, tiles, progress=None, token=None):
+        """下載尚未快取的圖磚；progress(done, total) 會在每批寫入後呼叫。回傳統計資料"""
+        start = time.perf_counter()
+        conn = self.cache.connect()
+        stats = {"total": len(tiles), "cached": 0, "downloaded": 0, "failed": 0, "bytes": 0}
+        try:
+            existing = {}
+            todo = []
+            for tile in tiles:
+                zoom = tile[0]
+                if zoom not in existing: existing[zoom] = self.cache.existing(conn, zoom)
+                if (tile[1], tile[2]) in existing[zoom]: stats['cached'] += 1
+                else: todo.append(tile)
+
+            batch = []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+                futures = {ex.submit(self._download, t): t for t in todo}
+                for future in concurrent.futures.as_completed(futures):
+                    if token is not None and token.cancelled:
+                        for f in futures: f.cancel()
+                        break
+                    tile = futures[future]
+                    try:
+                        data = future.result()
+                        batch.append(tile + (data,))
+                        stats['downloaded'] += 1
+                        stats['bytes'] += len(data)
+                    except Exception as e:
+                        stats['failed'] += 1
+                        print(f"圖磚下載失敗 {tile}: {e}")
+                    # SQLite 寫入集中在這個執行緒，分批 commit
+                    if len(batch) >= self.batch_size:
+                        self.cache.put_many(conn, batch)
+                        batch = []
+                        if progress: progress(stats['cached'] + stats['downloaded'] + stats['failed'], stats['total'])
+            if batch: self.cache.put_many(conn, batch)
+        finally:
+            conn.close()
+        stats['seconds'] = time.perf_counter() - start
+        stats['tiles_per_s'] = stats['downloaded'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        if progress: progress(stats['cached'] + stats['downloaded'] + stats['failed'], stats['total'])
+        return stats
+
+class TileWriteThrough:
+    """把地圖上實際看過的圖磚寫進離線庫
+
+    tkintermapview 只會從 database_path 讀圖磚、不會寫入；install() 包住地圖元件的
+    request_image：離線庫沒有的圖磚改由共用連線池下載 (User-Agent 帶聯絡方式)，
+    寫入離線庫後再交給原本的函式讀出。只抓畫面上要顯示的圖磚，不違反 OSM 的大量下載規範。
+    request_image 在地圖元件的背景執行緒呼叫，寫入以 self.lock 保護。
+    """
+
+    def __init__(self, cache=None, client=None):
+        self.cache = cache or TileCache()
+        self.client = client or http_client
+        self.conn = None
+        self.lock = threading.Lock()
+        self.stats = {"stored": 0, "failed": 0}
+
+    def fetch(self, zoom, x, y):
+        """下載一張圖磚並寫入離線庫，回傳是否成功"""
+        try:
+            response = self.client.get(tile_url(self.cache.tile_server, zoom, x, y))
+            response.raise_for_status()
+            if not response.headers.get('Content-Type', 'image/').startswith('image/'):
+                raise ValueError(f"不是圖片 ({response.headers.get('Content-Type')})")
+        except Exception as e:
+            print(f"圖磚下載失敗 {(zoom, x, y)}: {e}")
+            with self.lock: self.stats['failed'] += 1
+            return False
+        with self.lock:
+            if self.conn is None: self.conn = self.cache.connect(check_same_thread=False)
+            self.cache.put_many(self.conn, [(zoom, x, y, response.content)])
+            self.stats['stored'] += 1
+        return True
+
+    def install(self, map_widget):
+        original = map_widget.request_image
+
+        def request_image(zoom, x, y, db_cursor=None):
+            if db_cursor is not None and not map_widget.use_database_only \
+                    and map_widget.tile_server == self.cache.tile_server:
+                try:
+                    hit = db_cursor.execute("SELECT 1 FROM tiles WHERE zoom=? AND x=? AND y=? AND server=?;",
+                                            (zoom, x, y, self.cache.tile_server)).fetchone()
+                except sqlite3.Error:
+                    hit = True    # 讀不到離線庫就照原本的流程
+                if not hit and not self.fetch(zoom, x, y): return map_widget.empty_tile_image
+            return original(zoom, x, y, db_cursor=db_cursor)
+
+        map_widget.request_image = request_image
+        return map_widget
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None: self.conn.close()
+            self.conn = None
+
+def main():
+    parser = argparse.ArgumentParser(description="預先下載所有景點區域的地圖圖磚")
+    parser.add_argument('--zoom', type=int, nargs=2, default=config.TILE_PREFETCH_ZOOM, metavar=('MIN', 'MAX'))
+    parser.add_argument('--server', default=config.TILE_SERVER, help="圖磚伺服器網址樣板 ({z}/{x}/{y})")
+    parser.add_argument('--db', default=config.TILE_DB_PATH)
+    parser.add_argument('--workers', type=int, default=config.TILE_PREFETCH_WORKERS)
+    args = parser.parse_args()
+    if not bulk_prefetch_allowed(args.server):
+        print(f"{args.server} 不允許大量下載圖磚，請以 --server 或 config.json 的 tile_server 指定自己的圖磚伺服器")
+        raise SystemExit(1)
+
+    from data_manager import DataManager
+    from clustering import ClusterEngine
+    clusters = ClusterEngine().load_or_build(DataManager().get_all_scenes())
+    prefetcher = TilePrefetcher(TileCache(args.db, args.server), max_workers=args.workers)
+    tiles = prefetcher.plan(clusters, tuple(args.zoom))
+    print(f"{len(clusters)} 個區域，縮放 {args.zoom[0]}~{args.zoom[1]}，共 {len(tiles)} 張圖磚")
+    stats = prefetcher.run(tiles, progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True))
+    print()
+    print(f"已快取 {stats['cached']}，下載 {stats['downloaded']} ({stats['bytes'] / 1024:.0f} KB)，"
+          f"失敗 {stats['failed']}，{stats['seconds']:.1f} 秒 ({stats['tiles_per_s']:.1f} 張/秒)")
+
+if __name__ == "__main__":
+    main()
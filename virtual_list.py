@@ -0,0 +1,204 @@
+import bisect
+import itertools
+import time
+import tkinter as tk
+
+import customtkinter as ctk
+
+_tag_ids = itertools.count()
+
+class VirtualList(ctk.CTkFrame):
+    """虛擬化捲動列表
+
+    只建立可視範圍 (上下再多 overscan 列) 的列元件，捲出畫面的列會放回
+    元件池，之後綁定到新的資料上重複使用。
+
+    - row_heights: {kind: 高度}，每種列固定高度
+    - create_row(kind, parent): 建立一個該種類的列元件
+    - bind_row(row, item): 把資料填進列元件 (只做便宜的文字更新)
+    - show_row(row, item): 列第一次真正進入畫面時呼叫 (例如開始載入圖片)
+    - release_row(row, item): 列被放回元件池時呼叫 (例如取消圖片下載)
+    - budget_ms: 一次最多花多少毫秒建立新列，超過就留到下一次 refresh (可視範圍內的列優先)
+
+    items 是 [(kind, data), ...]，另外可放一個不虛擬化的 header 在最上方。
+    """
+
+    def __init__(self, master, row_heights, create_row, bind_row, show_row=None, release_row=None,
+                 overscan=3, bg="#F8FAFC", budget_ms=None, **kwargs):
+        super().__init__(master, fg_color="transparent", corner_radius=0, **kwargs)
+        self.row_heights = row_heights
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.show_row = show_row
+        self.release_row = release_row
+        self.overscan = overscan
+        self.budget = budget_ms / 1000 if budget_ms else None
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, bd=0, bg=bg)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.configure(yscrollcommand=self._on_canvas_scroll)
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+
+        # 滑鼠滾輪：把自訂 bindtag 加到所有子元件上，只影響這個列表
+        self.wheel_tag = f"VirtualList{next(_tag_ids)}"
+        self.bind_class(self.wheel_tag, "<MouseWheel>", self._on_mousewheel)
+        self.bind_class(self.wheel_tag, "<Button-4>", lambda e: self._scroll_units(-1))
+        self.bind_class(self.wheel_tag, "<Button-5>", lambda e: self._scroll_units(1))
+        self._add_wheel_tag(self.canvas)
+
+        self.header = None
+        self.header_window = None
+        self.header_height = 0
+        self.items = []
+        self.offsets = [0]       # offsets[i] = 第 i 列的 y (不含 header)
+        self.pools = {}          # kind -> [(row, window_id)]
+        self.active = {}         # index -> (row, window_id)
+        self.shown = set()       # 已經呼叫過 show_row 的 index
+        self.width = 1
+        self.refresh_pending = False
+
+    def destroy(self):
+        self.unbind_class(self.wheel_tag, "<MouseWheel>")
+        self.unbind_class(self.wheel_tag, "<Button-4>")
+        self.unbind_class(self.wheel_tag, "<Button-5>")
+        super().destroy()
+
+    # --- 公開介面 ---
+    def set_header(self, widget):
+        """widget 必須以 self.canvas 為 parent"""
+        self.header = widget
+        self.header_window = self.canvas.create_window(0, 0, window=widget, anchor="nw", width=self.width)
+        widget.bind("<Configure>", self._on_header_configure, add="+")
+        self._add_wheel_tag(widget)
+
+    def set_items(self, items):
+        """換一組資料 (例如切換篩選)，已建立的列元件會全部回收重用"""
+        for index in list(self.active):
+            self._release(index)
+        self.items = list(items)
+        self.offsets = [0]
+        for kind, _ in self.items:
+            self.offsets.append(self.offsets[-1] + self.row_heights[kind])
+        self._update_scrollregion()
+        self.canvas.yview_moveto(0)
+        self.schedule_refresh()
+
+    def scroll_to_top(self):
+        self.canvas.yview_moveto(0)
+        self.schedule_refresh()
+
+    def visible_rows(self):
+        """目前已建立的列 {index: row}"""
+        return {i: row for i, (row, _) in self.active.items()}
+
+    def schedule_refresh(self):
+        if self.refresh_pending: return
+        self.refresh_pending = True
+        self.after_idle(self._refresh)
+
+    # --- 內部 ---
+    def _add_wheel_tag(self, widget):
+        tags = widget.bindtags()
+        if self.wheel_tag not in tags:
+            widget.bindtags((self.wheel_tag,) + tags)
+        for child in widget.winfo_children():
+            self._add_wheel_tag(child)
+
+    def _update_scrollregion(self):
+        total = self.header_height + self.offsets[-1]
+        self.canvas.configure(scrollregion=(0, 0, self.width, max(total, 1)))
+
+    def _on_header_configure(self, event):
+        if event.height != self.header_height:
+            self.header_height = event.height
+            for index, (_, window_id) in self.active.items():
+                self.canvas.coords(window_id, 0, self.header_height + self.offsets[index])
+            self._update_scrollregion()
+            self.schedule_refresh()
+
+    def _on_canvas_configure(self, event):
+        self.width = event.width
+        if self.header_window is not None:
+            self.canvas.itemconfigure(self.header_window, width=event.width)
+        for rows in self.pools.values():
+            for _, window_id in rows:
+                self.canvas.itemconfigure(window_id, width=event.width)
+        for _, window_id in self.active.values():
+            self.canvas.itemconfigure(window_id, width=event.width)
+        self._update_scrollregion()
+        self.schedule_refresh()
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_refresh()
+
+    def _on_canvas_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule_refresh()
+
+    def _scroll_units(self, units):
+        if self.canvas.yview() == (0.0, 1.0): return
+        self.canvas.yview_scroll(units, "units")
+        self.schedule_refresh()
+
+    def _on_mousewheel(self, event):
+        if event.delta == 0: return
+        # Windows 一格為 120；macOS 為較小的連續值
+        step = -int(event.delta / 120) if abs(event.delta) >= 120 else (-1 if event.delta > 0 else 1)
+        self._scroll_units(step * 3)
+
+    def _refresh(self):
+        self.refresh_pending = False
+        if not self.winfo_exists(): return
+        top = self.canvas.canvasy(0) - self.header_height
+        bottom = top + self.canvas.winfo_height()
+        n = len(self.items)
+        first_visible = max(bisect.bisect_right(self.offsets, top) - 1, 0)
+        last_visible = min(bisect.bisect_left(self.offsets, bottom), n) - 1
+        start = max(first_visible - self.overscan, 0)
+        end = min(last_visible + self.overscan + 1, n)
+
+        for index in [i for i in self.active if i < start or i >= end]:
+            self._release(index)
+        deadline = time.perf_counter() + self.budget if self.budget else None
+        # 可視範圍先建立，上下多留的列最後
+        order = itertools.chain(range(first_visible, last_visible + 1), range(start, first_visible),
+                                range(last_visible + 1, end))
+        for index in order:
+            if index not in self.active:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    # 預算用完，讓 Tk 先重繪，剩下的列下一格再建立
+                    self.after(1, self.schedule_refresh)
+                    return
+                self._acquire(index)
+            if first_visible <= index <= last_visible and index not in self.shown:
+                self.shown.add(index)
+                if self.show_row:
+                    self.show_row(self.active[index][0], self.items[index][1])
+
+    def _acquire(self, index):
+        kind, item = self.items[index]
+        y = self.header_height + self.offsets[index]
+        pool = self.pools.setdefault(kind, [])
+        if pool:
+            row, window_id = pool.pop()
+            self.canvas.coords(window_id, 0, y)
+            self.canvas.itemconfigure(window_id, state="normal")
+        else:
+            row = self.create_row(kind, self.canvas)
+            window_id = self.canvas.create_window(0, y, window=row, anchor="nw",
+                                                  width=self.width, height=self.row_heights[kind])
+            self._add_wheel_tag(row)
+        self.bind_row(row, item)
+        self.active[index] = (row, window_id)
+
+    def _release(self, index):
+        row, window_id = self.active.pop(index)
+        self.shown.discard(index)
+        kind, item = self.items[index]
+        if self.release_row:
+            self.release_row(row, item)
+        self.canvas.itemconfigure(window_id, state="hidden")
+        self.pools.setdefault(kind, []).append((row, window_id))